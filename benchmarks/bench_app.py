@@ -0,0 +1,228 @@
+"""End-to-end benchmark of app() against the local SolarEdge stub and the in-process InfluxDB sink.
+Every scenario runs in its own process, so the peak RSS of one doesn't carry over to the next.
+The results are compared with benchmarks/baselines.json and regressions make the run fail. Timings
+are compared relative to a reference workload measured in the same process, see compared_metrics.
+
+Run with: python -m benchmarks.bench_app [--scenario NAME] [--repeat N] [--update-baselines]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from functools import partial
+from statistics import median
+from typing import Dict, List
+from unittest.mock import patch
+
+from loguru import logger
+
+from benchmarks.bench_line_protocol import synthetic_points, with_serializer
+from benchmarks.bench_models import synthetic_rows
+from benchmarks.fake_influx import LineProtocolSink, fake_influxdb
+from benchmarks.stub_api import SolarEdgeStub
+from solaredge_influxdb.metrics import MetricsRegistry, set_registry
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+# Allowed slowdown or growth against the baseline before a result counts as a regression
+DEFAULT_TOLERANCE = 0.25
+
+SCENARIOS = {
+    "single": {"sites": 1, "inverters": 2, "timewindow": 60},
+    "fleet": {"sites": 20, "inverters": 4, "timewindow": 1440, "all_sites": True},
+    "throttled": {"sites": 5, "inverters": 2, "timewindow": 240, "all_sites": True, "latency": 0.05, "throttle": 0.1},
+    "site_data": {"sites": 20, "inverters": 2, "timewindow": 1440, "all_sites": True, "site_data": True},
+}
+# Metric compared with the baselines, whether higher is better and the difference that is noise whatever
+# the tolerance. Ratios are in reference runs, points_per_reference in points per reference run.
+COMPARED = {
+    "points_per_reference": (True, 0.0),
+    "run_p95_ratio": (False, 0.5),
+    "request_p95_ratio": (False, 0.25),
+    "points_per_second": (True, 0.0),
+    "run_p95_ms": (False, 10.0),
+    "request_p95_ms": (False, 5.0),
+    "peak_rss_mb": (False, 5.0),
+}
+
+
+class RecordingRegistry(MetricsRegistry):
+    """Registry that also keeps every observation, for exact percentiles"""
+
+    def __init__(self):
+        super().__init__()
+        self.observations: Dict[str, List[float]] = {}
+
+    def observe(self, name: str, value: float, /, **labels) -> None:
+        super().observe(name, value, **labels)
+        with self._lock:
+            self.observations.setdefault(name, []).append(value)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def reference_ms(rounds: int = 5) -> float:
+    """Fastest of rounds runs of a fixed workload like the one of a collection: decoding a day of
+    telemetry of one inverter from JSON and serializing points to line protocol. It scales with the
+    speed of the machine like the collection does, so timings divided by it carry over between machines."""
+    payload = json.dumps(synthetic_rows(288))
+    points = synthetic_points(2000)
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        json.loads(payload)
+        with_serializer(points)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def compared_metrics(name: str, result: Dict[str, float]) -> Dict[str, float]:
+    """Metrics of a result compared with the baselines. Timings of scenarios without injected waits
+    are divided by the reference time of the run; timings of scenarios with latency or 429s are mostly
+    the stub's waits and the retry backoff, which don't depend on the machine, and are kept in ms."""
+    scenario = SCENARIOS[name]
+    metrics = {"peak_rss_mb": result["peak_rss_mb"]}
+    if scenario.get("latency") or scenario.get("throttle"):
+        metrics.update({metric: result[metric] for metric in ("points_per_second", "run_p95_ms", "request_p95_ms")})
+    else:
+        reference = result["reference_ms"]
+        metrics["points_per_reference"] = result["points_per_second"] * reference / 1000
+        metrics["run_p95_ratio"] = result["run_p95_ms"] / reference
+        metrics["request_p95_ratio"] = result["request_p95_ms"] / reference
+    return metrics
+
+
+def run_scenario(name: str, repeat: int = 3) -> Dict[str, float]:
+    """Run app() repeat times for a scenario, each time with empty state so every run does the same work"""
+    from solaredge_influxdb.app import app
+    from solaredge_influxdb.solaredge import RateLimiter, SolarEdgeClient
+
+    scenario = SCENARIOS[name]
+    # Measured before the runs, so it is taken in the same state of the process for every scenario
+    reference = reference_ms()
+    registry = RecordingRegistry()
+    set_registry(registry)
+    sink = LineProtocolSink()
+    durations = []
+    with SolarEdgeStub(
+        scenario["sites"], scenario["inverters"], scenario.get("latency", 0.0), scenario.get("throttle", 0.0)
+    ) as stub, fake_influxdb(sink), patch.object(SolarEdgeClient, "url", stub.url), patch(
+        # The quota and the 1 request per second of the real API would only measure the rate limiter
+        "solaredge_influxdb.app.RateLimiter",
+        partial(RateLimiter, rate=10000.0, burst=10000),
+    ):
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory() as directory:
+                start = time.perf_counter()
+                app(
+                    config_path=os.path.join(directory, "config.toml"),
+                    api_key="benchmark",
+                    force=True,
+                    timewindow=scenario["timewindow"],
+                    all_sites=scenario.get("all_sites", False),
+                    site_data=scenario.get("site_data", False),
+                    state_path=os.path.join(directory, "state.json"),
+                    quota_path=os.path.join(directory, "quota.json"),
+                    cache_dir=os.path.join(directory, "cache"),
+                    spool_dir=os.path.join(directory, "spool"),
+                    daily_quota=1000000,
+                )
+                durations.append(time.perf_counter() - start)
+        requests = sum(stub.requests.values())
+    return {
+        "points": sink.points,
+        "requests": requests,
+        "throttled": stub.throttled,
+        "points_per_second": sink.points / sum(durations),
+        "run_p50_ms": median(durations) * 1000,
+        "run_p95_ms": percentile(durations, 0.95) * 1000,
+        "request_p50_ms": percentile(registry.observations.get("solaredge_request_seconds", []), 0.5) * 1000,
+        "request_p95_ms": percentile(registry.observations.get("solaredge_request_seconds", []), 0.95) * 1000,
+        "request_p99_ms": percentile(registry.observations.get("solaredge_request_seconds", []), 0.99) * 1000,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "reference_ms": reference,
+    }
+
+
+def regressions(name: str, result: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    """Describe every compared metric that is worse than the baseline by more than tolerance"""
+    found = []
+    metrics = compared_metrics(name, result)
+    for metric, (higher_is_better, noise) in COMPARED.items():
+        if metric not in metrics or not baseline.get(metric) or abs(metrics[metric] - baseline[metric]) <= noise:
+            continue
+        change = metrics[metric] / baseline[metric] - 1
+        if (-change if higher_is_better else change) > tolerance:
+            found.append(f"{name}: {metric} {metrics[metric]:,.2f} vs baseline {baseline[metric]:,.2f} ({change:+.0%})")
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append", help="Scenario to run, all by default")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of app() per scenario")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed regression, 0.25 is 25%%")
+    parser.add_argument("--update-baselines", action="store_true", help="Store the results as the new baselines")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        logger.remove()
+        print(json.dumps(run_scenario(args.scenario[0], args.repeat)))
+        return
+
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        command = [sys.executable, "-m", "benchmarks.bench_app", "--child", "--scenario", name, "--repeat", str(args.repeat)]
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        results[name] = json.loads(output.splitlines()[-1])
+        result = results[name]
+        print(
+            f"{name:<10} {result['points_per_second']:>10,.0f} points/s  run p95 {result['run_p95_ms']:>8,.1f} ms  "
+            f"request p50/p95/p99 {result['request_p50_ms']:.1f}/{result['request_p95_ms']:.1f}/"
+            f"{result['request_p99_ms']:.1f} ms  peak RSS {result['peak_rss_mb']:,.1f} MB  "
+            f"reference {result['reference_ms']:.1f} ms  "
+            f"({result['points']} points, {result['requests']} requests, {result['throttled']} throttled)"
+        )
+
+    baselines = {}
+    if os.path.isfile(BASELINES_PATH):
+        with open(BASELINES_PATH, "r") as f:
+            baselines = json.load(f)
+    if args.update_baselines:
+        baselines.update(
+            {
+                name: {metric: round(value, 3) for metric, value in compared_metrics(name, result).items()}
+                for name, result in results.items()
+            }
+        )
+        with open(BASELINES_PATH, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Stored baselines in {BASELINES_PATH}")
+        return
+
+    found = [
+        regression
+        for name, result in results.items()
+        if name in baselines
+        for regression in regressions(name, result, baselines[name], args.tolerance)
+    ]
+    for regression in found:
+        print(f"REGRESSION {regression}")
+    if found:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
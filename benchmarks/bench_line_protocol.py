@@ -0,0 +1,67 @@
+"""Compare queueing telemetry points through influxdb_client.Point with the direct line-protocol serializer.
+
+Run with: python -m benchmarks.bench_line_protocol [rows]
+"""
+
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Tuple
+
+import influxdb_client
+
+from solaredge_influxdb.influxdb import LineProtocolSerializer
+
+TAGS = [("serial_number", "7E140000-00"), ("model", "SE5000")]
+
+
+def synthetic_points(count: int) -> List[Tuple[datetime, list, list]]:
+    """Build (time, fields, tags) tuples shaped like the voltage points of one inverter"""
+    start = datetime(2026, 5, 6, 6, 0, 0, tzinfo=timezone.utc)
+    return [
+        (
+            start + timedelta(minutes=5 * i),
+            [("dc_voltage", 750.5), ("voltage_l1_to_2", 400.1 + i), ("voltage_l2_to_3", 400.2), ("voltage_l3_to_1", 400.3)],
+            [("operation_mode", 0), ("inverter_mode", "MPPT")],
+        )
+        for i in range(count)
+    ]
+
+
+def with_points(points: List[Tuple[datetime, list, list]]) -> bytes:
+    lines = []
+    for time_, fields, tags in points:
+        point = influxdb_client.Point("solar").time(time_, "ms")
+        for key, value in TAGS + tags:
+            point.tag(key, value)
+        for key, value in fields:
+            point.field(key, value)
+        lines.append(point.to_line_protocol())
+    return "\n".join(lines).encode()
+
+
+def with_serializer(points: List[Tuple[datetime, list, list]]) -> bytes:
+    serializer = LineProtocolSerializer("solar", TAGS)
+    buffer = bytearray()
+    for time_, fields, tags in points:
+        serializer.serialize(buffer, time_, fields, tags)
+    return bytes(buffer)
+
+
+def measure(name: str, serialize: Callable[[list], bytes], points: list) -> None:
+    serialize(points[:10])  # warm up
+    start = time.perf_counter()
+    payload = serialize(points)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<16} {len(points) / elapsed:>12,.0f} points/s {len(payload):>12,} bytes")
+
+
+def main(count: int = 50000) -> None:
+    points = synthetic_points(count)
+    print(f"Serializing {count} points")
+    measure("Point", with_points, points)
+    measure("Serializer", with_serializer, points)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,74 @@
+"""Compare decoding telemetry rows into pydantic TelemetryData models with the TelemetryRecord fast path.
+
+Run with: python -m benchmarks.bench_models [rows]
+"""
+
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from solaredge_influxdb.solaredge.models import TelemetryData, TelemetryRecord
+
+PHASE = {
+    "acCurrent": 22.653,
+    "acVoltage": 231.2,
+    "acFrequency": 50.01,
+    "apparentPower": 1964.0,
+    "activePower": 1954.0,
+    "reactivePower": -89.0,
+    "cosPhi": 1.0,
+}
+
+
+def synthetic_rows(count: int) -> List[dict]:
+    """Build telemetry rows shaped like the equipment data endpoint returns them for a three-phase inverter"""
+    start = datetime(2026, 5, 6, 6, 0, 0)
+    return [
+        {
+            "date": (start + timedelta(minutes=5 * i)).strftime("%Y-%m-%d %H:%M:%S"),
+            "totalActivePower": 1200.0 + i,
+            "dcVoltage": 750.5,
+            "groundFaultResistance": 6672.34,
+            "powerLimit": 100.0,
+            "totalEnergy": 12653300.0 + i,
+            "temperature": 54.8,
+            "inverterMode": "MPPT",
+            "operationMode": 0,
+            "vL1To2": 400.1,
+            "vL2To3": 400.2,
+            "vL3To1": 400.3,
+            "L1Data": dict(PHASE),
+            "L2Data": dict(PHASE),
+            "L3Data": dict(PHASE),
+        }
+        for i in range(count)
+    ]
+
+
+def measure(name: str, decode: Callable[[dict], object], rows: List[dict]) -> None:
+    decode(rows[0])  # warm up
+    start = time.perf_counter()
+    for row in rows:
+        decode(row)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    decoded = [decode(row) for row in rows]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del decoded
+
+    print(f"{name:<16} {len(rows) / elapsed:>12,.0f} rows/s {allocated / len(rows):>10,.0f} bytes/row")
+
+
+def main(count: int = 20000) -> None:
+    rows = synthetic_rows(count)
+    print(f"Decoding {count} telemetry rows")
+    measure("TelemetryData", lambda row: TelemetryData(**row), rows)
+    measure("TelemetryRecord", TelemetryRecord.from_dict, rows)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
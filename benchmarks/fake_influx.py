@@ -0,0 +1,54 @@
+"""In-process stand-in for InfluxDB that receives the line protocol of InfluxDBClient without a server."""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+from unittest.mock import patch
+
+
+class LineProtocolSink:
+    """Write API that counts the lines and bytes written per bucket, waiting latency seconds per batch"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.lines: Dict[str, int] = {}
+        self.bytes = 0
+        self.batches = 0
+        self._lock = threading.Lock()
+
+    @property
+    def points(self) -> int:
+        return sum(self.lines.values())
+
+    def write(self, bucket: str, record: bytes, write_precision=None) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        lines = record.count(b"\n") + (not record.endswith(b"\n"))
+        with self._lock:
+            self.lines[bucket] = self.lines.get(bucket, 0) + lines
+            self.bytes += len(record)
+            self.batches += 1
+
+    def close(self) -> None:
+        pass
+
+
+class FakeInfluxDB:
+    """influxdb_client.InfluxDBClient returning the sink as its write API"""
+
+    def __init__(self, sink: LineProtocolSink):
+        self.sink = sink
+
+    def write_api(self, write_options=None) -> LineProtocolSink:
+        return self.sink
+
+    def close(self) -> None:
+        pass
+
+
+@contextmanager
+def fake_influxdb(sink: LineProtocolSink) -> Iterator[LineProtocolSink]:
+    """Make every InfluxDBClient created from a config file write to the sink"""
+    with patch("influxdb_client.InfluxDBClient.from_config_file", return_value=FakeInfluxDB(sink)):
+        yield sink
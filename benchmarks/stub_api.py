@@ -0,0 +1,280 @@
+"""Local stand-in for the SolarEdge monitoring API, serving synthetic sites, inverters, telemetry,
+inventory, meter readings and the site energy, power and overview of one or many sites, with
+configurable latency and 429 injection.
+
+Run with: python -m benchmarks.stub_api [port]
+"""
+
+import json
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks.bench_models import PHASE
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+FIRST_SITE_ID = 100000
+METER_TYPES = ["Production", "Consumption", "FeedIn", "Purchased"]
+
+
+def _site(site_id: int) -> dict:
+    return {
+        "id": site_id,
+        "name": f"Site {site_id}",
+        "accountId": 1,
+        "status": "Active",
+        "peakPower": 10.0,
+        "installationDate": "2022-01-01",
+        "notes": "",
+        "type": "Residential",
+        "location": {
+            "country": "Netherlands",
+            "city": "Amsterdam",
+            "address": "Dam 1",
+            "zip": "1012 JS",
+            "timeZone": "Europe/Amsterdam",
+        },
+        "uris": {},
+    }
+
+
+def _serial_number(site_id: int, index: int) -> str:
+    return f"{site_id:08X}-{index + 1:02d}"
+
+
+def _steps(start: datetime, end: datetime, step: timedelta) -> List[datetime]:
+    """Moments aligned to step between start and end"""
+    first = datetime.min + -(-(start - datetime.min) // step) * step
+    moments = []
+    while first <= end:
+        moments.append(first)
+        first += step
+    return moments
+
+
+def _quarters(start: datetime, end: datetime, value: float) -> List[dict]:
+    """Quarter-hourly site values between start and end"""
+    return [{"date": moment.strftime(DATE_FORMAT), "value": value} for moment in _steps(start, end, timedelta(minutes=15))]
+
+
+def _telemetry(moment: datetime) -> dict:
+    minutes = moment.hour * 60 + moment.minute
+    return {
+        "date": moment.strftime(DATE_FORMAT),
+        "totalActivePower": 3000.0 + minutes,
+        "dcVoltage": 750.5,
+        "groundFaultResistance": 6672.34,
+        "powerLimit": 100.0,
+        "totalEnergy": 12653300.0 + minutes * 25,
+        "temperature": 54.8,
+        "inverterMode": "MPPT",
+        "operationMode": 0,
+        "vL1To2": 400.1,
+        "vL2To3": 400.2,
+        "vL3To1": 400.3,
+        "L1Data": dict(PHASE),
+        "L2Data": dict(PHASE),
+        "L3Data": dict(PHASE),
+    }
+
+
+class SolarEdgeStub:
+    """SolarEdge API for sites x inverters synthetic inverters on a local port. Every request waits
+    latency seconds and a share of throttle requests is answered with 429 Too Many Requests."""
+
+    def __init__(
+        self,
+        sites: int = 1,
+        inverters: int = 2,
+        latency: float = 0.0,
+        throttle: float = 0.0,  # Share of the requests answered with 429
+        port: int = 0,
+        seed: int = 0,
+    ):
+        self.site_ids = [FIRST_SITE_ID + index for index in range(sites)]
+        self.inverters = inverters
+        self.latency = latency
+        self.throttle = throttle
+        self.requests: Dict[str, int] = {}
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._routes: List[Tuple[re.Pattern, Callable[..., dict]]] = [
+            (re.compile(r"/sites/list"), self._sites),
+            (re.compile(r"/equipment/(\d+)/list"), self._components),
+            (re.compile(r"/equipment/(\d+)/([^/]+)/data\.json"), self._technical_data),
+            (re.compile(r"/site/(\d+)/inventory"), self._inventory),
+            (re.compile(r"/site/(\d+)/meters"), self._meters),
+            (re.compile(r"/sites?/([\d,]+)/energy"), self._site_energy),
+            (re.compile(r"/sites?/([\d,]+)/power"), self._site_power),
+            (re.compile(r"/sites?/([\d,]+)/overview"), self._site_overview),
+        ]
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self) -> "SolarEdgeStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="solaredge-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "SolarEdgeStub":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def respond(self, path: str, query: Dict[str, str]) -> Tuple[int, dict]:
+        """Status code and JSON body of a request"""
+        for pattern, route in self._routes:
+            match = pattern.fullmatch(path)
+            if match is None:
+                continue
+            with self._lock:
+                self.requests[route.__name__] = self.requests.get(route.__name__, 0) + 1
+                throttled = self._random.random() < self.throttle
+                self.throttled += throttled
+            if throttled:
+                return 429, {"String": "Too many requests"}
+            return 200, route(*match.groups(), **query)
+        return 404, {"String": f"Unknown path {path}"}
+
+    def _sites(self, **query: str) -> dict:
+        return {"sites": {"count": len(self.site_ids), "site": [_site(site_id) for site_id in self.site_ids]}}
+
+    def _components(self, site_id: str, **query: str) -> dict:
+        inverters = [
+            {
+                "name": f"Inverter {index + 1}",
+                "manufacturer": "SolarEdge",
+                "model": "SE16K",
+                "serialNumber": _serial_number(int(site_id), index),
+            }
+            for index in range(self.inverters)
+        ]
+        return {"reporters": {"count": len(inverters), "list": inverters}}
+
+    def _technical_data(self, site_id: str, serial_number: str, startTime: str, endTime: str, **query: str) -> dict:
+        start, end = datetime.strptime(startTime, DATE_FORMAT), datetime.strptime(endTime, DATE_FORMAT)
+        telemetries = [_telemetry(moment) for moment in _steps(start, end, timedelta(minutes=5))]
+        return {"data": {"count": len(telemetries), "telemetries": telemetries}}
+
+    def _inventory(self, site_id: str, **query: str) -> dict:
+        inverters = [
+            {
+                "model": "SE16K",
+                "firmwareVersion": "4.18.32",
+                "SN": _serial_number(int(site_id), index),
+                "connectedOptimizers": 40,
+            }
+            for index in range(self.inverters)
+        ]
+        return {"Inventory": {"meters": [], "sensors": [], "gateways": [], "batteries": [], "inverters": inverters}}
+
+    def _meters(self, site_id: str, startTime: str, endTime: str, **query: str) -> dict:
+        start, end = datetime.strptime(startTime, DATE_FORMAT), datetime.strptime(endTime, DATE_FORMAT)
+        moments = _steps(start, end, timedelta(minutes=15))
+        meters = [
+            {
+                "meterSerialNumber": f"{site_id}-M{index}",
+                "connectedSolaredgeDeviceSN": _serial_number(int(site_id), 0),
+                "model": "WNC-3Y-400-MB",
+                "meterType": meter_type,
+                "values": [
+                    {"date": moment.strftime(DATE_FORMAT), "value": 1000000.0 + i * 250} for i, moment in enumerate(moments)
+                ],
+            }
+            for index, meter_type in enumerate(METER_TYPES)
+        ]
+        return {"meterEnergyDetails": {"timeUnit": "QUARTER_OF_AN_HOUR", "unit": "Wh", "meters": meters}}
+
+    @staticmethod
+    def _site_response(site_ids: str, bulk_key: str, site_key: str, single_key: str, shared: dict, site: dict) -> dict:
+        """Response of the single-site endpoint for one site ID, of the multi-site endpoint for several"""
+        if "," not in site_ids:
+            return {single_key: {**shared, **site}}
+        sites = [{"siteId": int(site_id), site_key: site} for site_id in site_ids.split(",")]
+        return {bulk_key: {**shared, "count": len(sites), "siteEnergyList": sites}}
+
+    def _site_energy(self, site_ids: str, startDate: str, endDate: str, **query: str) -> dict:
+        start = datetime.strptime(startDate, "%Y-%m-%d")
+        end = datetime.strptime(endDate, "%Y-%m-%d") + timedelta(days=1) - timedelta(minutes=15)
+        values = _quarters(start, end, 250.0)
+        shared = {"timeUnit": "QUARTER_OF_AN_HOUR", "unit": "Wh"}
+        site = {"measuredBy": "INVERTER", "values": values}
+        return self._site_response(site_ids, "sitesEnergy", "energyValues", "energy", shared, site)
+
+    def _site_power(self, site_ids: str, startTime: str, endTime: str, **query: str) -> dict:
+        start, end = datetime.strptime(startTime, DATE_FORMAT), datetime.strptime(endTime, DATE_FORMAT)
+        values = _quarters(start, end, 1000.0)
+        shared = {"timeUnit": "QUARTER_OF_AN_HOUR", "unit": "W"}
+        site = {"measuredBy": "INVERTER", "values": values}
+        return self._site_response(site_ids, "powerDateValuesList", "powerDataValueSeries", "power", shared, site)
+
+    def _site_overview(self, site_ids: str, **query: str) -> dict:
+        site = {
+            "lastUpdateTime": datetime.now().strftime(DATE_FORMAT),
+            "lifeTimeData": {"energy": 12653300.0},
+            "lastYearData": {"energy": 3500000.0},
+            "lastMonthData": {"energy": 420000.0},
+            "lastDayData": {"energy": 18000.0},
+            "currentPower": {"power": 3000.0},
+            "measuredBy": "INVERTER",
+        }
+        return self._site_response(site_ids, "sitesOverviews", "siteOverview", "overview", {}, site)
+
+    def _handler(self) -> type:
+        stub = self
+
+        class StubHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, Nagle's algorithm would delay the body by ~40ms
+            disable_nagle_algorithm = True
+
+            def do_GET(self) -> None:
+                if stub.latency:
+                    time.sleep(stub.latency)
+                url = urlsplit(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items() if key != "api_key"}
+                try:
+                    status, body = stub.respond(url.path, query)
+                except (TypeError, ValueError) as e:
+                    status, body = 400, {"String": str(e)}
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        return StubHandler
+
+
+def main(port: int = 8585) -> None:
+    with SolarEdgeStub(sites=2, inverters=2, port=port) as stub:
+        print(f"SolarEdge stub listening on {stub.url}, press Ctrl+C to stop")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -1,3 +1,27 @@
-from .app import app
+import sys
+from types import ModuleType
 
 __version__ = "0.1.0"
+
+
+class _Package(ModuleType):
+    """The package module. Importing the app submodule binds it as attribute app of the package, which
+    would hide the app() function; the function stays the public app."""
+
+    def __setattr__(self, name: str, value) -> None:
+        if name == "app" and isinstance(value, ModuleType):
+            return
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
+
+
+def __getattr__(name: str):
+    # app imports the SolarEdge and InfluxDB clients, load it only when it is used
+    if name == "app":
+        from .app import app
+
+        globals()["app"] = app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,7 +1,5 @@
 from loguru import logger
-from argparse import ArgumentParser
-
-from solaredge_influxdb import app
+from argparse import SUPPRESS, ArgumentParser
 
 parser = ArgumentParser()
 parser.add_argument(
@@ -29,19 +27,230 @@ parser.add_argument(
     type=int,
     help="Optional time window (in minutes) used for solar information",
 )
+parser.add_argument(
+    "--batch-size",
+    type=int,
+    help="Maximum number of points written to InfluxDB in a single request",
+)
+parser.add_argument(
+    "--write-queue-size",
+    type=int,
+    help="Number of batches queued for the background InfluxDB writer, 0 writes synchronously",
+)
+parser.add_argument(
+    "--spool-dir",
+    type=str,
+    help="Directory where batches that couldn't be written to InfluxDB are kept until the next run",
+)
+parser.add_argument(
+    "--spool-max-size",
+    type=int,
+    help="Size cap of the spool in MB, the oldest batches are dropped beyond it",
+)
+parser.add_argument(
+    "--spool-fsync",
+    type=str,
+    choices=["always", "rotate", "never"],
+    help="When spooled batches are synced to disk",
+)
+parser.add_argument(
+    "--max-workers",
+    type=int,
+    help="Maximum number of inverters fetched from the SolarEdge API concurrently",
+)
+parser.add_argument(
+    "--request-timeout",
+    type=float,
+    help="Seconds to wait for the next byte of a SolarEdge API response before giving up",
+)
+parser.add_argument(
+    "--state-path",
+    type=str,
+    help="Path to the file that records the last telemetry written per inverter",
+)
+parser.add_argument(
+    "--daily-quota",
+    type=int,
+    help="Number of SolarEdge API requests allowed per day for the API key",
+)
+parser.add_argument(
+    "--quota-path",
+    type=str,
+    help="Path to the file that tracks the SolarEdge API requests used today",
+)
+parser.add_argument(
+    "--cache-dir",
+    type=str,
+    help="Directory of the SolarEdge metadata cache",
+)
+parser.add_argument(
+    "--clear-cache",
+    action="store_true",
+    help="Drop cached SolarEdge metadata such as the site and inverter list before running",
+)
 parser.add_argument(
     "--force",
     action="store_true",
     help="Collect data even outside the daylight window",
 )
+parser.add_argument(
+    "--stream",
+    action="store_true",
+    default=None,  # Left out when not given, backfill streams by default
+    help="Decode technical data while it is downloaded to keep memory use flat for long windows",
+)
+parser.add_argument(
+    "--full-models",
+    action="store_true",
+    help="Validate every telemetry row into a full pydantic model instead of the compact fast path",
+)
+parser.add_argument(
+    "--schema",
+    type=str,
+    choices=["split", "single"],
+    help="Layout of the points in InfluxDB: energy, power and voltages in separate buckets (split) "
+    "or one point per row (single)",
+)
+parser.add_argument(
+    "--bucket",
+    type=str,
+    help="Bucket used by the single schema layout",
+)
+parser.add_argument(
+    "--no-meters",
+    dest="meters",
+    action="store_false",
+    help="Only collect inverter data, for sites without meters",
+)
+parser.add_argument(
+    "--all-sites",
+    action="store_true",
+    help="Collect every site of the API key instead of only the first one, each with its own state file",
+)
+parser.add_argument(
+    "--site-data",
+    action="store_true",
+    help="Also collect the site energy, power and overview, with one request for all sites",
+)
+parser.add_argument(
+    "--dedup",
+    action="store_true",
+    help="Skip telemetry points that didn't change since the last point written for the inverter",
+)
+parser.add_argument(
+    "--heartbeat",
+    type=int,
+    help="With --dedup: minutes after which an unchanged point is written anyway",
+)
+parser.add_argument(
+    "--deadband",
+    type=str,
+    action="append",
+    metavar="FIELD=VALUE",
+    help="With --dedup: largest change of a field that still counts as unchanged, e.g. dc_voltage=2; repeatable",
+)
+parser.add_argument(
+    "--dedup-path",
+    type=str,
+    help="With --dedup: path to the file keeping the last point written per inverter between runs",
+)
+parser.add_argument(
+    "--daemon",
+    action="store_true",
+    help="Keep running and collect data every time window instead of exiting after one run",
+)
+parser.add_argument(
+    "--adaptive",
+    action="store_true",
+    help="Daemon mode: collect more often around the daily production peak and less at dawn and dusk",
+)
+parser.add_argument(
+    "--min-interval",
+    type=int,
+    help="Daemon mode: shortest interval between adaptive collections in minutes",
+)
+parser.add_argument(
+    "--max-interval",
+    type=int,
+    help="Daemon mode: longest interval between adaptive collections in minutes",
+)
+parser.add_argument(
+    "--metrics-port",
+    type=int,
+    help="Daemon mode: serve Prometheus metrics on this port at /metrics",
+)
+subparsers = parser.add_subparsers(dest="command")
+backfill_parser = subparsers.add_parser(
+    "backfill",
+    help="Import historical data between two dates",
+)
+backfill_parser.add_argument(
+    "--start",
+    type=str,
+    required=True,
+    help="Start of the history to import, as ISO date or datetime in local time",
+)
+backfill_parser.add_argument(
+    "--end",
+    type=str,
+    help="End of the history to import, as ISO date or datetime in local time; defaults to now",
+)
+backfill_parser.add_argument(
+    "--request-budget",
+    type=int,
+    help="Maximum number of SolarEdge requests for this run; run again to continue",
+)
+backfill_parser.add_argument(
+    "--checkpoint-path",
+    type=str,
+    help="Path to the file recording which chunks were already imported",
+)
+backfill_parser.add_argument(
+    "--no-meters",
+    dest="meters",
+    action="store_false",
+    default=SUPPRESS,  # Keeps a --no-meters given before backfill
+    help="Only import inverter data",
+)
 
 logger.info("Starting application; to get SolarEdge data into InfluxDB")
 
 args = vars(parser.parse_args())
+command = args.pop("command")
+daemon_mode = args.pop("daemon")
 keys = list(args.keys())
 for k in keys:
     if args[k] is None:
         args.pop(k)
 
-app(**args)
+if command == "backfill":
+    from solaredge_influxdb.backfill import backfill
+
+    backfill_options = ["start", "end", "config_path", "api_key", "batch_size", "write_queue_size", "max_workers"]
+    backfill_options += ["request_budget", "checkpoint_path", "meters", "daily_quota", "quota_path"]
+    backfill_options += ["cache_dir", "clear_cache", "stream", "full_models", "schema", "bucket"]
+    backfill_options += ["spool_dir", "spool_max_size", "spool_fsync", "request_timeout"]
+    ignored = [k for k, v in args.items() if k not in backfill_options and v is not False]
+    if daemon_mode:
+        ignored.append("daemon")
+    if ignored:
+        parser.error(f"backfill doesn't support {', '.join('--' + k.replace('_', '-') for k in ignored)}")
+    backfill(**{k: v for k, v in args.items() if k in backfill_options})
+elif daemon_mode:
+    from solaredge_influxdb.daemon import daemon
+
+    daemon(**args)
+else:
+    from solaredge_influxdb.daylight import is_night
+
+    daemon_options = ["adaptive", "min_interval", "max_interval", "metrics_port"]
+    args = {k: v for k, v in args.items() if k not in daemon_options}
+
+    # Answered from the precomputed daylight calendar, before the SolarEdge and InfluxDB clients are imported
+    if not args.get("force") and is_night(args.get("latitude"), args.get("longitude"), args.get("cache_dir")):
+        logger.info("It's dark outside, no need to collect data")
+    else:
+        from solaredge_influxdb.app import app
+
+        app(**args)
 logger.info("Application finished")
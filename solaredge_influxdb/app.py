@@ -1,114 +1,775 @@
 import os
-from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
 from astral import Observer
 from astral.sun import sunrise as get_sunrise, sunset as get_sunset
 import pytz
 from loguru import logger
+from requests import RequestException, Session
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
 
-from solaredge_influxdb.solaredge import Equipment
-from solaredge_influxdb.influxdb import InfluxDBClient
+from solaredge_influxdb.solaredge import (
+    CONNECT_TIMEOUT,
+    Equipment,
+    Inverter,
+    Meter,
+    MeterEnergyMeter,
+    MeterEnergyValue,
+    RateLimiter,
+    ResponseCache,
+    SiteData,
+    SiteOverview,
+    SiteSeries,
+    SiteValue,
+    SolarEdgeClient,
+    create_session,
+    DEFAULT_CACHE_DIR,
+    TelemetryData,
+    TelemetryRecord,
+    TelemetryRecords,
+    TelemetryResponse,
+    MAX_METER_DATA_RANGE,
+    MAX_SITE_DATA_RANGE,
+    MAX_TECHNICAL_DATA_RANGE,
+)
+from solaredge_influxdb.daylight import (
+    DEFAULT_LATITUDE,
+    DEFAULT_LONGITUDE,
+    DEFAULT_MARGIN,
+    DEFAULT_TIMEZONE,
+    DaylightCalendar,
+    get_calendar,
+)
+from solaredge_influxdb.dedup import ChangeDetector, parse_deadbands
+from solaredge_influxdb.influxdb import InfluxDBClient, LineProtocolSerializer, Spool
+from solaredge_influxdb.metrics import get_registry, log_summary
+from solaredge_influxdb.schema import DEFAULT_SCHEMA, Schema, get_schema
+from solaredge_influxdb.state import StateStore
+
+
+# Length of the quarter-hourly meter readings and site energy and power values
+METER_INTERVAL = timedelta(minutes=15)
+
+# Serializers of a site besides its inverters: the site itself and at most one meter per meter type
+SERIALIZERS_PER_SITE = 6
+
+# State keys of the site energy and power series, in the state of the site
+SITE_ENERGY_KEY = "site:energy"
+SITE_POWER_KEY = "site:power"
+
+
+def fetch_technical_data(
+    EquipmentClient: Equipment,
+    inverters: List[Inverter],
+    start_time: datetime,
+    end_time: datetime,
+    max_workers: int = 1,
+    start_times: Optional[Dict[str, datetime]] = None,
+    stream: bool = False,
+    full_models: bool = False,
+) -> List[Union[TelemetryResponse, TelemetryRecords, Iterator[Union[TelemetryData, TelemetryRecord]], None]]:
+    """Fetch technical data for every inverter, running up to max_workers requests concurrently.
+    start_times overrides start_time per serial number. With stream enabled every result is an
+    iterator of telemetries that decodes the response body while it is consumed. Rows are decoded
+    into compact TelemetryRecord objects unless full_models asks for validated TelemetryData models.
+    Results are returned in inverter order; an inverter whose request failed yields None."""
+    if start_times is None:
+        start_times = {}
+    get_technical_data = EquipmentClient.get_technical_data_stream if stream else EquipmentClient.get_technical_data
+
+    def fetch(inverter: Inverter):
+        inverter_start_time = start_times.get(inverter.serialNumber, start_time)
+        try:
+            return get_technical_data(inverter.serialNumber, inverter_start_time, end_time, full_models=full_models)
+        except (RequestException, ValueError) as e:
+            logger.error(f"Request for technical data of inverter {inverter.serialNumber} failed: {e}")
+            return None
+
+    if max_workers <= 1 or len(inverters) <= 1:
+        return [fetch(inverter) for inverter in inverters]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(inverters))) as executor:
+        return list(executor.map(fetch, inverters))
+
+
+def use_rate_limiter(daily_quota: int, quota_path: Optional[str]) -> RateLimiter:
+    """Share one rate limiter, persisted at quota_path, between all SolarEdge clients"""
+    SolarEdgeClient.rate_limiter = RateLimiter(daily_quota, path=quota_path)
+    return SolarEdgeClient.rate_limiter
+
+
+def use_response_cache(cache_dir: str, clear_cache: bool = False) -> ResponseCache:
+    """Share one response cache for SolarEdge metadata between all SolarEdge clients"""
+    SolarEdgeClient.cache = ResponseCache(cache_dir)
+    if clear_cache:
+        logger.info(f"Clearing SolarEdge response cache in {cache_dir}")
+        SolarEdgeClient.cache.invalidate()
+    return SolarEdgeClient.cache
+
+
+def use_session(max_workers: int = 3, request_timeout: float = 60.0) -> Session:
+    """Share one session between all SolarEdge clients, keeping a connection alive for every worker.
+    request_timeout is the number of seconds to wait for the next byte of a response."""
+    SolarEdgeClient.session.close()
+    SolarEdgeClient.session = create_session(pool_maxsize=max(10, max_workers))
+    SolarEdgeClient.timeout = (CONNECT_TIMEOUT, request_timeout)
+    return SolarEdgeClient.session
+
+
+def use_spool(spool_dir: str, spool_max_size: int = 512, spool_fsync: str = "rotate") -> Spool:
+    """Create the spool for batches that couldn't be written to InfluxDB, sized in MB"""
+    return Spool(spool_dir, max_size=spool_max_size * 1024 * 1024, fsync=spool_fsync)
+
+
+def use_change_detector(
+    dedup_path: Optional[str], heartbeat: int = 30, deadbands: Optional[List[str]] = None
+) -> ChangeDetector:
+    """Create the change detector that skips unchanged telemetry points, with a heartbeat in minutes
+    and field=deadband pairs overriding the default deadbands"""
+    return ChangeDetector(parse_deadbands(deadbands or []), timedelta(minutes=heartbeat), dedup_path)
+
+
+def get_daylight_window(
+    observer: Observer, local_date: date, _timezone: tzinfo, calendar: Optional[DaylightCalendar] = None
+) -> Tuple[datetime, datetime]:
+    """Get the sunrise and sunset times for a local date, from the precomputed calendar when it has
+    the date and computed with astral otherwise"""
+    window = calendar.window(local_date, _timezone) if calendar is not None else None
+    if window is not None:
+        return window
+    try:
+        sunrise = get_sunrise(observer, date=local_date, tzinfo=_timezone)
+        sunset = get_sunset(observer, date=local_date, tzinfo=_timezone)
+        logger.debug(f"Sunrise: {sunrise}, Sunset: {sunset}")
+    except ValueError as e:
+        logger.error("Failed to retrieve sunrise/sunset times")
+        raise RuntimeError("Application requires sunset and sunrise times to prevent unnecessary API calls") from e
+    return sunrise, sunset
+
+
+def is_daylight(
+    latitude: float,
+    longitude: float,
+    timezone_str: str,
+    current_time: datetime,
+    additional_time_window: int = DEFAULT_MARGIN,
+    cache_dir: Optional[str] = None,
+) -> bool:
+    """Whether current_time is in the daylight window widened by additional_time_window minutes.
+    Answered from the precomputed daylight calendar; sunrise and sunset are only computed with astral
+    when the calendar can't tell."""
+    margin = timedelta(minutes=additional_time_window)
+    calendar = get_calendar(latitude, longitude, timezone_str, cache_dir, current_time)
+    daylight = calendar.is_daylight(current_time, margin) if calendar is not None else None
+    if daylight is not None:
+        return daylight
+    _timezone = pytz.timezone(timezone_str)
+    observer = Observer(latitude=float(latitude), longitude=float(longitude))
+    sunrise, sunset = get_daylight_window(observer, current_time.astimezone(_timezone).date(), _timezone)
+    return sunrise - margin < current_time < sunset + margin
+
+
+@lru_cache(maxsize=256)
+def get_serializer(measurement: str, tags: Tuple[Tuple[str, str], ...]) -> LineProtocolSerializer:
+    """Get the line-protocol serializer of a measurement and static tag set, e.g. one inverter"""
+    return LineProtocolSerializer(measurement, tags)
+
+
+def use_serializer_cache(inverters: int, sites: int = 1) -> None:
+    """Grow the serializer cache to hold a serializer for every inverter, meter and site collected,
+    so their tags are escaped once per process instead of once per run"""
+    global get_serializer
+    size = inverters + sites * SERIALIZERS_PER_SITE
+    if size > get_serializer.cache_info().maxsize:
+        get_serializer = lru_cache(maxsize=size)(get_serializer.__wrapped__)
+
+
+def add_telemetry_points(
+    InfluxClient: InfluxDBClient,
+    inverter: Inverter,
+    telemetry: Union[TelemetryData, TelemetryRecord],
+    telemetry_date: datetime,
+    schema: Schema = DEFAULT_SCHEMA,
+    site_id: Optional[int] = None,
+    detector: Optional[ChangeDetector] = None,
+) -> None:
+    """Queue one multi-field point per bucket of the schema, and one per phase, for a telemetry row.
+    A site_id is added as tag, the tag is left out when it is None. With a change detector, points
+    that didn't change since the last point written for the inverter are left out."""
+    serializer = get_serializer(
+        schema.measurement,
+        (("serial_number", inverter.serialNumber), ("model", inverter.model), ("site_id", site_id)),
+    )
+    tags = (
+        ("operation_mode", telemetry.operationMode),
+        ("inverter_mode", telemetry.inverterMode),
+    )
+    if telemetry.totalActivePower is None:
+        logger.warning(f"totalActivePower is missing for inverter {inverter.serialNumber} at {telemetry_date}")
+    if telemetry.dcVoltage is None:
+        logger.warning(f"dcVoltage is missing for inverter {inverter.serialNumber} at {telemetry_date}")
+    for bucket, fields in schema.telemetry_points(telemetry):
+        if detector is None or detector.changed(detector.key(inverter.serialNumber, bucket), telemetry_date, fields, tags):
+            InfluxClient.add_fields(serializer, bucket, telemetry_date, fields, tags)
+        else:
+            get_registry().inc("dedup_skipped_points_total", bucket=bucket)
+    for phase, fields in schema.phase_points(telemetry):
+        key = detector.key(inverter.serialNumber, schema.phase_bucket, phase) if detector is not None else None
+        if detector is None or detector.changed(key, telemetry_date, fields, tags):
+            InfluxClient.add_fields(serializer, schema.phase_bucket, telemetry_date, fields, tags + (("phase", phase),))
+        else:
+            get_registry().inc("dedup_skipped_points_total", bucket=schema.phase_bucket)
+
+
+def add_series_points(
+    InfluxClient: InfluxDBClient,
+    serializer: LineProtocolSerializer,
+    bucket: str,
+    field: str,
+    values: List[Union[MeterEnergyValue, SiteValue]],
+    _timezone: tzinfo,
+    after: Optional[datetime] = None,
+    complete_before: Optional[datetime] = None,
+) -> Optional[datetime]:
+    """Queue the quarter-hourly values taken after the given date as one field, divided by 1000 (Wh to
+    kWh, W to kW). Returns the date of the last value queued whose quarter ended before complete_before,
+    so the value of a quarter still in progress is written again once it is complete."""
+    last_date = None
+    for value in values:
+        if value.value is None:
+            continue
+        value_date = _timezone.localize(datetime.strptime(value.date, "%Y-%m-%d %H:%M:%S"))
+        if after is not None and value_date <= after:
+            continue
+        InfluxClient.add_fields(serializer, bucket, value_date, ((field, value.value / 1000),))
+        if complete_before is not None and value_date + METER_INTERVAL > complete_before:
+            continue
+        if last_date is None or value_date > last_date:
+            last_date = value_date
+    return last_date
+
+
+def add_meter_points(
+    InfluxClient: InfluxDBClient,
+    meter: MeterEnergyMeter,
+    _timezone: tzinfo,
+    schema: Schema = DEFAULT_SCHEMA,
+    after: Optional[datetime] = None,
+    complete_before: Optional[datetime] = None,
+    site_id: Optional[int] = None,
+) -> Optional[datetime]:
+    """Queue the energy readings of one meter taken after the given date for writing to InfluxDB.
+    Returns the date of the last reading queued whose interval ended before complete_before, so
+    the reading of an interval still in progress is written again once it is complete."""
+    serializer = get_serializer(
+        schema.meter_measurement,
+        (
+            ("serial_number", meter.meterSerialNumber),
+            ("model", meter.model),
+            ("meter_type", meter.meterType),
+            ("site_id", site_id),
+        ),
+    )
+    return add_series_points(
+        InfluxClient, serializer, schema.meter_bucket, "energy", meter.values, _timezone, after, complete_before
+    )
+
+
+def get_meter_client(
+    api_key: str, site_id: Optional[int] = None, cache: Optional[ResponseCache] = None
+) -> Optional[Meter]:
+    """Create the meter client, None when it can't be set up so inverter collection still runs"""
+    try:
+        return Meter(api_key, cache=cache, site_id=site_id)
+    except Exception as e:
+        logger.error(f"Setting up the meter client failed, skipping meter data: {e}")
+        return None
+
+
+def meter_key(serial_number: str) -> str:
+    """Get the state key of a meter, keeping meter watermarks apart from inverter serial numbers"""
+    return f"meter:{serial_number}"
+
+
+def collect_meters(
+    MeterClient: Meter,
+    InfluxClient: InfluxDBClient,
+    current_time: datetime,
+    timewindow: int,
+    _timezone: tzinfo,
+    state: Optional[StateStore] = None,
+    schema: Schema = DEFAULT_SCHEMA,
+    site_id: Optional[int] = None,
+) -> Dict[str, datetime]:
+    """Fetch the readings of all meters with one request, starting at the oldest meter watermark,
+    and queue the readings each meter didn't write yet. Returns the new watermark per meter key."""
+    keys = state.keys(meter_key("")) if state is not None else []
+    start_time = min(
+        (collection_start(state, key, current_time, timewindow, MAX_METER_DATA_RANGE) for key in keys),
+        default=current_time - timedelta(minutes=timewindow),
+    )
+    try:
+        meter_data = MeterClient.get_meters_data(start_time, current_time, time_unit="QUARTER_OF_AN_HOUR")
+    except (RequestException, ValueError) as e:
+        logger.error(f"Request for meter data failed: {e}")
+        return {}
+    if meter_data is None:
+        return {}
+
+    written = {}
+    for meter in meter_data.meterEnergyDetails.meters:
+        key = meter_key(meter.meterSerialNumber)
+        watermark = state.get(key) if state is not None else None
+        last_date = add_meter_points(
+            InfluxClient, meter, _timezone, schema, after=watermark, complete_before=current_time, site_id=site_id
+        )
+        if last_date is not None:
+            written[key] = last_date
+    return written
+
+
+def add_site_points(
+    InfluxClient: InfluxDBClient,
+    site_id: int,
+    field: str,
+    series: SiteSeries,
+    _timezone: tzinfo,
+    schema: Schema = DEFAULT_SCHEMA,
+    after: Optional[datetime] = None,
+    complete_before: Optional[datetime] = None,
+) -> Optional[datetime]:
+    """Queue the quarter-hourly site energy (Wh) or power (W) values taken after the given date as
+    kWh or kW. Returns the date of the last value queued whose quarter ended before complete_before."""
+    serializer = get_serializer(schema.site_measurement, (("site_id", site_id),))
+    return add_series_points(
+        InfluxClient, serializer, schema.site_bucket, field, series.values, _timezone, after, complete_before
+    )
+
+
+def add_overview_point(
+    InfluxClient: InfluxDBClient,
+    site_id: int,
+    overview: SiteOverview,
+    _timezone: tzinfo,
+    schema: Schema = DEFAULT_SCHEMA,
+) -> None:
+    """Queue the site overview as one point at its last update time"""
+    serializer = get_serializer(schema.site_measurement, (("site_id", site_id),))
+    update_time = _timezone.localize(datetime.strptime(overview.lastUpdateTime, "%Y-%m-%d %H:%M:%S"))
+    InfluxClient.add_fields(serializer, schema.site_bucket, update_time, schema.overview_fields(overview))
+
+
+def collect_site_data(
+    SiteDataClient: SiteData,
+    InfluxClient: InfluxDBClient,
+    current_time: datetime,
+    timewindow: int,
+    _timezone: tzinfo,
+    states: Dict[int, Optional[StateStore]],
+    schema: Schema = DEFAULT_SCHEMA,
+) -> Dict[int, Dict[str, datetime]]:
+    """Fetch the energy, power and overview of all sites with one request each, through the multi-site
+    endpoints, starting at the oldest site watermark. Returns the new watermarks per site."""
+    site_ids = list(states)
+    start_time = min(
+        (
+            collection_start(states[site_id], key, current_time, timewindow, MAX_SITE_DATA_RANGE)
+            for site_id in site_ids
+            for key in (SITE_ENERGY_KEY, SITE_POWER_KEY)
+        ),
+        default=current_time - timedelta(minutes=timewindow),
+    )
+    series = (
+        (SITE_ENERGY_KEY, "energy", SiteDataClient.get_energy(start_time, current_time, site_ids)),
+        (SITE_POWER_KEY, "power", SiteDataClient.get_power(start_time, current_time, site_ids)),
+    )
+    overviews = SiteDataClient.get_overview(site_ids)
+
+    written: Dict[int, Dict[str, datetime]] = {site_id: {} for site_id in site_ids}
+    for site_id in site_ids:
+        state = states[site_id]
+        for key, field, values in series:
+            if site_id not in values:
+                continue
+            watermark = state.get(key) if state is not None else None
+            last_date = add_site_points(
+                InfluxClient, site_id, field, values[site_id], _timezone, schema, watermark, current_time
+            )
+            if last_date is not None:
+                written[site_id][key] = last_date
+        if site_id in overviews:
+            try:
+                add_overview_point(InfluxClient, site_id, overviews[site_id], _timezone, schema)
+            except ValueError as e:
+                logger.error(f"Ignoring unreadable overview of site {site_id}: {e}")
+    return written
+
+
+def collection_start(
+    state: Optional[StateStore],
+    key: str,
+    current_time: datetime,
+    timewindow: int,
+    max_range: timedelta,
+) -> datetime:
+    """Start collecting from the last record written for key, falling back to the time window
+    when nothing was written yet and never reaching back further than the API allows"""
+    watermark = state.get(key) if state is not None else None
+    if watermark is None:
+        return current_time - timedelta(minutes=timewindow)
+    return max(watermark.astimezone(current_time.tzinfo), current_time - max_range)
+
+
+class SiteCollection(NamedTuple):
+    """Data queued for one site"""
+
+    written: Dict[str, datetime]  # Date of the last record queued per state key
+    power: Optional[float]  # Total AC power in W of the latest telemetry per inverter, None without telemetry
+
+
+def total_power(powers: List[Optional[float]]) -> Optional[float]:
+    """Sum the powers that are known, None when none of them is"""
+    known = [power for power in powers if power is not None]
+    return sum(known) if known else None
+
+
+def collect_site(
+    EquipmentClient: Equipment,
+    InfluxClient: InfluxDBClient,
+    current_time: datetime,
+    timewindow: int,
+    _timezone: tzinfo,
+    max_workers: int = 1,
+    state: Optional[StateStore] = None,
+    stream: bool = False,
+    full_models: bool = False,
+    schema: Schema = DEFAULT_SCHEMA,
+    MeterClient: Optional[Meter] = None,
+    site_tag: bool = False,
+    detector: Optional[ChangeDetector] = None,
+) -> SiteCollection:
+    """Queue the technical data of every inverter of a site, and the meter readings when a meter
+    client is given, written since the last run or for the time window ending at current_time.
+    Returns the date of the last record queued per state key, to be saved once InfluxDB acknowledged
+    the data, and the current power of the site. With site_tag every point is tagged with the site_id.
+    With a change detector, telemetry points that didn't change are left out."""
+    current_time = current_time.astimezone(_timezone)
+    site_id = EquipmentClient.site_id if site_tag else None
+    inverters = EquipmentClient.inverters
+    start_times = {
+        inverter.serialNumber: collection_start(
+            state, inverter.serialNumber, current_time, timewindow, MAX_TECHNICAL_DATA_RANGE
+        )
+        for inverter in inverters
+    }
+    tech_data_list = fetch_technical_data(
+        EquipmentClient,
+        inverters,
+        current_time - timedelta(minutes=timewindow),
+        current_time,
+        max_workers,
+        start_times,
+        stream,
+        full_models,
+    )
+    # Watermarks only move once InfluxDB acknowledged the data, so failed writes are collected again
+    written: Dict[str, datetime] = {}
+    powers: Dict[str, float] = {}
+    for inverter, tech_data in zip(inverters, tech_data_list):
+        if tech_data is None:
+            logger.error("Failed to retrieve technical data")
+            continue
+
+        watermark = state.get(inverter.serialNumber) if state is not None else None
+        telemetries = tech_data if stream else tech_data.telemetries
+        try:
+            for telemetry in telemetries:
+                telemetry_date = _timezone.localize(telemetry.date)
+                if watermark is not None and telemetry_date <= watermark:
+                    continue
+                add_telemetry_points(InfluxClient, inverter, telemetry, telemetry_date, schema, site_id, detector)
+                written[inverter.serialNumber] = telemetry_date
+                if telemetry.totalActivePower is not None:
+                    powers[inverter.serialNumber] = telemetry.totalActivePower
+        except (RequestException, ValueError) as e:
+            # Rows decoded before a dropped connection or truncated body are kept
+            logger.error(f"Reading technical data of inverter {inverter.serialNumber} failed: {e}")
+    if MeterClient is not None:
+        written.update(
+            collect_meters(MeterClient, InfluxClient, current_time, timewindow, _timezone, state, schema, site_id)
+        )
+    return SiteCollection(written, total_power(list(powers.values())))
+
+
+def save_watermarks(state: Optional[StateStore], written: Dict[str, datetime]) -> None:
+    """Move the watermarks forward to the records InfluxDB acknowledged"""
+    if state is None:
+        return
+    for key, written_date in written.items():
+        state.update(key, written_date)
+    state.save()
+
+
+def finish_collection(
+    InfluxClient: InfluxDBClient,
+    watermarks: List[Tuple[Optional[StateStore], Dict[str, datetime]]],
+    detector: Optional[ChangeDetector] = None,
+) -> bool:
+    """Wait until InfluxDB acknowledged the queued points, then move the watermarks of every state
+    forward and keep the points the change detector passed. When not everything was written, the
+    watermarks stay and the detector forgets the points, so they are collected again next run."""
+    if not InfluxClient.drain():
+        logger.error("Not all data was written to InfluxDB, it will be collected again next run")
+        if detector is not None:
+            detector.rollback()
+        return False
+    for state, written in watermarks:
+        save_watermarks(state, written)
+    if detector is not None:
+        detector.commit()
+    return True
+
+
+def collect(
+    EquipmentClient: Equipment,
+    InfluxClient: InfluxDBClient,
+    current_time: datetime,
+    timewindow: int,
+    _timezone: tzinfo,
+    max_workers: int = 1,
+    state: Optional[StateStore] = None,
+    stream: bool = False,
+    full_models: bool = False,
+    schema: Schema = DEFAULT_SCHEMA,
+    MeterClient: Optional[Meter] = None,
+    SiteDataClient: Optional[SiteData] = None,
+    detector: Optional[ChangeDetector] = None,
+) -> Optional[float]:
+    """Collect the technical data of every inverter, the meter readings when a meter client is given
+    and the site energy, power and overview when a site data client is given, written since the last
+    run, or for the time window ending at current_time, and write it to InfluxDB. Returns the total AC
+    power in W of the latest telemetry, None when no new telemetry was read. With a change detector,
+    telemetry points that didn't change since the last point written are left out."""
+    InfluxClient.replay_spool()
+    if detector is not None:
+        # Points of a collection that failed before they were written are compared against again
+        detector.rollback()
+    written, power = collect_site(
+        EquipmentClient,
+        InfluxClient,
+        current_time,
+        timewindow,
+        _timezone,
+        max_workers,
+        state,
+        stream,
+        full_models,
+        schema,
+        MeterClient,
+        detector=detector,
+    )
+    if SiteDataClient is not None:
+        site_id = EquipmentClient.site_id
+        site_written = collect_site_data(
+            SiteDataClient, InfluxClient, current_time.astimezone(_timezone), timewindow, _timezone, {site_id: state}, schema
+        )
+        written.update(site_written[site_id])
+    finish_collection(InfluxClient, [(state, written)], detector)
+    return power
+
+
+def site_state_path(state_path: str, site_id: int) -> str:
+    """Get the state file of one site in multi-site mode, e.g. state.123456.json"""
+    root, ext = os.path.splitext(state_path)
+    return f"{root}.{site_id}{ext}"
+
+
+class SiteClients:
+    """SolarEdge clients and state of one site in multi-site mode. Every site keeps its own state
+    file and metadata cache, in a subdirectory of the shared response cache."""
+
+    def __init__(self, api_key: str, site_id: int, state_path: str, meters: bool = True):
+        cache = ResponseCache(os.path.join(SolarEdgeClient.cache.directory, f"site-{site_id}"))
+        self.site_id = site_id
+        self.state = StateStore(site_state_path(state_path, site_id))
+        self.EquipmentClient = Equipment(api_key, cache=cache, site_id=site_id)
+        self.MeterClient = get_meter_client(api_key, site_id, cache) if meters else None
+
+
+def setup_sites(api_key: str, state_path: str, meters: bool = True, max_workers: int = 3) -> List[SiteClients]:
+    """List the sites of the API key once and set up the clients of every site concurrently.
+    Sites whose inverter list can't be retrieved are left out."""
+    site_ids = SolarEdgeClient.list_site_ids(api_key)
+    logger.info(f"Collecting {len(site_ids)} sites")
+
+    def setup(site_id: int) -> Optional[SiteClients]:
+        try:
+            return SiteClients(api_key, site_id, state_path, meters)
+        except Exception as e:
+            logger.error(f"Setting up site {site_id} failed, skipping it: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(site_ids)))) as executor:
+        sites = [site for site in executor.map(setup, site_ids) if site is not None]
+    use_serializer_cache(sum(len(site.EquipmentClient.inverters) for site in sites), len(sites))
+    return sites
+
+
+def collect_sites(
+    sites: List[SiteClients],
+    InfluxClient: InfluxDBClient,
+    current_time: datetime,
+    timewindow: int,
+    _timezone: tzinfo,
+    max_workers: int = 1,
+    stream: bool = False,
+    full_models: bool = False,
+    schema: Schema = DEFAULT_SCHEMA,
+    SiteDataClient: Optional[SiteData] = None,
+    detector: Optional[ChangeDetector] = None,
+) -> Optional[float]:
+    """Collect every site like collect, up to max_workers sites at a time. The requests of one site
+    run one after another, so max_workers also caps the concurrent SolarEdge requests; the daily
+    quota is shared through the rate limiter. Every point is tagged with its site_id. The site
+    energy, power and overview of all sites are fetched with bulk requests when a site data client
+    is given. Returns the total AC power in W of all sites."""
+    InfluxClient.replay_spool()
+    if detector is not None:
+        detector.rollback()
+
+    def collect_one(site: SiteClients) -> SiteCollection:
+        try:
+            return collect_site(
+                site.EquipmentClient,
+                InfluxClient,
+                current_time,
+                timewindow,
+                _timezone,
+                1,
+                site.state,
+                stream,
+                full_models,
+                schema,
+                site.MeterClient,
+                site_tag=True,
+                detector=detector,
+            )
+        except Exception:
+            logger.exception(f"Collecting site {site.site_id} failed")
+            return SiteCollection({}, None)
+
+    if max_workers <= 1 or len(sites) <= 1:
+        collections = [collect_one(site) for site in sites]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(sites))) as executor:
+            collections = list(executor.map(collect_one, sites))
+    written = [collection.written for collection in collections]
+    power = total_power([collection.power for collection in collections])
+    if SiteDataClient is not None:
+        site_written = collect_site_data(
+            SiteDataClient,
+            InfluxClient,
+            current_time.astimezone(_timezone),
+            timewindow,
+            _timezone,
+            {site.site_id: site.state for site in sites},
+            schema,
+        )
+        for site_written_data, site in zip(written, sites):
+            site_written_data.update(site_written[site.site_id])
+    finish_collection(InfluxClient, [(site.state, site_written) for site, site_written in zip(sites, written)], detector)
+    return power
 
 
 def app(
     config_path: str = "./solaredge_influxdb/config.toml",
-    latitude: float = os.getenv("LATITUDE", 52.3676),
-    longitude: float = os.getenv("LONGITUDE", 4.9041),
+    latitude: float = os.getenv("LATITUDE", DEFAULT_LATITUDE),
+    longitude: float = os.getenv("LONGITUDE", DEFAULT_LONGITUDE),
     api_key: str = os.getenv("API_KEY"),
-    additional_time_window: int = 60,
-    timezone_str: str = "Europe/Amsterdam",
+    additional_time_window: int = DEFAULT_MARGIN,
+    timezone_str: str = DEFAULT_TIMEZONE,
     timewindow: int = 15,  # Time window in minutes for collecting technical data, default is 15 minutes
     force: bool = False,
+    batch_size: int = 5000,  # Maximum number of points per InfluxDB write request
+    write_queue_size: int = 16,  # Batches queued for the background InfluxDB writer, 0 writes synchronously
+    spool_dir: str = "spool",  # Batches that couldn't be written to InfluxDB, replayed on the next run
+    spool_max_size: int = 512,  # Size cap of the spool in MB, the oldest batches are dropped beyond it
+    spool_fsync: str = "rotate",  # When spooled batches are synced to disk: always, rotate or never
+    max_workers: int = 3,  # Maximum number of concurrent SolarEdge requests, SolarEdge allows 3 per source IP
+    state_path: str = "state.json",  # Date of the last telemetry written per inverter, used as start of the next run
+    daily_quota: int = 300,  # SolarEdge API requests allowed per day for the API key
+    quota_path: str = "quota.json",  # Requests used today, shared between runs
+    cache_dir: str = DEFAULT_CACHE_DIR,  # Cache of SolarEdge metadata such as the site and inverter list
+    clear_cache: bool = False,
+    stream: bool = False,  # Decode telemetries while the response is read, keeping memory flat for long windows
+    full_models: bool = False,  # Validate complete TelemetryData models instead of compact TelemetryRecord rows
+    schema: str = "split",  # Layout of the points in InfluxDB, split over three buckets or single
+    meters: bool = True,  # Collect the readings of the production, consumption, feed-in and purchase meters
+    bucket: str = "solar",  # Bucket of the single layout
+    all_sites: bool = False,  # Collect every site of the API key instead of only the first one
+    site_data: bool = False,  # Collect the site energy, power and overview through the bulk endpoints
+    request_timeout: float = 60.0,  # Seconds to wait for the next byte of a SolarEdge response
+    dedup: bool = False,  # Skip telemetry points that didn't change since the last point written
+    heartbeat: int = 30,  # Minutes after which an unchanged point is written anyway
+    deadband: Optional[List[str]] = None,  # field=value pairs, the change of a field that still counts as unchanged
+    dedup_path: str = "dedup.json",  # Last point written per inverter, bucket and phase, shared between runs
 ):
-    observer = Observer(latitude=latitude, longitude=longitude)
     current_time = datetime.now(timezone.utc)
     logger.debug(f"Current time: {current_time}")
     _timezone = pytz.timezone(timezone_str)
-    local_date = current_time.astimezone(_timezone).date()
-    try:
-        sunrise = get_sunrise(observer, date=local_date, tzinfo=_timezone)
-        sunset = get_sunset(observer, date=local_date, tzinfo=_timezone)
-        logger.debug(f"Sunrise: {sunrise}, Sunset: {sunset}")
-
-    except ValueError as e:
-        logger.error("Failed to retrieve sunrise/sunset times")
-        raise RuntimeError("Application requires sunset and sunrise times to prevent unnecessary API calls") from e
-    InfluxClient = InfluxDBClient(config_path)
 
-    within_daylight_window = sunrise - timedelta(minutes=additional_time_window) < current_time < sunset + timedelta(
-        minutes=additional_time_window
-    )
-    should_collect = force or within_daylight_window
+    # Forced runs collect anyway, so they skip loading or computing the daylight calendar
+    should_collect = force or is_daylight(latitude, longitude, timezone_str, current_time, additional_time_window, cache_dir)
 
     if should_collect:
-        if force and not within_daylight_window:
+        if force:
             logger.info("Force mode enabled, bypassing daylight-window checks to collect data")
-        if within_daylight_window:
-            logger.debug("The Sun is shining bright, let's collect some data!")
         else:
-            logger.debug("Collecting data because force mode is enabled")
-        EquipmentClient = Equipment(api_key)
-        current_time = current_time.astimezone(_timezone)
-        for inverter in EquipmentClient.inverters:
-            tech_data = EquipmentClient.get_technical_data(
-                inverter.serialNumber,
-                current_time - timedelta(minutes=timewindow),
+            logger.debug("The Sun is shining bright, let's collect some data!")
+        rate_limiter = use_rate_limiter(daily_quota, quota_path)
+        use_response_cache(cache_dir, clear_cache)
+        use_session(max_workers, request_timeout)
+        detector = use_change_detector(dedup_path, heartbeat, deadband) if dedup else None
+        InfluxClient = InfluxDBClient(
+            config_path, batch_size, write_queue_size, use_spool(spool_dir, spool_max_size, spool_fsync)
+        )
+        try:
+            if all_sites:
+                sites = setup_sites(api_key, state_path, meters, max_workers)
+                collect_sites(
+                    sites,
+                    InfluxClient,
+                    current_time,
+                    timewindow,
+                    _timezone,
+                    max_workers,
+                    stream,
+                    full_models,
+                    get_schema(schema, bucket),
+                    SiteData(api_key, [site.site_id for site in sites]) if site_data and sites else None,
+                    detector,
+                )
+                return
+            EquipmentClient = Equipment(api_key)
+            MeterClient = get_meter_client(api_key) if meters else None
+            collect(
+                EquipmentClient,
+                InfluxClient,
                 current_time,
+                timewindow,
+                _timezone,
+                max_workers,
+                StateStore(state_path),
+                stream,
+                full_models,
+                get_schema(schema, bucket),
+                MeterClient,
+                SiteData(api_key, [EquipmentClient.site_id]) if site_data else None,
+                detector,
             )
-            if tech_data is None:
-                logger.error("Failed to retrieve technical data")
-                continue
-
-            for telemetry in tech_data.telemetries:
-                tags = [
-                    ("serial_number", inverter.serialNumber),
-                    ("model", inverter.model),
-                    ("operation_mode", telemetry.operationMode),
-                    ("inverter_mode", telemetry.inverterMode),
-                ]
-                telemetry_date = _timezone.localize(telemetry.date)
-                energy_point = InfluxClient.convert_to_point(
-                    telemetry_date,
-                    "solar",
-                    [
-                        ("total_energy", telemetry.totalEnergy / 1000),
-                    ],
-                    tags,
-                )
-                if telemetry.totalActivePower is not None:
-                    power_point = InfluxClient.convert_to_point(
-                        telemetry_date,
-                        "solar",
-                        [
-                            ("ac_power", telemetry.totalActivePower / 1000),
-                        ],
-                        tags,
-                    )
-                else:
-                    logger.warning(
-                        f"totalActivePower is missing for inverter {inverter.serialNumber} at {telemetry_date}, skipping power write"
-                    )
-                    power_point = None
-
-                voltage_fields = [
-                    ("voltage_l1_to_2", telemetry.vL1To2),
-                    ("voltage_l2_to_3", telemetry.vL2To3),
-                    ("voltage_l3_to_1", telemetry.vL3To1),
-                ]
-                if telemetry.dcVoltage is not None:
-                    voltage_fields.insert(0, ("dc_voltage", telemetry.dcVoltage))
-                else:
-                    logger.warning(
-                        f"dcVoltage is missing for inverter {inverter.serialNumber} at {telemetry_date}, excluding dc_voltage field"
-                    )
-                voltage_point = InfluxClient.convert_to_point(
-                    telemetry_date,
-                    "solar",
-                    voltage_fields,
-                    tags,
-                )
-                InfluxClient.write(energy_point, "energy")
-                if power_point is not None:
-                    InfluxClient.write(power_point, "energy_flow")
-                InfluxClient.write(voltage_point, "voltage_current")
+        finally:
+            InfluxClient.close()
+            rate_limiter.report()
+            log_summary()
     else:
         logger.info("It's dark outside, no need to collect data")
@@ -0,0 +1,213 @@
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, tzinfo
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
+
+import pytz
+from loguru import logger
+from requests import RequestException
+
+from solaredge_influxdb.app import (
+    add_meter_points,
+    add_telemetry_points,
+    use_rate_limiter,
+    use_response_cache,
+    use_session,
+    use_spool,
+)
+from solaredge_influxdb.solaredge import (
+    Equipment,
+    Meter,
+    MeterDataResponse,
+    TelemetryData,
+    TelemetryRecord,
+    TelemetryRecords,
+    TelemetryResponse,
+    MAX_METER_DATA_RANGE,
+    MAX_TECHNICAL_DATA_RANGE,
+    DEFAULT_CACHE_DIR,
+)
+from solaredge_influxdb.influxdb import InfluxDBClient
+from solaredge_influxdb.metrics import log_summary
+from solaredge_influxdb.schema import DEFAULT_SCHEMA, Schema, get_schema
+
+# (kind, serial number or None for all meters, chunk start, chunk end)
+Chunk = Tuple[str, Optional[str], datetime, datetime]
+ChunkData = Union[TelemetryResponse, TelemetryRecords, Iterator[Union[TelemetryData, TelemetryRecord]], MeterDataResponse]
+
+
+def split_range(start_time: datetime, end_time: datetime, max_range: timedelta) -> List[Tuple[datetime, datetime]]:
+    """Split a time range into consecutive chunks no longer than max_range"""
+    chunks = []
+    while start_time < end_time:
+        chunk_end = min(start_time + max_range, end_time)
+        chunks.append((start_time, chunk_end))
+        start_time = chunk_end
+    return chunks
+
+
+class Checkpoint:
+    """Record the backfill chunks that were written to InfluxDB so an interrupted backfill can resume"""
+
+    def __init__(self, path: str = "backfill.json"):
+        self.path = path
+        self.done: Set[str] = set()
+        if os.path.isfile(path):
+            with open(path, "r") as f:
+                self.done = set(json.load(f))
+
+    @staticmethod
+    def key(chunk: Chunk) -> str:
+        kind, serial_number, start_time, end_time = chunk
+        return f"{kind}:{serial_number or '*'}:{start_time.isoformat()}:{end_time.isoformat()}"
+
+    def is_done(self, chunk: Chunk) -> bool:
+        return self.key(chunk) in self.done
+
+    def mark_done(self, chunk: Chunk) -> None:
+        """Record a finished chunk, replacing the checkpoint file atomically"""
+        self.done.add(self.key(chunk))
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(sorted(self.done), f)
+        os.replace(tmp_path, self.path)
+
+
+def backfill(
+    start: Union[str, datetime],
+    end: Union[str, datetime, None] = None,
+    config_path: str = "./solaredge_influxdb/config.toml",
+    api_key: str = os.getenv("API_KEY"),
+    timezone_str: str = "Europe/Amsterdam",
+    batch_size: int = 5000,
+    write_queue_size: int = 16,
+    spool_dir: str = "spool",
+    spool_max_size: int = 512,
+    spool_fsync: str = "rotate",
+    max_workers: int = 3,
+    request_budget: Optional[int] = None,  # Maximum number of SolarEdge requests for this run
+    checkpoint_path: str = "backfill.json",
+    meters: bool = True,
+    daily_quota: int = 300,
+    quota_path: str = "quota.json",
+    cache_dir: str = DEFAULT_CACHE_DIR,
+    clear_cache: bool = False,
+    stream: bool = True,
+    full_models: bool = False,
+    schema: str = "split",
+    bucket: str = "solar",
+    request_timeout: float = 60.0,
+):
+    """Import the history between start and end, split into chunks the SolarEdge API accepts.
+    Chunks already recorded in the checkpoint file are skipped, so running the same backfill
+    again continues where an interrupted or budget-limited run stopped. With stream enabled the
+    requests run in parallel, but each response body is decoded while its telemetries are written."""
+    _timezone = pytz.timezone(timezone_str)
+    start_time = _localize(start, _timezone)
+    end_time = _localize(end, _timezone) if end is not None else datetime.now(_timezone)
+
+    rate_limiter = use_rate_limiter(daily_quota, quota_path)
+    use_response_cache(cache_dir, clear_cache)
+    use_session(max_workers, request_timeout)
+    InfluxClient = InfluxDBClient(
+        config_path, batch_size, write_queue_size, use_spool(spool_dir, spool_max_size, spool_fsync)
+    )
+    InfluxClient.replay_spool()
+    EquipmentClient = Equipment(api_key)
+    MeterClient = Meter(api_key) if meters else None
+    inverters = {inverter.serialNumber: inverter for inverter in EquipmentClient.inverters}
+    checkpoint = Checkpoint(checkpoint_path)
+    layout = get_schema(schema, bucket)
+
+    chunks: List[Chunk] = [
+        ("inverter", serial_number, chunk_start, chunk_end)
+        for serial_number in inverters
+        for chunk_start, chunk_end in split_range(start_time, end_time, MAX_TECHNICAL_DATA_RANGE)
+    ]
+    if MeterClient is not None:
+        chunks += [
+            ("meters", None, chunk_start, chunk_end)
+            for chunk_start, chunk_end in split_range(start_time, end_time, MAX_METER_DATA_RANGE)
+        ]
+    pending = [chunk for chunk in chunks if not checkpoint.is_done(chunk)]
+    logger.info(f"Backfilling {len(pending)} of {len(chunks)} chunks between {start_time} and {end_time}")
+    if request_budget is not None and len(pending) > request_budget:
+        logger.warning(f"Request budget allows {request_budget} of {len(pending)} chunks, run again to continue")
+        pending = pending[:request_budget]
+
+    get_technical_data = EquipmentClient.get_technical_data_stream if stream else EquipmentClient.get_technical_data
+
+    def fetch(chunk: Chunk) -> Optional[ChunkData]:
+        kind, serial_number, chunk_start, chunk_end = chunk
+        try:
+            if kind == "inverter":
+                return get_technical_data(serial_number, chunk_start, chunk_end, full_models=full_models)
+            return MeterClient.get_meters_data(chunk_start, chunk_end, time_unit="QUARTER_OF_AN_HOUR")
+        except (RequestException, ValueError) as e:
+            logger.error(f"Request for {kind} {serial_number or ''} data failed: {e}")
+            return None
+
+    failed = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Keep a bounded number of chunks in flight so fetched data doesn't pile up in memory
+            in_flight: Dict[Future, Chunk] = {}
+            queue = iter(pending)
+            while True:
+                for chunk in queue:
+                    in_flight[executor.submit(fetch, chunk)] = chunk
+                    if len(in_flight) >= 2 * max_workers:
+                        break
+                if not in_flight:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    chunk = in_flight.pop(future)
+                    written = _write_chunk(InfluxClient, chunk, future.result(), inverters, _timezone, stream, layout)
+                    # Only record the chunk once InfluxDB acknowledged it, so failed writes are retried next run
+                    if not InfluxClient.drain() or not written:
+                        failed += 1
+                        continue
+                    checkpoint.mark_done(chunk)
+    finally:
+        InfluxClient.close()
+        rate_limiter.report()
+        log_summary()
+    logger.info(f"Backfill finished, {len(pending) - failed} chunks written and {failed} failed")
+
+
+def _localize(value: Union[str, datetime], _timezone: tzinfo) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        return _timezone.localize(value)
+    return value.astimezone(_timezone)
+
+
+def _write_chunk(
+    InfluxClient: InfluxDBClient,
+    chunk: Chunk,
+    data: Optional[ChunkData],
+    inverters: Dict,
+    _timezone: tzinfo,
+    stream: bool,
+    schema: Schema = DEFAULT_SCHEMA,
+) -> bool:
+    kind, serial_number, chunk_start, chunk_end = chunk
+    if data is None:
+        logger.error(f"Failed to retrieve {kind} data between {chunk_start} and {chunk_end}")
+        return False
+    if kind == "inverter":
+        try:
+            for telemetry in data if stream else data.telemetries:
+                add_telemetry_points(
+                    InfluxClient, inverters[serial_number], telemetry, _timezone.localize(telemetry.date), schema
+                )
+        except (RequestException, ValueError) as e:
+            logger.error(f"Reading {kind} data between {chunk_start} and {chunk_end} failed: {e}")
+            return False
+    else:
+        for meter in data.meterEnergyDetails.meters:
+            add_meter_points(InfluxClient, meter, _timezone, schema)
+    return True
@@ -0,0 +1,84 @@
+import math
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from astral import Observer
+from astral.sun import elevation as get_elevation, noon as get_noon
+from loguru import logger
+
+
+class AdaptiveCadence:
+    """Interval between collections that follows the production of the day: dense around the peak and
+    sparse at dawn and dusk. The activity of a moment is the sine of the sun elevation relative to its
+    value at solar noon, averaged with the latest power relative to the highest power seen. When the
+    rest of the day at that cadence doesn't fit in the remaining requests, every interval is stretched."""
+
+    def __init__(
+        self,
+        observer: Observer,
+        min_interval: timedelta = timedelta(minutes=5),
+        max_interval: timedelta = timedelta(minutes=60),
+        step: timedelta = timedelta(minutes=10),  # Resolution of the projection of the rest of the day
+    ):
+        self.observer = observer
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.step = step
+        self.power: Optional[float] = None
+        self.peak_power = 0.0
+        self.requests_per_run: Optional[float] = None
+        self._noon_elevations: Dict[date, float] = {}
+
+    def record(self, power: Optional[float], requests: int) -> None:
+        """Remember the power in W and the number of SolarEdge requests of the last collection"""
+        if power is not None:
+            self.power = power
+            self.peak_power = max(self.peak_power, power)
+        if requests > 0:
+            previous = self.requests_per_run
+            self.requests_per_run = requests if previous is None else (previous + requests) / 2
+
+    def sun_activity(self, moment: datetime) -> float:
+        """Sine of the sun elevation relative to its sine at solar noon, 0 with the sun below the horizon"""
+        elevation = get_elevation(self.observer, moment)
+        if elevation <= 0:
+            return 0.0
+        day = moment.astimezone(timezone.utc).date()
+        noon_elevation = self._noon_elevations.get(day)
+        if noon_elevation is None:
+            noon_elevation = get_elevation(self.observer, get_noon(self.observer, day))
+            self._noon_elevations = {day: noon_elevation}
+        return min(1.0, math.sin(math.radians(elevation)) / math.sin(math.radians(max(noon_elevation, elevation))))
+
+    def activity(self, moment: datetime) -> float:
+        """Activity between 0 and 1, from the sun and, once a collection reported it, the power"""
+        sun = self.sun_activity(moment)
+        if self.power is None or self.peak_power <= 0:
+            return sun
+        return (sun + min(self.power / self.peak_power, 1.0)) / 2
+
+    def interval(self, activity: float) -> timedelta:
+        """Interpolate the collection rate between the slowest and fastest cadence"""
+        slowest = 1 / self.max_interval.total_seconds()
+        fastest = 1 / self.min_interval.total_seconds()
+        return timedelta(seconds=1 / (slowest + activity * (fastest - slowest)))
+
+    def next_interval(self, current_time: datetime, day_end: datetime, remaining: Optional[int] = None) -> timedelta:
+        """Get the interval to the next collection. remaining is the number of requests left until the
+        quota resets; the rest of the day, until day_end or the reset at midnight UTC, is paced to fit."""
+        interval = self.interval(self.activity(current_time))
+        if remaining is None or self.requests_per_run is None:
+            return interval
+        if remaining <= 0:
+            return self.max_interval
+        reset = datetime.combine(current_time.astimezone(timezone.utc).date() + timedelta(days=1), datetime.min.time())
+        end = min(day_end, reset.replace(tzinfo=timezone.utc))
+        runs, moment = 0.0, current_time
+        while moment < end:
+            runs += self.step / self.interval(self.sun_activity(moment))
+            moment += self.step
+        needed = runs * self.requests_per_run
+        if needed > remaining:
+            logger.debug(f"Stretching the collection interval to fit {needed:.0f} requests in the {remaining} left")
+            interval *= needed / remaining
+        return max(interval, self.min_interval)
@@ -0,0 +1,258 @@
+import os
+import signal
+import threading
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import List, Optional
+
+from astral import Observer
+import pytz
+from loguru import logger
+
+from solaredge_influxdb.app import (
+    collect,
+    collect_sites,
+    get_daylight_window,
+    get_meter_client,
+    setup_sites,
+    use_rate_limiter,
+    use_change_detector,
+    use_response_cache,
+    use_session,
+    use_spool,
+)
+from solaredge_influxdb.cadence import AdaptiveCadence
+from solaredge_influxdb.daylight import (
+    DEFAULT_LATITUDE,
+    DEFAULT_LONGITUDE,
+    DEFAULT_MARGIN,
+    DEFAULT_TIMEZONE,
+    DaylightCalendar,
+    get_calendar,
+)
+from solaredge_influxdb.solaredge import Equipment, SiteData, DEFAULT_CACHE_DIR
+from solaredge_influxdb.influxdb import InfluxDBClient
+from solaredge_influxdb.metrics import serve_metrics
+from solaredge_influxdb.schema import get_schema
+from solaredge_influxdb.state import StateStore
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def next_tick(current_time: datetime, interval: timedelta) -> datetime:
+    """Get the first moment after current_time that is aligned to the interval"""
+    return EPOCH + ((current_time - EPOCH) // interval + 1) * interval
+
+
+def next_collection_time(
+    observer: Observer,
+    current_time: datetime,
+    _timezone: tzinfo,
+    interval: timedelta,
+    additional_time_window: int,
+    force: bool = False,
+    calendar: Optional[DaylightCalendar] = None,
+) -> datetime:
+    """Get the next aligned collection moment, skipping the night unless force is enabled.
+    Sunrise and sunset come from the daylight calendar, computed with astral only when it lacks a date."""
+    tick = next_tick(current_time, interval)
+    if force:
+        return tick
+    margin = timedelta(minutes=additional_time_window)
+    local_date = tick.astimezone(_timezone).date()
+    while True:
+        sunrise, sunset = get_daylight_window(observer, local_date, _timezone, calendar=calendar)
+        if tick <= sunrise - margin:
+            tick = next_tick(sunrise - margin, interval)
+        if tick < sunset + margin:
+            return tick
+        local_date += timedelta(days=1)
+
+
+def next_adaptive_time(
+    cadence: AdaptiveCadence,
+    observer: Observer,
+    current_time: datetime,
+    _timezone: tzinfo,
+    additional_time_window: int,
+    remaining: Optional[int] = None,
+    force: bool = False,
+    calendar: Optional[DaylightCalendar] = None,
+) -> datetime:
+    """Get the next collection moment of the adaptive cadence, aligned to its shortest interval.
+    Outside the daylight window this is the first collection once the window opens."""
+    local_date = current_time.astimezone(_timezone).date()
+    sunrise, sunset = get_daylight_window(observer, local_date, _timezone, calendar=calendar)
+    margin = timedelta(minutes=additional_time_window)
+    if force:
+        day_end = current_time + timedelta(days=1)
+    elif sunrise - margin < current_time < sunset + margin:
+        day_end = sunset + margin
+    else:
+        return next_collection_time(
+            observer, current_time, _timezone, cadence.min_interval, additional_time_window, calendar=calendar
+        )
+    # The next aligned tick after this moment is at most the computed interval away
+    earliest = current_time + cadence.next_interval(current_time, day_end, remaining) - cadence.min_interval
+    return next_collection_time(
+        observer, earliest, _timezone, cadence.min_interval, additional_time_window, force, calendar
+    )
+
+
+def _install_signal_handlers(stop_event: threading.Event) -> None:
+    """Stop the daemon on SIGTERM and SIGINT"""
+    if threading.current_thread() is not threading.main_thread():
+        return
+
+    def handle_signal(signum, frame):
+        logger.info(f"Received {signal.Signals(signum).name}, shutting down")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+
+def daemon(
+    config_path: str = "./solaredge_influxdb/config.toml",
+    latitude: float = os.getenv("LATITUDE", DEFAULT_LATITUDE),
+    longitude: float = os.getenv("LONGITUDE", DEFAULT_LONGITUDE),
+    api_key: str = os.getenv("API_KEY"),
+    additional_time_window: int = DEFAULT_MARGIN,
+    timezone_str: str = DEFAULT_TIMEZONE,
+    timewindow: int = 15,  # Collection interval in minutes, every run collects the preceding interval
+    force: bool = False,
+    batch_size: int = 5000,
+    write_queue_size: int = 16,
+    spool_dir: str = "spool",
+    spool_max_size: int = 512,
+    spool_fsync: str = "rotate",
+    max_workers: int = 3,
+    state_path: str = "state.json",
+    daily_quota: int = 300,
+    quota_path: str = "quota.json",
+    cache_dir: str = DEFAULT_CACHE_DIR,
+    clear_cache: bool = False,
+    stream: bool = False,
+    full_models: bool = False,
+    schema: str = "split",
+    bucket: str = "solar",
+    meters: bool = True,
+    all_sites: bool = False,
+    site_data: bool = False,
+    request_timeout: float = 60.0,
+    dedup: bool = False,
+    heartbeat: int = 30,
+    deadband: Optional[List[str]] = None,
+    dedup_path: str = "dedup.json",
+    adaptive: bool = False,
+    min_interval: int = 5,  # Shortest interval of the adaptive cadence in minutes
+    max_interval: int = 60,  # Longest interval of the adaptive cadence in minutes
+    metrics_port: Optional[int] = None,  # Port of the Prometheus metrics endpoint, None to disable it
+    stop_event: Optional[threading.Event] = None,
+):
+    """Keep the SolarEdge and InfluxDB clients alive and collect every timewindow minutes,
+    sleeping through the night until the daylight window opens again. With adaptive the interval
+    follows the sun and the production instead, between min_interval and max_interval minutes."""
+    observer = Observer(latitude=latitude, longitude=longitude)
+    _timezone = pytz.timezone(timezone_str)
+    interval = timedelta(minutes=timewindow)
+    cadence = (
+        AdaptiveCadence(observer, timedelta(minutes=min_interval), timedelta(minutes=max_interval)) if adaptive else None
+    )
+    if stop_event is None:
+        stop_event = threading.Event()
+    _install_signal_handlers(stop_event)
+
+    rate_limiter = use_rate_limiter(daily_quota, quota_path)
+    use_response_cache(cache_dir, clear_cache)
+    use_session(max_workers, request_timeout)
+    detector = use_change_detector(dedup_path, heartbeat, deadband) if dedup else None
+    InfluxClient = InfluxDBClient(
+        config_path, batch_size, write_queue_size, use_spool(spool_dir, spool_max_size, spool_fsync)
+    )
+    state = StateStore(state_path)
+    metrics_server = serve_metrics(metrics_port) if metrics_port is not None else None
+    layout = get_schema(schema, bucket)
+    EquipmentClient = None
+    MeterClient = None
+    sites = []
+    SiteDataClient = None
+    calendar = None
+    try:
+        while not stop_event.is_set():
+            current_time = datetime.now(timezone.utc)
+            if calendar is None or not calendar.covers(current_time):
+                calendar = get_calendar(latitude, longitude, timezone_str, cache_dir, current_time)
+            if cadence is not None:
+                collection_time = next_adaptive_time(
+                    cadence,
+                    observer,
+                    current_time,
+                    _timezone,
+                    additional_time_window,
+                    rate_limiter.remaining,
+                    force,
+                    calendar,
+                )
+            else:
+                collection_time = next_collection_time(
+                    observer, current_time, _timezone, interval, additional_time_window, force, calendar
+                )
+            logger.info(f"Next collection at {collection_time.astimezone(_timezone)}")
+            if stop_event.wait(max((collection_time - datetime.now(timezone.utc)).total_seconds(), 0)):
+                break
+            used = rate_limiter.used
+            try:
+                if all_sites:
+                    if not sites:
+                        sites = setup_sites(api_key, state_path, meters, max_workers)
+                        SiteDataClient = SiteData(api_key, [site.site_id for site in sites]) if site_data and sites else None
+                    power = collect_sites(
+                        sites,
+                        InfluxClient,
+                        collection_time,
+                        timewindow,
+                        _timezone,
+                        max_workers,
+                        stream,
+                        full_models,
+                        layout,
+                        SiteDataClient,
+                        detector,
+                    )
+                    rate_limiter.report()
+                    if cadence is not None:
+                        cadence.record(power, rate_limiter.used - used)
+                    continue
+                if EquipmentClient is None:
+                    EquipmentClient = Equipment(api_key)
+                if meters and MeterClient is None:
+                    # Retried every interval, a failing meter client only drops the meter data
+                    MeterClient = get_meter_client(api_key)
+                if site_data and SiteDataClient is None:
+                    SiteDataClient = SiteData(api_key, [EquipmentClient.site_id])
+                power = collect(
+                    EquipmentClient,
+                    InfluxClient,
+                    collection_time,
+                    timewindow,
+                    _timezone,
+                    max_workers,
+                    state,
+                    stream,
+                    full_models,
+                    layout,
+                    MeterClient,
+                    SiteDataClient,
+                    detector,
+                )
+                rate_limiter.report()
+                if cadence is not None:
+                    cadence.record(power, rate_limiter.used - used)
+            except Exception:
+                logger.exception("Collection failed, retrying at the next interval")
+    finally:
+        logger.info("Daemon stopped, flushing pending data")
+        if metrics_server is not None:
+            metrics_server.shutdown()
+            metrics_server.server_close()
+        InfluxClient.close()
@@ -0,0 +1,171 @@
+import json
+import os
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from typing import List, Optional, Tuple
+
+from loguru import logger
+
+from solaredge_influxdb.solaredge.cache import DEFAULT_CACHE_DIR
+
+# Defaults of the location, shared with app() and the daemon
+DEFAULT_LATITUDE = 52.3676
+DEFAULT_LONGITUDE = 4.9041
+DEFAULT_TIMEZONE = "Europe/Amsterdam"
+# Minutes before sunrise and after sunset in which data is still collected
+DEFAULT_MARGIN = 60
+# Days precomputed per calendar file, a run past the last day builds a new one
+CALENDAR_DAYS = 400
+
+
+class DaylightCalendar:
+    """Sunrise and sunset per local date of one location, precomputed with astral and stored as JSON,
+    so checking whether the sun is up only reads a small file. Windows are UTC epoch seconds; a date
+    without sunrise or sunset, such as a polar day or night, has no window."""
+
+    def __init__(self, start: date, windows: List[Optional[Tuple[int, int]]]):
+        self.start = start
+        self.windows = windows
+
+    @classmethod
+    def build(
+        cls, latitude: float, longitude: float, timezone_str: str, start: date, days: int = CALENDAR_DAYS
+    ) -> "DaylightCalendar":
+        """Compute the daylight windows of days local dates, starting at start"""
+        from astral import Observer
+        from astral.sun import sunrise as get_sunrise, sunset as get_sunset
+        import pytz
+
+        observer = Observer(latitude=latitude, longitude=longitude)
+        _timezone = pytz.timezone(timezone_str)
+        windows: List[Optional[Tuple[int, int]]] = []
+        for day in range(days):
+            local_date = start + timedelta(days=day)
+            try:
+                sunrise = get_sunrise(observer, date=local_date, tzinfo=_timezone)
+                sunset = get_sunset(observer, date=local_date, tzinfo=_timezone)
+                windows.append((int(sunrise.timestamp()), int(sunset.timestamp())))
+            except ValueError:
+                windows.append(None)
+        return cls(start, windows)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["DaylightCalendar"]:
+        """Load a calendar file, None when it is missing or unreadable"""
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            return cls(
+                date.fromisoformat(data["start"]),
+                [tuple(window) if window is not None else None for window in data["windows"]],
+            )
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable daylight calendar {path}: {e}")
+            return None
+
+    def save(self, path: str) -> None:
+        """Write the calendar, replacing the previous file atomically"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"start": self.start.isoformat(), "windows": self.windows}, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def covers(self, current_time: datetime) -> bool:
+        """Whether the calendar has the dates around current_time"""
+        day = (current_time.astimezone(timezone.utc).date() - self.start).days
+        return 1 <= day and day + 1 < len(self.windows)
+
+    def window(self, local_date: date, _timezone: tzinfo) -> Optional[Tuple[datetime, datetime]]:
+        """Sunrise and sunset of a local date in _timezone, None when the date isn't covered or has no window"""
+        day = (local_date - self.start).days
+        if not 0 <= day < len(self.windows) or self.windows[day] is None:
+            return None
+        sunrise, sunset = self.windows[day]
+        return datetime.fromtimestamp(sunrise, _timezone), datetime.fromtimestamp(sunset, _timezone)
+
+    def is_daylight(
+        self, current_time: datetime, margin: timedelta = timedelta(minutes=DEFAULT_MARGIN)
+    ) -> Optional[bool]:
+        """Whether current_time is between sunrise and sunset, widened by margin. None when the
+        calendar can't tell: the time isn't covered or a nearby date has no sunrise or sunset."""
+        # The local date is at most a day away from the UTC date, check the windows around it
+        if not self.covers(current_time):
+            return None
+        day = (current_time.astimezone(timezone.utc).date() - self.start).days
+        windows = self.windows[day - 1 : day + 2]
+        if any(window is None for window in windows):
+            return None
+        now = current_time.timestamp()
+        seconds = margin.total_seconds()
+        return any(sunrise - seconds < now < sunset + seconds for sunrise, sunset in windows)
+
+
+def calendar_path(directory: str, latitude: float, longitude: float, timezone_str: str) -> str:
+    """Get the calendar file of a location"""
+    name = f"daylight-{latitude:.4f}-{longitude:.4f}-{timezone_str.replace('/', '_')}.json"
+    return os.path.join(directory, name)
+
+
+def load_calendar(
+    latitude: float,
+    longitude: float,
+    timezone_str: str = DEFAULT_TIMEZONE,
+    directory: str = DEFAULT_CACHE_DIR,
+    current_time: Optional[datetime] = None,
+) -> DaylightCalendar:
+    """Load the calendar of a location, building and storing a new one when it is missing or
+    doesn't cover current_time"""
+    if current_time is None:
+        current_time = datetime.now(timezone.utc)
+    path = calendar_path(directory, latitude, longitude, timezone_str)
+    calendar = DaylightCalendar.load(path)
+    if calendar is not None and calendar.covers(current_time):
+        return calendar
+    logger.debug(f"Computing the daylight calendar {path}")
+    calendar = DaylightCalendar.build(latitude, longitude, timezone_str, current_time.date() - timedelta(days=1))
+    try:
+        calendar.save(path)
+    except OSError as e:
+        logger.warning(f"Storing the daylight calendar {path} failed: {e}")
+    return calendar
+
+
+def get_calendar(
+    latitude: float,
+    longitude: float,
+    timezone_str: str = DEFAULT_TIMEZONE,
+    directory: Optional[str] = None,
+    current_time: Optional[datetime] = None,
+) -> Optional[DaylightCalendar]:
+    """Load the calendar of a location like load_calendar, None when it can't be loaded or built"""
+    try:
+        return load_calendar(float(latitude), float(longitude), timezone_str, directory or DEFAULT_CACHE_DIR, current_time)
+    except Exception as e:
+        logger.warning(f"Daylight calendar unavailable, computing sunrise and sunset instead: {e}")
+        return None
+
+
+def is_night(
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    directory: Optional[str] = None,
+    timezone_str: str = DEFAULT_TIMEZONE,
+    margin: int = DEFAULT_MARGIN,
+    current_time: Optional[datetime] = None,
+) -> bool:
+    """Whether it is certainly dark at the location, from the daylight calendar. False whenever the
+    calendar can't tell, leaving the decision to the full daylight check of app()."""
+    if latitude is None:
+        latitude = float(os.getenv("LATITUDE", DEFAULT_LATITUDE))
+    if longitude is None:
+        longitude = float(os.getenv("LONGITUDE", DEFAULT_LONGITUDE))
+    if current_time is None:
+        current_time = datetime.now(timezone.utc)
+    try:
+        calendar = load_calendar(latitude, longitude, timezone_str, directory or DEFAULT_CACHE_DIR, current_time)
+    except Exception as e:
+        logger.warning(f"Daylight calendar unavailable, checking the daylight window in full: {e}")
+        return False
+    return calendar.is_daylight(current_time, timedelta(minutes=margin)) is False
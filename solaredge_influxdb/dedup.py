@@ -0,0 +1,130 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from solaredge_influxdb.influxdb.line_protocol import FieldValue
+from solaredge_influxdb.schema import PHASE_FIELDS, TELEMETRY_FIELDS
+
+# Largest change of a field, in the unit written to InfluxDB, that still counts as unchanged.
+# Fields missing here, such as the energy and power, must be exactly equal.
+DEFAULT_DEADBANDS: Dict[str, float] = {
+    "dc_voltage": 1.0,
+    "voltage_l1_to_2": 0.5,
+    "voltage_l2_to_3": 0.5,
+    "voltage_l3_to_1": 0.5,
+    "ac_voltage": 0.5,
+    "ac_current": 0.05,
+    "ac_frequency": 0.02,
+    "cos_phi": 0.01,
+}
+
+# Fields, tags and date of the last point written for a key
+LastPoint = Tuple[datetime, Dict[str, FieldValue], Tuple[Tuple[str, str], ...]]
+
+
+def parse_deadbands(values: Sequence[str]) -> Dict[str, float]:
+    """Parse field=deadband pairs, e.g. from the command line"""
+    deadbands = {}
+    for value in values:
+        field, separator, deadband = value.partition("=")
+        if not separator:
+            raise ValueError(f"Deadband {value} must be given as field=value")
+        deadbands[field.strip()] = float(deadband)
+    return deadbands
+
+
+class ChangeDetector:
+    """Skip telemetry points that didn't change since the last point written for the same inverter,
+    bucket and phase. A point changed when a field moved more than its deadband, a field or tag
+    appeared, disappeared or changed, or heartbeat passed since the last point written, so a quiet
+    inverter still shows up in InfluxDB and a gap means the data is missing.
+
+    Points are compared to the last point written, not the last one seen, so slow drift still gets
+    written once it exceeds the deadband. Written points are pending until commit, after InfluxDB
+    acknowledged them; rollback forgets them so they are written again when collected again.
+    Rows have to be offered in chronological order per inverter."""
+
+    def __init__(
+        self,
+        deadbands: Optional[Dict[str, float]] = None,
+        heartbeat: timedelta = timedelta(minutes=30),
+        path: Optional[str] = None,  # File keeping the last points between runs, None keeps them in memory only
+    ):
+        deadbands = {**DEFAULT_DEADBANDS, **(deadbands or {})}
+        unknown = set(deadbands) - set(TELEMETRY_FIELDS) - set(PHASE_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields in deadbands: {', '.join(sorted(unknown))}")
+        self.deadbands = deadbands
+        self.heartbeat = heartbeat
+        self.path = path
+        self._lock = threading.Lock()
+        self._last: Dict[str, LastPoint] = self._load()
+        self._pending: Dict[str, LastPoint] = {}
+
+    def _load(self) -> Dict[str, LastPoint]:
+        if self.path is None or not os.path.isfile(self.path):
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                return {
+                    key: (datetime.fromisoformat(moment), fields, tuple(tuple(tag) for tag in tags))
+                    for key, (moment, fields, tags) in json.load(f).items()
+                }
+        except (ValueError, TypeError) as e:
+            logger.error(f"Ignoring unreadable change detection file {self.path}: {e}")
+            return {}
+
+    @staticmethod
+    def key(serial_number: str, bucket: str, phase: Optional[str] = None) -> str:
+        return f"{serial_number}/{bucket}/{phase}" if phase else f"{serial_number}/{bucket}"
+
+    def _differs(self, field: str, value: FieldValue, last: FieldValue) -> bool:
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not isinstance(last, (int, float)):
+            return value != last
+        return abs(value - last) > self.deadbands.get(field, 0.0)
+
+    def changed(
+        self,
+        key: str,
+        moment: datetime,
+        fields: List[Tuple[str, FieldValue]],
+        tags: Tuple[Tuple[str, str], ...] = (),
+    ) -> bool:
+        """Whether the point has to be written, remembering it as the last point of key when it does"""
+        values = dict(fields)
+        with self._lock:
+            last = self._pending.get(key) or self._last.get(key)
+            if last is not None:
+                last_moment, last_values, last_tags = last
+                unchanged = (
+                    moment - last_moment < self.heartbeat
+                    and tuple(tags) == last_tags
+                    and values.keys() == last_values.keys()
+                    and not any(self._differs(field, value, last_values[field]) for field, value in values.items())
+                )
+                if unchanged:
+                    return False
+            self._pending[key] = (moment, values, tuple(tags))
+            return True
+
+    def commit(self) -> None:
+        """Keep the pending points as the last points written, saving them when there is a path"""
+        with self._lock:
+            self._last.update(self._pending)
+            self._pending = {}
+            last = {key: (moment.isoformat(), values, tags) for key, (moment, values, tags) in self._last.items()}
+        if self.path is None:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(last, f)
+        os.replace(tmp_path, self.path)
+
+    def rollback(self) -> None:
+        """Forget the pending points, after InfluxDB didn't acknowledge them"""
+        with self._lock:
+            self._pending = {}
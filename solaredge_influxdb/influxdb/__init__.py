@@ -1 +1,13 @@
-from .client import InfluxDBClient
+from .line_protocol import LineProtocolSerializer
+from .pipeline import DrainResult, WritePipeline
+from .spool import Spool
+
+
+def __getattr__(name: str):
+    # The client imports influxdb_client, load it only when it is used
+    if name == "InfluxDBClient":
+        from .client import InfluxDBClient
+
+        globals()["InfluxDBClient"] = InfluxDBClient
+        return InfluxDBClient
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,42 +1,122 @@
+import threading
+from collections import defaultdict
 from datetime import datetime
 import influxdb_client
+from influxdb_client import WritePrecision
 from influxdb_client.client.write_api import SYNCHRONOUS
-from typing import Union, List, Tuple, Optional
+from typing import Any, Iterable, Tuple, Optional, Dict
 from loguru import logger
 
+from solaredge_influxdb.metrics import get_registry
+from .line_protocol import FieldValue, LineProtocolSerializer
+from .pipeline import DrainResult, WritePipeline, is_retryable
+from .spool import Spool
+
 
 class InfluxDBClient:
-    def __init__(self, path: str):
+    def __init__(self, path: str, batch_size: int = 5000, write_queue_size: int = 16, spool: Optional[Spool] = None):
         self.client = influxdb_client.InfluxDBClient.from_config_file(path)
         self.write_api = self.client.write_api(write_options=SYNCHRONOUS)
+        self.batch_size = batch_size
+        # Batches that can't be written are kept on disk and replayed on the next run
+        self.spool = spool
+        # Batches are written by a background thread unless the queue size is 0
+        self.pipeline = (
+            WritePipeline(self.write_batch, write_queue_size, on_failure=spool.append if spool is not None else None)
+            if write_queue_size > 0
+            else None
+        )
+        # Line protocol with millisecond timestamps waiting to be written, per bucket
+        self.buffers: Dict[str, bytearray] = defaultdict(bytearray)
+        self.pending: Dict[str, int] = defaultdict(int)
+        # Batches spooled by synchronous writes since the last drain
+        self._spooled_since_drain = 0
+        # Sites collected concurrently share the buffers
+        self._lock = threading.RLock()
 
-    def write(self, data: Union[str, influxdb_client.Point], bucket: str) -> None:
-        """Write data to InfluxDB"""
-        if isinstance(data, str):
-            logger.debug("Writing record to InfluxDB bucket='{}': {}", bucket, data)
-        else:
-            logger.opt(lazy=True).debug(
-                "Writing record to InfluxDB bucket='{}': {}",
-                lambda: bucket,
-                lambda: data.to_line_protocol(),
-            )
-
-        self.write_api.write(bucket=bucket, record=data)
-
-    def convert_to_point(
+    def add_fields(
         self,
+        serializer: LineProtocolSerializer,
+        bucket: str,
         time: datetime,
-        measurement: str,
-        field_values: List[Tuple[str, Union[str, int, float]]],
-        tags: Optional[List[Tuple[str, str]]] = None,
-    ) -> influxdb_client.Point:
-        """Convert a dictionary to an InfluxDB point"""
-        if tags is None:
-            tags = []
-        point = influxdb_client.Point(measurement)
-        for fieldvalue in field_values:
-            point = point.field(fieldvalue[0], fieldvalue[1])
-        for tag in tags:
-            point = point.tag(tag[0], tag[1])
-        point.time(time, write_precision="ms")
-        return point
+        fields: Iterable[Tuple[str, FieldValue]],
+        tags: Iterable[Tuple[str, Any]] = (),
+    ) -> None:
+        """Serialize a point straight into the write buffer of a bucket, without building a Point"""
+        with self._lock:
+            self._added(bucket, serializer.serialize(self.buffers[bucket], time, fields, tags))
+
+    def _added(self, bucket: str, count: int) -> None:
+        self.pending[bucket] += count
+        if self.pending[bucket] >= self.batch_size:
+            self.flush(bucket)
+
+    def flush(self, bucket: Optional[str] = None) -> None:
+        """Write queued data to InfluxDB with one request per bucket"""
+        with self._lock:
+            buckets = [bucket] if bucket is not None else list(self.buffers)
+            for name in buckets:
+                buffer = self.buffers.get(name)
+                if not buffer:
+                    continue
+                logger.debug("Queueing {} records for InfluxDB bucket='{}'", self.pending[name], name)
+                payload = bytes(buffer)
+                buffer.clear()
+                get_registry().inc("influxdb_points_total", self.pending[name], bucket=name)
+                self.pending[name] = 0
+                if self.pipeline is not None:
+                    self.pipeline.submit(name, payload)
+                    continue
+                try:
+                    self.write_batch(name, payload)
+                except Exception as e:
+                    if self.spool is None or not is_retryable(e):
+                        raise
+                    logger.error(f"Writing to InfluxDB bucket '{name}' failed: {e}")
+                    self.spool.append(name, payload)
+                    self._spooled_since_drain += 1
+
+    def write_batch(self, bucket: str, payload: bytes) -> None:
+        """Write a batch of line protocol with millisecond timestamps to InfluxDB"""
+        registry = get_registry()
+        try:
+            with registry.time("influxdb_write_seconds", bucket=bucket):
+                self.write_api.write(bucket=bucket, record=payload, write_precision=WritePrecision.MS)
+        except Exception:
+            registry.inc("influxdb_batches_total", bucket=bucket, result="error")
+            raise
+        registry.inc("influxdb_batches_total", bucket=bucket, result="ok")
+        registry.inc("influxdb_batch_bytes_total", len(payload), bucket=bucket)
+
+    def replay_spool(self) -> bool:
+        """Write batches spooled by earlier failures, True when nothing is left in the spool"""
+        if self.spool is None or not self.spool:
+            return True
+        return self.spool.replay(self.write_batch)
+
+    def drain(self) -> DrainResult:
+        """Flush queued data and wait until it is written. True when no batch was lost; batches kept
+        in the spool are counted separately and logged, InfluxDB didn't accept them this run."""
+        self.flush()
+        with self._lock:
+            result = DrainResult(spooled=self._spooled_since_drain)
+            self._spooled_since_drain = 0
+        if self.pipeline is not None:
+            written = self.pipeline.drain()
+            result = DrainResult(written.failed, written.spooled + result.spooled)
+        if result.spooled:
+            logger.error(f"InfluxDB didn't accept {result.spooled} batches, they are spooled and written on the next run")
+        return result
+
+    def close(self) -> None:
+        """Flush queued data, wait for the writer and release the InfluxDB connection"""
+        try:
+            self.flush()
+        finally:
+            if self.pipeline is not None:
+                self.pipeline.close()
+            if self.spool is not None:
+                self.spool.close()
+            self.write_api.close()
+            self.client.close()
+
@@ -0,0 +1,101 @@
+import math
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple, Union
+
+FieldValue = Union[str, int, float, bool, None]
+
+_ESCAPE_MEASUREMENT = str.maketrans({",": r"\,", " ": r"\ ", "\n": r"\n", "\t": r"\t", "\r": r"\r"})
+_ESCAPE_KEY = str.maketrans({",": r"\,", "=": r"\=", " ": r"\ ", "\n": r"\n", "\t": r"\t", "\r": r"\r"})
+_ESCAPE_STRING = str.maketrans({'"': r"\"", "\\": r"\\"})
+
+
+def escape_key(key: str) -> str:
+    """Escape a tag key or field key"""
+    return key.translate(_ESCAPE_KEY)
+
+
+def escape_tag_value(value: Any) -> str:
+    """Escape a tag value, keeping a trailing backslash from escaping the separator after it"""
+    escaped = str(value).translate(_ESCAPE_KEY)
+    if escaped.endswith("\\"):
+        escaped += " "
+    return escaped
+
+
+def format_field_value(value: FieldValue) -> Optional[str]:
+    """Format a field value the way influxdb_client.Point does, None for values that can't be written"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return f"{value}i"
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            return None
+        formatted = repr(value)
+        return formatted[:-2] if formatted.endswith(".0") else formatted
+    if isinstance(value, str):
+        return f'"{value.translate(_ESCAPE_STRING)}"'
+    raise ValueError(f'Type: "{type(value)}" of field value {value!r} is not supported.')
+
+
+class LineProtocolSerializer:
+    """Serialize points of one measurement and static tag set, e.g. one inverter, straight into a
+    line-protocol buffer with millisecond timestamps. The measurement and static tags are escaped
+    once when the serializer is created; field keys and per-point tags are escaped once per value."""
+
+    def __init__(self, measurement: str, tags: Sequence[Tuple[str, Any]] = ()):
+        self.prefix = measurement.translate(_ESCAPE_MEASUREMENT) + "".join(
+            f",{escape_key(key)}={escape_tag_value(value)}" for key, value in tags if value is not None and value != ""
+        )
+        self._tags: Dict[Tuple[str, Any], str] = {}
+        self._keys: Dict[str, str] = {}
+
+    def _tag(self, key: str, value: Any) -> str:
+        tag = self._tags.get((key, value))
+        if tag is None:
+            tag = "" if value is None or value == "" else f",{escape_key(key)}={escape_tag_value(value)}"
+            self._tags[(key, value)] = tag
+        return tag
+
+    def _key(self, key: str) -> str:
+        escaped = self._keys.get(key)
+        if escaped is None:
+            escaped = self._keys[key] = escape_key(key)
+        return escaped
+
+    def line(
+        self,
+        time: datetime,
+        fields: Iterable[Tuple[str, FieldValue]],
+        tags: Iterable[Tuple[str, Any]] = (),
+    ) -> Optional[str]:
+        """Serialize one point, None when none of its fields has a value"""
+        field_set = []
+        for key, value in fields:
+            formatted = format_field_value(value)
+            if formatted is not None:
+                field_set.append(f"{self._key(key)}={formatted}")
+        if not field_set:
+            return None
+        timestamp = int(time.timestamp()) * 1000 + time.microsecond // 1000
+        tag_set = "".join(self._tag(key, value) for key, value in tags)
+        return f"{self.prefix}{tag_set} {','.join(field_set)} {timestamp}"
+
+    def serialize(
+        self,
+        buffer: bytearray,
+        time: datetime,
+        fields: Iterable[Tuple[str, FieldValue]],
+        tags: Iterable[Tuple[str, Any]] = (),
+    ) -> int:
+        """Append one point to buffer, returning the number of lines written"""
+        line = self.line(time, fields, tags)
+        if line is None:
+            return 0
+        if buffer:
+            buffer += b"\n"
+        buffer += line.encode()
+        return 1
+
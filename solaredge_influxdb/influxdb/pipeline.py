@@ -0,0 +1,161 @@
+import queue
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, NamedTuple, Optional, Tuple
+
+from loguru import logger
+
+from solaredge_influxdb.metrics import get_registry
+
+# Batch of line protocol for one bucket
+Batch = Tuple[str, bytes]
+
+_STOP = object()
+
+
+class DrainResult(NamedTuple):
+    """Batches handled since the previous drain that didn't reach InfluxDB. True when none was lost;
+    spooled batches are written on a later run, but InfluxDB didn't accept them now."""
+
+    failed: int = 0  # Lost, their data has to be collected again
+    spooled: int = 0  # Kept in the spool
+
+    def __bool__(self) -> bool:
+        return self.failed == 0
+
+
+def is_retryable(error: Exception) -> bool:
+    """Retry connection problems, rate limiting and server errors, not rejected data"""
+    status = getattr(error, "status", None)
+    return status is None or status == 429 or status >= 500
+
+
+class WritePipeline:
+    """Write batches to InfluxDB from a background thread, so collection continues while InfluxDB
+    acknowledges earlier writes. The queue is bounded: once it is full, submit blocks the producer
+    until the writer catches up. Failed writes are retried with exponential backoff and jitter."""
+
+    def __init__(
+        self,
+        write: Callable[[str, bytes], None],
+        max_queue: int = 16,  # Batches waiting to be written before submit blocks
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        on_failure: Optional[Callable[[str, bytes], None]] = None,  # Keeps batches that can be retried later, e.g. a spool
+    ):
+        self.write = write
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.on_failure = on_failure
+        self.queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self.latencies: Deque[float] = deque(maxlen=1000)
+        self.written = 0
+        self.retries = 0
+        self.failed = 0
+        self.spooled = 0
+        self.blocked = 0
+        self.high_water = 0
+        self._failed_since_drain = 0
+        self._spooled_since_drain = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="influxdb-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self) -> int:
+        """Number of batches waiting to be written"""
+        return self.queue.qsize()
+
+    def submit(self, bucket: str, payload: bytes) -> None:
+        """Queue a batch for writing, blocking while the queue is full"""
+        if self.queue.full():
+            self.blocked += 1
+            get_registry().inc("influxdb_queue_blocked_total")
+            logger.debug("InfluxDB write queue is full, waiting for the writer")
+        self.queue.put((bucket, payload))
+        self._report_depth()
+
+    def _report_depth(self) -> None:
+        depth = self.depth
+        registry = get_registry()
+        registry.set("influxdb_queue_depth", depth)
+        if depth > self.high_water:
+            self.high_water = depth
+            registry.set("influxdb_queue_high_water", depth)
+
+    def drain(self) -> DrainResult:
+        """Wait until every queued batch is handled, with the batches lost and spooled meanwhile"""
+        self.queue.join()
+        with self._lock:
+            result = DrainResult(self._failed_since_drain, self._spooled_since_drain)
+            self._failed_since_drain = self._spooled_since_drain = 0
+        return result
+
+    def close(self) -> None:
+        """Write the remaining batches and stop the writer thread"""
+        self.queue.put(_STOP)
+        self._thread.join()
+        logger.info("InfluxDB writes: {}", self.stats())
+
+    def stats(self) -> Dict[str, float]:
+        """Queue depth, write counts and write latency in seconds"""
+        latencies = sorted(self.latencies)
+        return {
+            "depth": self.depth,
+            "written": self.written,
+            "retries": self.retries,
+            "failed": self.failed,
+            "spooled": self.spooled,
+            "blocked": self.blocked,
+            "high_water": self.high_water,
+            "latency_avg": sum(latencies) / len(latencies) if latencies else 0.0,
+            "latency_p95": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            "latency_max": latencies[-1] if latencies else 0.0,
+        }
+
+    def _run(self) -> None:
+        while True:
+            batch = self.queue.get()
+            self._report_depth()
+            try:
+                if batch is _STOP:
+                    return
+                self._write(*batch)
+            finally:
+                self.queue.task_done()
+
+    def _write(self, bucket: str, payload: bytes) -> None:
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                self.write(bucket, payload)
+            except Exception as e:
+                if attempt < self.max_retries and is_retryable(e):
+                    delay = min(self.max_delay, self.base_delay * 2**attempt) * random.uniform(0.5, 1.0)
+                    logger.warning(f"Writing to InfluxDB bucket '{bucket}' failed, retrying in {delay:.1f}s: {e}")
+                    self.retries += 1
+                    get_registry().inc("influxdb_write_retries_total", bucket=bucket)
+                    time.sleep(delay)
+                    continue
+                logger.error(f"Writing to InfluxDB bucket '{bucket}' failed after {attempt + 1} attempts: {e}")
+                # Rejected data would be rejected again, only keep batches that can succeed later
+                if self.on_failure is not None and is_retryable(e):
+                    try:
+                        self.on_failure(bucket, payload)
+                        with self._lock:
+                            self.spooled += 1
+                            self._spooled_since_drain += 1
+                        return
+                    except Exception:
+                        logger.exception(f"Keeping the failed batch for bucket '{bucket}' failed")
+                with self._lock:
+                    self.failed += 1
+                    self._failed_since_drain += 1
+                return
+            self.latencies.append(time.perf_counter() - start)
+            self.written += 1
+            return
@@ -0,0 +1,171 @@
+import os
+import struct
+import threading
+import time
+from typing import BinaryIO, Callable, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+from solaredge_influxdb.metrics import get_registry
+
+from .pipeline import is_retryable
+
+# Record header: length of the bucket name and of the line-protocol payload
+_HEADER = struct.Struct(">HI")
+_SUFFIX = ".spool"
+# Batches InfluxDB rejected during replay, kept for inspection instead of blocking the spool
+_REJECTED = "rejected.lp"
+
+FSYNC_POLICIES = ["always", "rotate", "never"]
+
+
+class Spool:
+    """Append-only spool of line-protocol batches that couldn't be written to InfluxDB.
+    Batches are appended to segment files that rotate at segment_size; when the spool grows
+    beyond max_size the oldest segments are dropped. With fsync "always" every batch is synced
+    to disk before append returns, "rotate" syncs when a segment is completed and "never" leaves
+    it to the operating system."""
+
+    def __init__(
+        self,
+        directory: str = "spool",
+        segment_size: int = 8 * 1024 * 1024,
+        max_size: int = 512 * 1024 * 1024,
+        fsync: str = "rotate",
+        replay_rate: Optional[float] = 1024 * 1024,  # Bytes per second written when replaying, None for no limit
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync}, expected one of {', '.join(FSYNC_POLICIES)}")
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_size = max_size
+        self.fsync = fsync
+        self.replay_rate = replay_rate
+        self._lock = threading.Lock()
+        self._file: Optional[BinaryIO] = None
+
+    def segments(self) -> List[str]:
+        """Paths of the segment files, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(_SUFFIX))
+        return [os.path.join(self.directory, name) for name in names]
+
+    @property
+    def size(self) -> int:
+        """Bytes on disk"""
+        return sum(os.path.getsize(path) for path in self.segments())
+
+    def __bool__(self) -> bool:
+        return any(os.path.getsize(path) > 0 for path in self.segments())
+
+    def append(self, bucket: str, payload: bytes) -> None:
+        """Append a batch to the current segment"""
+        name = bucket.encode()
+        with self._lock:
+            if self._file is None:
+                self._open_segment()
+            self._file.write(_HEADER.pack(len(name), len(payload)) + name + payload)
+            self._file.flush()
+            if self.fsync == "always":
+                os.fsync(self._file.fileno())
+            if self._file.tell() >= self.segment_size:
+                self._close_segment()
+            self._evict()
+        get_registry().inc("influxdb_spooled_batches_total", bucket=bucket)
+        logger.warning(f"Spooled {len(payload)} bytes for InfluxDB bucket '{bucket}' to {self.directory}")
+
+    def replay(self, write: Callable[[str, bytes], None]) -> bool:
+        """Write the spooled batches in order, at most replay_rate bytes per second. Stops at the first
+        failed write and keeps the remaining batches. Batches InfluxDB rejects, such as a field type
+        conflict, are moved to rejected.lp instead. True when the spool is empty afterwards."""
+        rate = self.replay_rate
+        with self._lock:
+            # Later appends go to a new segment, so the segments replayed here don't change
+            self._close_segment()
+            segments = self.segments()
+        start, sent = time.monotonic(), 0
+        for path in segments:
+            records = list(self._read(path))
+            for index, (bucket, payload) in enumerate(records):
+                if rate:
+                    wait = sent / rate - (time.monotonic() - start)
+                    if wait > 0:
+                        time.sleep(wait)
+                try:
+                    write(bucket, payload)
+                except Exception as e:
+                    if not is_retryable(e):
+                        self._reject(bucket, payload, e)
+                        continue
+                    logger.error(f"Replaying spooled data to InfluxDB failed, keeping it for the next run: {e}")
+                    self._rewrite(path, records[index:])
+                    return False
+                sent += len(payload)
+            os.remove(path)
+        if segments:
+            logger.info(f"Replayed {sent} spooled bytes to InfluxDB")
+        return True
+
+    def _reject(self, bucket: str, payload: bytes, error: Exception) -> None:
+        path = os.path.join(self.directory, _REJECTED)
+        logger.error(f"InfluxDB rejected {len(payload)} spooled bytes for bucket '{bucket}', moved to {path}: {error}")
+        with open(path, "ab") as f:
+            f.write(f"# bucket={bucket}\n".encode() + payload + b"\n")
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_segment()
+
+    def _open_segment(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        segments = self.segments()
+        sequence = int(os.path.basename(segments[-1])[: -len(_SUFFIX)]) + 1 if segments else 0
+        self._file = open(os.path.join(self.directory, f"{sequence:012d}{_SUFFIX}"), "ab")
+
+    def _close_segment(self) -> None:
+        if self._file is None:
+            return
+        if self.fsync != "never":
+            os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+
+    def _evict(self) -> None:
+        segments = self.segments()
+        sizes = [os.path.getsize(path) for path in segments]
+        total = sum(sizes)
+        current = self._file.name if self._file is not None else None
+        for path, size in zip(segments, sizes):
+            if total <= self.max_size or path == current:
+                break
+            logger.error(f"Spool exceeds {self.max_size} bytes, dropping the oldest segment {path}")
+            os.remove(path)
+            total -= size
+
+    @staticmethod
+    def _read(path: str) -> Iterator[Tuple[str, bytes]]:
+        with open(path, "rb") as f:
+            data = f.read()
+        position = 0
+        while position + _HEADER.size <= len(data):
+            name_length, payload_length = _HEADER.unpack_from(data, position)
+            end = position + _HEADER.size + name_length + payload_length
+            if end > len(data):
+                break
+            name_end = position + _HEADER.size + name_length
+            yield data[position + _HEADER.size : name_end].decode(), data[name_end:end]
+            position = end
+        if position < len(data):
+            logger.warning(f"Ignoring {len(data) - position} bytes of an incomplete record at the end of {path}")
+
+    def _rewrite(self, path: str, records: List[Tuple[str, bytes]]) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            for bucket, payload in records:
+                name = bucket.encode()
+                f.write(_HEADER.pack(len(name), len(payload)) + name + payload)
+            f.flush()
+            if self.fsync != "never":
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
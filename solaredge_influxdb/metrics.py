@@ -0,0 +1,203 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple
+
+from loguru import logger
+
+# Sorted label names and values of one series
+Labels = Tuple[Tuple[str, str], ...]
+
+# Upper bounds in seconds of the histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Type and help of the metrics of the collector, metrics missing here are exposed as untyped
+METRICS = {
+    "solaredge_requests_total": ("counter", "SolarEdge API responses by endpoint and status code"),
+    "solaredge_request_seconds": ("histogram", "SolarEdge API request latency including retries"),
+    "solaredge_response_bytes_total": ("counter", "SolarEdge API response bytes"),
+    "solaredge_retries_total": ("counter", "SolarEdge API requests retried after a server error"),
+    "solaredge_request_errors_total": ("counter", "SolarEdge API requests that failed without a response"),
+    "solaredge_quota_skipped_total": ("counter", "SolarEdge API requests skipped for lack of quota"),
+    "solaredge_quota_remaining": ("gauge", "SolarEdge API requests left today"),
+    "solaredge_cache_total": ("counter", "SolarEdge metadata lookups by cache result"),
+    "solaredge_decoded_rows_total": ("counter", "Rows decoded from SolarEdge responses by model"),
+    "solaredge_decode_seconds": ("histogram", "Time spent decoding SolarEdge responses into models"),
+    "influxdb_points_total": ("counter", "Points queued for InfluxDB by bucket"),
+    "influxdb_batches_total": ("counter", "Batches written to InfluxDB by bucket and result"),
+    "influxdb_batch_bytes_total": ("counter", "Line protocol bytes written to InfluxDB"),
+    "influxdb_write_seconds": ("histogram", "InfluxDB write request latency"),
+    "influxdb_write_retries_total": ("counter", "InfluxDB writes retried by the background writer"),
+    "influxdb_spooled_batches_total": ("counter", "Batches kept in the spool after failed writes"),
+    "influxdb_queue_depth": ("gauge", "Batches waiting for the background InfluxDB writer"),
+    "influxdb_queue_high_water": ("gauge", "Most batches that waited for the background InfluxDB writer at once"),
+    "influxdb_queue_blocked_total": ("counter", "Batches that waited for room in the full InfluxDB write queue"),
+    "dedup_skipped_points_total": ("counter", "Telemetry points left out because they didn't change"),
+}
+
+
+class Histogram:
+    """Bucketed observations of one series"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms kept in memory, exposed in the Prometheus text format and as a
+    JSON summary. Install another registry with set_registry to send the measurements elsewhere,
+    e.g. a subclass that forwards inc, set and observe to StatsD."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._values: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+
+    @staticmethod
+    def _labels(labels: Dict[str, Any]) -> Labels:
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    def inc(self, name: str, value: float = 1, /, **labels: Any) -> None:
+        """Add value to a counter"""
+        key = self._labels(labels)
+        with self._lock:
+            series = self._values.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, /, **labels: Any) -> None:
+        """Set a gauge"""
+        key = self._labels(labels)
+        with self._lock:
+            self._values.setdefault(name, {})[key] = value
+
+    def observe(self, name: str, value: float, /, **labels: Any) -> None:
+        """Add an observation, e.g. a latency in seconds, to a histogram"""
+        key = self._labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def time(self, name: str, /, **labels: Any) -> Iterator[None]:
+        """Observe the duration of the block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render(self) -> str:
+        """Format every series in the Prometheus text exposition format"""
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted(set(self._values) | set(self._histograms)):
+                kind, description = METRICS.get(name, ("untyped", ""))
+                if description:
+                    lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(self._values.get(name, {}).items()):
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                for labels, histogram in sorted(self._histograms.get(name, {}).items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        bucket_labels = labels + (("le", _format_value(bound)),)
+                        lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Every series as JSON-serializable dictionaries, histograms with their count, sum, average and maximum"""
+        result: Dict[str, List[Dict[str, Any]]] = {}
+        with self._lock:
+            for name, series in sorted(self._values.items()):
+                result[name] = [{"labels": dict(labels), "value": value} for labels, value in sorted(series.items())]
+            for name, histograms in sorted(self._histograms.items()):
+                result[name] = [
+                    {
+                        "labels": dict(labels),
+                        "count": histogram.count,
+                        "sum": round(histogram.sum, 6),
+                        "avg": round(histogram.sum / histogram.count, 6) if histogram.count else 0.0,
+                        "max": round(histogram.max, 6),
+                    }
+                    for labels, histogram in sorted(histograms.items())
+                ]
+        return result
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """Get the registry every component reports to"""
+    return _registry
+
+
+def set_registry(registry: MetricsRegistry) -> MetricsRegistry:
+    """Replace the registry every component reports to, returning the previous one"""
+    global _registry
+    previous, _registry = _registry, registry
+    return previous
+
+
+def log_summary() -> None:
+    """Log the metrics of the run as one JSON line"""
+    logger.info("Run metrics: {}", json.dumps(get_registry().summary(), separators=(",", ":")))
+
+
+def serve_metrics(port: int, host: str = "") -> Any:
+    """Serve the registry in the Prometheus text format on /metrics from a background thread.
+    Returns the server, stop it with shutdown() and server_close()."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = get_registry().render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug("Metrics request: {}", format % args)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Serving metrics on http://{host or '0.0.0.0'}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,130 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from solaredge_influxdb.influxdb.line_protocol import FieldValue
+from solaredge_influxdb.solaredge import PhaseData, PhaseRecord, SiteOverview, TelemetryData, TelemetryRecord
+
+
+def _kilo(value: Optional[float]) -> Optional[float]:
+    return value / 1000 if value is not None else None
+
+
+# Fields that can be written per telemetry row, computed from the decoded row
+TELEMETRY_FIELDS: Dict[str, Callable[[Union[TelemetryData, TelemetryRecord]], FieldValue]] = {
+    "total_energy": lambda telemetry: _kilo(telemetry.totalEnergy),
+    "ac_power": lambda telemetry: _kilo(telemetry.totalActivePower),
+    "dc_voltage": lambda telemetry: telemetry.dcVoltage,
+    "voltage_l1_to_2": lambda telemetry: telemetry.vL1To2,
+    "voltage_l2_to_3": lambda telemetry: telemetry.vL2To3,
+    "voltage_l3_to_1": lambda telemetry: telemetry.vL3To1,
+}
+
+# Fields written per phase, as points tagged with phase=L1, L2 or L3
+PHASE_FIELDS: Dict[str, Callable[[Union[PhaseData, PhaseRecord]], FieldValue]] = {
+    "ac_current": lambda phase: phase.acCurrent,
+    "ac_voltage": lambda phase: phase.acVoltage,
+    "ac_frequency": lambda phase: phase.acFrequency,
+    "active_power": lambda phase: _kilo(phase.activePower),
+    "apparent_power": lambda phase: _kilo(phase.apparentPower),
+    "reactive_power": lambda phase: _kilo(phase.reactivePower),
+    "cos_phi": lambda phase: phase.cosPhi,
+}
+
+PHASES = ("L1", "L2", "L3")
+
+# Fields of the site overview, energies in kWh and the current power in kW
+OVERVIEW_FIELDS: Dict[str, Callable[[SiteOverview], FieldValue]] = {
+    "current_power": lambda overview: _kilo(overview.currentPower.power) if overview.currentPower else None,
+    "lifetime_energy": lambda overview: _kilo(overview.lifeTimeData.energy) if overview.lifeTimeData else None,
+    "last_year_energy": lambda overview: _kilo(overview.lastYearData.energy) if overview.lastYearData else None,
+    "last_month_energy": lambda overview: _kilo(overview.lastMonthData.energy) if overview.lastMonthData else None,
+    "last_day_energy": lambda overview: _kilo(overview.lastDayData.energy) if overview.lastDayData else None,
+    "lifetime_revenue": lambda overview: overview.lifeTimeData.revenue if overview.lifeTimeData else None,
+}
+
+
+class Schema:
+    """Layout of the data in InfluxDB: which telemetry fields are written to which bucket.
+    Every bucket gets one multi-field point per inverter and timestamp, and the phase bucket
+    one point per phase. A phase bucket of None leaves the per-phase data out."""
+
+    def __init__(
+        self,
+        buckets: Dict[str, Sequence[str]],
+        meter_bucket: str = "energy",
+        phase_bucket: Optional[str] = None,
+        measurement: str = "solar",
+        meter_measurement: str = "meter",
+        site_bucket: str = "energy",
+        site_measurement: str = "site",
+    ):
+        unknown = {field for fields in buckets.values() for field in fields} - set(TELEMETRY_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown telemetry fields in schema: {', '.join(sorted(unknown))}")
+        self.buckets = {bucket: tuple(fields) for bucket, fields in buckets.items()}
+        self.meter_bucket = meter_bucket
+        self.phase_bucket = phase_bucket
+        self.measurement = measurement
+        self.meter_measurement = meter_measurement
+        self.site_bucket = site_bucket
+        self.site_measurement = site_measurement
+
+    def telemetry_points(
+        self, telemetry: Union[TelemetryData, TelemetryRecord]
+    ) -> List[Tuple[str, List[Tuple[str, FieldValue]]]]:
+        """Get the (bucket, fields) of every point of one telemetry row, leaving out missing values"""
+        values = {field: get_value(telemetry) for field, get_value in TELEMETRY_FIELDS.items()}
+        return [
+            (bucket, [(field, values[field]) for field in fields if values[field] is not None])
+            for bucket, fields in self.buckets.items()
+        ]
+
+    def phase_points(
+        self, telemetry: Union[TelemetryData, TelemetryRecord]
+    ) -> List[Tuple[str, List[Tuple[str, FieldValue]]]]:
+        """Get the (phase, fields) of every phase of one telemetry row the inverter reported"""
+        if self.phase_bucket is None:
+            return []
+        points = []
+        for phase, data in zip(PHASES, (telemetry.L1Data, telemetry.L2Data, telemetry.L3Data)):
+            if data is None:
+                continue
+            fields = [(field, get_value(data)) for field, get_value in PHASE_FIELDS.items()]
+            points.append((phase, [(field, value) for field, value in fields if value is not None]))
+        return points
+
+    def overview_fields(self, overview: SiteOverview) -> List[Tuple[str, FieldValue]]:
+        """Get the fields of a site overview, leaving out missing values"""
+        fields = [(field, get_value(overview)) for field, get_value in OVERVIEW_FIELDS.items()]
+        return [(field, value) for field, value in fields if value is not None]
+
+
+def split_schema() -> Schema:
+    """Energy, power and voltages in their own buckets, the original layout"""
+    return Schema(
+        {
+            "energy": ["total_energy"],
+            "energy_flow": ["ac_power"],
+            "voltage_current": ["dc_voltage", "voltage_l1_to_2", "voltage_l2_to_3", "voltage_l3_to_1"],
+        },
+        phase_bucket="voltage_current",
+    )
+
+
+def single_schema(bucket: str = "solar") -> Schema:
+    """Every field of a telemetry row in one point, and the meter readings and site data in the same bucket"""
+    return Schema({bucket: list(TELEMETRY_FIELDS)}, meter_bucket=bucket, phase_bucket=bucket, site_bucket=bucket)
+
+
+SCHEMAS = ["split", "single"]
+
+
+def get_schema(layout: str = "split", bucket: str = "solar") -> Schema:
+    """Get a schema by layout name, bucket is only used by the single-bucket layout"""
+    if layout == "split":
+        return split_schema()
+    if layout == "single":
+        return single_schema(bucket)
+    raise ValueError(f"Unknown schema layout {layout}, expected one of {', '.join(SCHEMAS)}")
+
+
+DEFAULT_SCHEMA = split_schema()
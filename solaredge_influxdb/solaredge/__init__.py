@@ -1,5 +1,42 @@
-from .client import SolarEdgeClient
-from .models import *
-from .equipment import Equipment
-from .site import *
-from .meters import Meter
+from importlib import import_module
+
+# Exports and the module that defines them. Modules are imported on first use, so importing one
+# light module such as the cache doesn't load requests, urllib3 and pydantic.
+_EXPORTS = {
+    "SolarEdgeClient": ".client",
+    "create_session": ".client",
+    "CONNECT_TIMEOUT": ".client",
+    "ResponseCache": ".cache",
+    "DEFAULT_CACHE_DIR": ".cache",
+    "RateLimiter": ".ratelimit",
+    "HIGH": ".ratelimit",
+    "LOW": ".ratelimit",
+    "Equipment": ".equipment",
+    "MAX_TECHNICAL_DATA_RANGE": ".equipment",
+    "list_sites": ".site",
+    "iter_json_array": ".stream",
+    "Meter": ".meters",
+    "MAX_METER_DATA_RANGE": ".meters",
+    "SiteData": ".site_data",
+    "MAX_BULK_SITES": ".site_data",
+    "MAX_SITE_DATA_RANGE": ".site_data",
+    # Needs the optional aiohttp dependency
+    "AsyncSolarEdgeClient": ".aio",
+    "AsyncResponse": ".aio",
+}
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is not None:
+        value = getattr(import_module(module, __name__), name)
+    elif not name.startswith("_"):
+        # The response models, e.g. TelemetryData and SitesResponse
+        try:
+            value = getattr(import_module(".models", __name__), name)
+        except AttributeError:
+            raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
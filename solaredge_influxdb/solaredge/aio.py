@@ -0,0 +1,253 @@
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import Dict, List, Mapping, NamedTuple, Optional, Union
+
+from loguru import logger
+
+try:
+    import aiohttp
+except ImportError as e:
+    raise ImportError("The async SolarEdge client needs aiohttp, install it with: pip install solaredge-influxdb[aio]") from e
+
+from solaredge_influxdb.metrics import get_registry
+from .cache import ResponseCache
+from .client import SolarEdgeClient, cached_body, endpoint_label, revalidation_headers
+from .equipment import decode_technical_data
+from .meters import TIME_UNITS, decode_meters_data
+from .models import (
+    ChangeLogResponse,
+    ComponentsListResponse,
+    InventoryResponse,
+    MeterDataResponse,
+    SitesResponse,
+    TelemetryRecords,
+    TelemetryResponse,
+)
+from .ratelimit import HIGH, LOW, RateLimiter
+
+# Same retries as the blocking client: server errors and connection problems, not 429
+RETRY_STATUSES = {502, 503, 504}
+
+
+class AsyncResponse(NamedTuple):
+    """Status, headers and body of a response, read completely so its connection returns to the pool"""
+
+    status_code: int
+    headers: Mapping[str, str]
+    content: bytes
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def json(self) -> dict:
+        return json.loads(self.content)
+
+
+class AsyncSolarEdgeClient:
+    """asyncio counterpart of SolarEdgeClient, Equipment and Meter on one aiohttp session. Connections
+    are pooled and kept alive, so one event loop can poll many sites concurrently; pass site_id to a
+    method to query another site than the default one. Requests are retried like the blocking client
+    and share its rate limiter and response cache. Use it as an async context manager, or call close.
+    This is a library API, the CLI, app() and the daemon use the blocking clients."""
+
+    url = SolarEdgeClient.url
+
+    def __init__(
+        self,
+        api_key: str,
+        site_id: Optional[int] = None,
+        cache: Optional[ResponseCache] = None,
+        limit: int = 100,  # Connections open at the same time, across all hosts
+        timeout: float = 30.0,  # Seconds for a whole request, including reading the body
+        retries: int = 3,
+        backoff_factor: float = 0.1,
+        session: Optional["aiohttp.ClientSession"] = None,
+    ):
+        self.api_key = api_key
+        self.site_id = site_id
+        self.cache = cache if cache is not None else SolarEdgeClient.cache
+        self.limit = limit
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._session = session
+        self._owns_session = session is None
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        """The rate limiter shared with the blocking clients, replaced by use_rate_limiter"""
+        return SolarEdgeClient.rate_limiter
+
+    @property
+    def session(self) -> "aiohttp.ClientSession":
+        # Created on first use, a session must be created inside the running event loop
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.limit),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"Accept": "application/json", "Accept-Encoding": "gzip, deflate"},
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and self._owns_session:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self) -> "AsyncSolarEdgeClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def get(
+        self,
+        url: str,
+        params: Optional[Dict[str, str]] = None,
+        priority: int = HIGH,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Optional[AsyncResponse]:
+        """Send a GET request to the SolarEdge API, unless the rate limiter has no quota left for it"""
+        if not await self.rate_limiter.acquire_async(priority):
+            logger.warning(f"SolarEdge API quota exhausted, skipping request to {url}")
+            get_registry().inc("solaredge_quota_skipped_total", endpoint=endpoint_label(url))
+            return None
+        query_params = {"api_key": self.api_key}
+        if params:
+            query_params.update(params)
+        registry = get_registry()
+        endpoint = endpoint_label(url)
+        start = time.perf_counter()
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    async with self.session.get(url, params=query_params, headers=headers) as response:
+                        content = await response.read()
+                        if response.status not in RETRY_STATUSES or attempt == self.retries:
+                            break
+                        logger.warning(f"SolarEdge API returned {response.status} for {url}, retrying")
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    if attempt == self.retries:
+                        registry.inc("solaredge_request_errors_total", endpoint=endpoint)
+                        raise
+                registry.inc("solaredge_retries_total", endpoint=endpoint)
+                # Backoff like urllib3: the first retry is immediate, later ones wait twice as long each time
+                if attempt > 0:
+                    await asyncio.sleep(self.backoff_factor * 2**attempt)
+        finally:
+            registry.observe("solaredge_request_seconds", time.perf_counter() - start, endpoint=endpoint)
+        registry.inc("solaredge_requests_total", endpoint=endpoint, status=response.status)
+        registry.inc("solaredge_response_bytes_total", len(content), endpoint=endpoint)
+        return AsyncResponse(response.status, response.headers, content)
+
+    async def get_json(
+        self,
+        url: str,
+        endpoint: str,
+        params: Optional[Dict[str, str]] = None,
+        priority: int = HIGH,
+    ) -> Optional[dict]:
+        """Get a JSON response through the response cache, like SolarEdgeClient.get_json"""
+        key = self.cache.key(url, params, self.api_key)
+        entry = self.cache.get(key)
+        if entry is not None and self.cache.is_fresh(entry):
+            get_registry().inc("solaredge_cache_total", endpoint=endpoint, result="fresh")
+            return entry["body"]
+        response = await self.get(url, params=params, priority=priority, headers=revalidation_headers(entry))
+        return cached_body(self.cache, key, endpoint, url, entry, response)
+
+    async def list_sites(self) -> Optional[SitesResponse]:
+        """Request the list of sites of the API key"""
+        data = await self.get_json(f"{self.url}/sites/list", "sites", priority=HIGH)
+        if data is not None:
+            return SitesResponse(**data["sites"])
+        logger.error("Failed to retrieve list of sites")
+        return None
+
+    async def get_site(self) -> int:
+        """Get the ID of the first site of the API key, the default site of the other methods"""
+        if self.site_id is None:
+            sites = await self.list_sites()
+            if not sites or not sites.site:
+                raise AttributeError("Site ID must be defined and valid")
+            self.site_id = sites.site[0].id
+        return self.site_id
+
+    async def _site(self, site_id: Optional[int]) -> int:
+        return site_id if site_id is not None else await self.get_site()
+
+    async def get_components(self, site_id: Optional[int] = None) -> Optional[ComponentsListResponse]:
+        """Get the inverters of a site, like Equipment.get_components"""
+        site_id = await self._site(site_id)
+        data = await self.get_json(f"{self.url}/equipment/{site_id}/list", "components")
+        if data is not None:
+            return ComponentsListResponse(**data["reporters"])
+        logger.error(f"Failed to get components for site {site_id}")
+        return None
+
+    async def get_inventory(self, site_id: Optional[int] = None) -> Optional[InventoryResponse]:
+        """Get the inventory of a site, like Equipment.get_inventory"""
+        site_id = await self._site(site_id)
+        data = await self.get_json(f"{self.url}/site/{site_id}/inventory", "inventory", priority=LOW)
+        if data is not None:
+            return InventoryResponse(**data)
+        logger.error(f"Failed to get inventory for site {site_id}")
+        return None
+
+    async def get_change_log(self, serial_number: str, site_id: Optional[int] = None) -> Optional[ChangeLogResponse]:
+        """Get the change log of a component, like Equipment.get_change_log"""
+        site_id = await self._site(site_id)
+        data = await self.get_json(f"{self.url}/equipment/{site_id}/{serial_number}/changeLog", "changelog", priority=LOW)
+        if data is not None:
+            return ChangeLogResponse(**data)
+        logger.error(f"Failed to get change log for equipment {serial_number}")
+        return None
+
+    async def get_technical_data(
+        self,
+        inverter_id: str,
+        start_time: datetime,
+        end_time: datetime,
+        full_models: bool = True,
+        site_id: Optional[int] = None,
+    ) -> Union[TelemetryResponse, TelemetryRecords, None]:
+        """Get the technical data of an inverter, like Equipment.get_technical_data"""
+        site_id = await self._site(site_id)
+        query_params = {
+            "startTime": start_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "endTime": end_time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        response = await self.get(f"{self.url}/equipment/{site_id}/{inverter_id}/data.json", query_params, HIGH)
+        if response is not None and response.ok:
+            return decode_technical_data(response.json, full_models)
+        logger.error(f"Failed to get technical data for inverter {inverter_id}")
+        return None
+
+    async def get_meters_data(
+        self,
+        start_time: datetime,
+        end_time: datetime,
+        time_unit: Optional[str] = None,
+        meters: Optional[List[str]] = None,
+        site_id: Optional[int] = None,
+    ) -> Optional[MeterDataResponse]:
+        """Get the meter readings of a site, like Meter.get_meters_data"""
+        if time_unit and time_unit not in TIME_UNITS:
+            raise ValueError(f"time_unit must be one of {', '.join(TIME_UNITS)}")
+        site_id = await self._site(site_id)
+        query_params = {
+            "startTime": start_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "endTime": end_time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        if time_unit:
+            query_params["timeUnit"] = time_unit
+        if meters:
+            query_params["meters"] = ",".join(meters)
+        response = await self.get(f"{self.url}/site/{site_id}/meters", query_params, HIGH)
+        if response is not None and response.ok:
+            return decode_meters_data(response.json)
+        logger.error("Failed to retrieve meter data")
+        return None
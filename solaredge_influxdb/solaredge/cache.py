@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from typing import Dict, Optional
+
+from loguru import logger
+
+DEFAULT_CACHE_DIR = os.getenv(
+    "SOLAREDGE_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "solaredge_influxdb")
+)
+
+# Metadata changes rarely; a day keeps the inverter list current after hardware swaps
+DEFAULT_TTLS: Dict[str, timedelta] = {
+    "sites": timedelta(days=1),
+    "components": timedelta(days=1),
+    "inventory": timedelta(days=1),
+    "changelog": timedelta(days=7),
+}
+
+
+class ResponseCache:
+    """On-disk cache of SolarEdge API responses with a time to live per endpoint, revalidation
+    of expired entries through ETag/Last-Modified and a least recently used cap on the entries"""
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_CACHE_DIR,
+        ttls: Optional[Dict[str, timedelta]] = None,
+        max_entries: int = 256,
+    ):
+        self.directory = directory
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.max_entries = max_entries
+
+    @staticmethod
+    def key(url: str, params: Optional[Dict[str, str]] = None, api_key: Optional[str] = None) -> str:
+        """Build the cache key of a request. The API key is only included as a hash, which keeps
+        accounts sharing a cache directory apart without storing the key itself."""
+        params = {k: v for k, v in (params or {}).items() if k != "api_key"}
+        key = url + "?" + "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+        if api_key:
+            key += "#" + hashlib.sha256(api_key.encode()).hexdigest()[:16]
+        return key
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + ".json")
+
+    def get(self, key: str) -> Optional[dict]:
+        """Get the cached entry of a request, fresh or expired"""
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            logger.warning(f"Dropping corrupt cache entry {path}")
+            os.remove(path)
+            return None
+        return entry
+
+    def is_fresh(self, entry: dict) -> bool:
+        ttl = self.ttls.get(entry["endpoint"], timedelta(0))
+        return time.time() - entry["stored_at"] < ttl.total_seconds()
+
+    def put(
+        self,
+        key: str,
+        endpoint: str,
+        body: dict,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        """Store a response body, evicting the least recently used entries beyond max_entries"""
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {
+            "key": key,
+            "endpoint": endpoint,
+            "stored_at": time.time(),
+            "etag": etag,
+            "last_modified": last_modified,
+            "body": body,
+        }
+        with tempfile.NamedTemporaryFile("w", dir=self.directory, suffix=".tmp", delete=False) as f:
+            json.dump(entry, f)
+        os.replace(f.name, self._path(key))
+        self._evict()
+
+    def touch(self, key: str, entry: dict) -> None:
+        """Mark an expired entry as fresh again after the API confirmed it didn't change"""
+        self.put(key, entry["endpoint"], entry["body"], entry.get("etag"), entry.get("last_modified"))
+
+    def invalidate(self, endpoint: Optional[str] = None) -> None:
+        """Remove all cached entries, or only those of one endpoint, including the entries of
+        caches in subdirectories such as the per-site caches of multi-site mode"""
+        for path in self._entries(recursive=True):
+            if endpoint is not None:
+                try:
+                    with open(path, "r") as f:
+                        if json.load(f).get("endpoint") != endpoint:
+                            continue
+                except (OSError, ValueError):
+                    pass
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _entries(self, recursive: bool = False):
+        if not os.path.isdir(self.directory):
+            return []
+        if recursive:
+            return [
+                os.path.join(root, name)
+                for root, _, names in os.walk(self.directory)
+                for name in names
+                if name.endswith(".json")
+            ]
+        return [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".json")]
+
+    def _evict(self) -> None:
+        entries = self._entries()
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda path: os.stat(path).st_mtime)
+        for path in entries[: len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -1,50 +1,205 @@
-import os
-
+import re
+import time
+from urllib.parse import urlsplit
 from urllib3.util import Retry
-from requests import Session
+from requests import PreparedRequest, Response, Session
 from requests.adapters import HTTPAdapter
 from loguru import logger
-from typing import Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
+from solaredge_influxdb.metrics import get_registry
+from .cache import ResponseCache
+from .ratelimit import HIGH, RateLimiter
 from .site import list_sites
 
+# Seconds to connect and to wait for the next byte of a response
+CONNECT_TIMEOUT = 10.0
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, 60.0)
+
+# Path segments holding site IDs or serial numbers, replaced to keep the endpoint label bounded
+_ID_SEGMENT = re.compile(r"/[^/]*\d[^/]*")
+
+
+def endpoint_label(url: str) -> str:
+    """Get the endpoint of a URL without IDs, e.g. /equipment/{id}/{id}/data.json"""
+    return _ID_SEGMENT.sub("/{id}", urlsplit(url).path)
+
+
+class InstrumentedAdapter(HTTPAdapter):
+    """HTTP adapter that reports the latency, status code, size and retries of every response"""
+
+    def send(self, request: PreparedRequest, stream: bool = False, **kwargs: Any) -> Response:
+        registry = get_registry()
+        endpoint = endpoint_label(request.url)
+        start = time.perf_counter()
+        try:
+            response = super().send(request, stream=stream, **kwargs)
+            # Read here so the latency and size cover the body, requests reads it right after anyway
+            size = len(response.content) if not stream else int(response.headers.get("Content-Length", 0))
+        except Exception:
+            registry.inc("solaredge_request_errors_total", endpoint=endpoint)
+            raise
+        finally:
+            registry.observe("solaredge_request_seconds", time.perf_counter() - start, endpoint=endpoint)
+        registry.inc("solaredge_requests_total", endpoint=endpoint, status=response.status_code)
+        registry.inc("solaredge_response_bytes_total", size, endpoint=endpoint)
+        retries = getattr(response.raw, "retries", None)
+        if retries is not None and retries.history:
+            registry.inc("solaredge_retries_total", len(retries.history), endpoint=endpoint)
+        return response
+
+
+def revalidation_headers(entry: Optional[dict]) -> Optional[Dict[str, str]]:
+    """Conditional request headers from the ETag or Last-Modified of an expired cache entry"""
+    headers = {}
+    if entry is not None and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry is not None and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers or None
+
+
+def cached_body(
+    cache: ResponseCache, key: str, endpoint: str, url: str, entry: Optional[dict], response: Optional[Any]
+) -> Optional[dict]:
+    """Store a fresh response in the cache, or serve the expired entry when the response is missing,
+    304 Not Modified or an error. response needs the status_code, ok, headers and json() of a Response."""
+    registry = get_registry()
+    if response is None:
+        if entry is not None:
+            registry.inc("solaredge_cache_total", endpoint=endpoint, result="stale")
+            return entry["body"]
+        return None
+    if response.status_code == 304 and entry is not None:
+        registry.inc("solaredge_cache_total", endpoint=endpoint, result="revalidated")
+        cache.touch(key, entry)
+        return entry["body"]
+    if not response.ok:
+        if entry is not None:
+            logger.warning(f"SolarEdge API returned {response.status_code} for {url}, serving the cached response")
+            registry.inc("solaredge_cache_total", endpoint=endpoint, result="stale")
+            return entry["body"]
+        return None
+    registry.inc("solaredge_cache_total", endpoint=endpoint, result="miss")
+    body = response.json()
+    cache.put(
+        key,
+        endpoint,
+        body,
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+    )
+    return body
+
+
+def create_session(pool_connections: int = 1, pool_maxsize: int = 10) -> Session:
+    """Create a session for the SolarEdge API. pool_connections is the number of hosts with a
+    connection pool and pool_maxsize the connections kept alive per host, which should be at least
+    the number of threads sending requests at the same time."""
+    # 429 is not retried here: every attempt counts against the daily quota, but the rate
+    # limiter only sees one request. Throttled requests wait for the next run instead.
+    retries = Retry(
+        total=3,
+        backoff_factor=0.1,
+        status_forcelist=[502, 503, 504],
+        allowed_methods={"GET"},
+    )
+    session = Session()
+    session.headers.update({"Accept": "application/json", "Accept-Encoding": "gzip, deflate"})
+    adapter = InstrumentedAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
 
 class SolarEdgeClient:
     url = "https://monitoringapi.solaredge.com"
-    session = Session()
+    # Shared by every client that isn't given its own session, replaced by use_session
+    session = create_session()
+    timeout: Tuple[float, float] = DEFAULT_TIMEOUT
+    rate_limiter = RateLimiter()
+    cache = ResponseCache()
 
-    def __init__(self, api_key: str, site_id: Union[int, None] = None):
+    def __init__(
+        self,
+        api_key: str,
+        site_id: Union[int, None] = None,
+        cache: Union[ResponseCache, None] = None,
+        session: Union[Session, None] = None,
+    ):
         self.api_key = api_key
-        self.__init_session()
+        if cache is not None:
+            self.cache = cache
+        if session is not None:
+            self.session = session
         if not site_id:
             site_id = self.get_site()
 
         self.site_id = site_id
 
-    def __init_session(self):
-        retries = Retry(
-            total=3,
-            backoff_factor=0.1,
-            status_forcelist=[429, 502, 503, 504],
-            allowed_methods={"GET"},
-        )
-        self.session.headers.update({"Accept": "application/json"})
-        self.session.mount("https://", HTTPAdapter(max_retries=retries))
+    def get(
+        self,
+        url: str,
+        params: Optional[Dict[str, str]] = None,
+        priority: int = HIGH,
+        headers: Optional[Dict[str, str]] = None,
+        stream: bool = False,
+    ) -> Optional[Response]:
+        """Send a GET request to the SolarEdge API, unless the rate limiter has no quota left for it"""
+        if not self.rate_limiter.acquire(priority):
+            logger.warning(f"SolarEdge API quota exhausted, skipping request to {url}")
+            get_registry().inc("solaredge_quota_skipped_total", endpoint=endpoint_label(url))
+            return None
+        query_params = {"api_key": self.api_key}
+        if params:
+            query_params.update(params)
+        if stream:
+            return self.session.get(url, params=query_params, headers=headers, timeout=self.timeout, stream=True)
+        return self.session.get(url, params=query_params, headers=headers, timeout=self.timeout)
 
-    def get_site(self) -> int:
-        """Get site ID from SolarEdge API or from disk"""
-        if os.path.isfile("site_id.txt"):
-            with open("site_id.txt", "r") as f:
-                return int(f.read())
+    def get_json(
+        self,
+        url: str,
+        endpoint: str,
+        params: Optional[Dict[str, str]] = None,
+        priority: int = HIGH,
+    ) -> Optional[dict]:
+        """Get a JSON response through the response cache.
+        Fresh entries are served without a request, expired ones are revalidated with the ETag or
+        Last-Modified of the cached response and served as-is when the rate limiter skips the request
+        or the API responds with an error."""
+        key = self.cache.key(url, params, self.api_key)
+        entry = self.cache.get(key)
+        if entry is not None and self.cache.is_fresh(entry):
+            get_registry().inc("solaredge_cache_total", endpoint=endpoint, result="fresh")
+            return entry["body"]
+        response = self.get(url, params=params, priority=priority, headers=revalidation_headers(entry))
+        return cached_body(self.cache, key, endpoint, url, entry, response)
+
+    @classmethod
+    def list_site_ids(
+        cls, api_key: str, cache: Union[ResponseCache, None] = None, session: Union[Session, None] = None
+    ) -> List[int]:
+        """Get the IDs of all sites of an API key, without choosing a default site like the constructor"""
+        client = cls.__new__(cls)
+        client.api_key = api_key
+        if cache is not None:
+            client.cache = cache
+        if session is not None:
+            client.session = session
+        return client.get_sites()
+
+    def get_sites(self) -> List[int]:
+        """Get the IDs of all sites of the API key, served from the response cache when possible"""
         site_response = list_sites(self)
-        if site_response:
-            if site_response.count > 1:
-                logger.warning(
-                    "More than one site found; Only first site is currently supported"
-                )
-                # TODO: Extend for multiple sites
-            with open("site_id.txt", "w") as f:
-                f.write(str(site_response.site[0].id))
-            return site_response.site[0].id
+        if site_response and site_response.site:
+            return [site.id for site in site_response.site]
         logger.error("Failed to retrieve site ID")
         raise AttributeError("Site ID must be defined and valid")
+
+    def get_site(self) -> int:
+        """Get site ID from SolarEdge API, served from the response cache when possible"""
+        site_ids = self.get_sites()
+        if len(site_ids) > 1:
+            logger.warning("More than one site found; only the first site is collected, use --all-sites for every site")
+        return site_ids[0]
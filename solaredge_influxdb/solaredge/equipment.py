@@ -1,46 +1,66 @@
-from datetime import datetime
+import time
+from datetime import datetime, timedelta
+from solaredge_influxdb.metrics import get_registry
+from .cache import ResponseCache
 from .client import SolarEdgeClient
+from .ratelimit import HIGH, LOW
 from .models import (
+    TelemetryData,
+    TelemetryRecord,
+    TelemetryRecords,
     TelemetryResponse,
     ChangeLogResponse,
     InventoryResponse,
     ComponentsListResponse,
     Inverter,
 )
+from .stream import iter_json_array
 from loguru import logger
-from requests import Response
-from typing import Union, Dict, List
+from requests import Response, Session
+from typing import Callable, Iterator, Union, List
 
-import os
-import json
+# The equipment data endpoint rejects requests spanning more than one week
+MAX_TECHNICAL_DATA_RANGE = timedelta(days=7)
 
 
-class Equipment(SolarEdgeClient):
-    query_params: Dict[str, str]
+def decode_technical_data(
+    load: Callable[[], dict], full_models: bool = True
+) -> Union[TelemetryResponse, TelemetryRecords]:
+    """Decode the body returned by load, e.g. Response.json, of the equipment data endpoint"""
+    model = "TelemetryData" if full_models else "TelemetryRecord"
+    registry = get_registry()
+    with registry.time("solaredge_decode_seconds", model=model):
+        data = load()["data"]
+        if full_models:
+            result = TelemetryResponse(**data)
+        else:
+            result = TelemetryRecords(
+                count=data["count"],
+                telemetries=[TelemetryRecord.from_dict(row) for row in data["telemetries"]],
+            )
+    registry.inc("solaredge_decoded_rows_total", len(result.telemetries), model=model)
+    return result
+
 
+class Equipment(SolarEdgeClient):
     def __init__(
-        self, api_key: str, inverters: Union[List[Inverter], None] = None
+        self,
+        api_key: str,
+        inverters: Union[List[Inverter], None] = None,
+        cache: Union[ResponseCache, None] = None,
+        site_id: Union[int, None] = None,
+        session: Union[Session, None] = None,
     ) -> None:
-        super().__init__(api_key)
-        self.query_params = {"api_key": self.api_key}
+        super().__init__(api_key, site_id, cache=cache, session=session)
         if not inverters:
             inverters = self.get_inverters()
         self.inverters = inverters
 
-    def get_request(cls, url: str) -> Response:
-        return cls.session.get(url, params=cls.query_params)
-
     def get_inverters(self) -> List[Inverter]:
-        """Get list of inverters from SolarEdge API or from disk"""
-        if os.path.isfile("inverters.json"):
-            with open("inverters.json", "r") as f:
-                return [Inverter(**i) for i in json.load(f)]
+        """Get list of inverters from SolarEdge API, served from the response cache when possible"""
         inverters = self.get_components()
         if inverters:
-            inverters = inverters.list
-            with open("inverters.json", "w") as f:
-                json.dump([dict(i) for i in inverters], f)
-            return inverters
+            return inverters.list
         logger.error("Failed to retrieve inverters")
         raise AttributeError("Inverters must be defined and valid")
 
@@ -85,9 +105,8 @@ class Equipment(SolarEdgeClient):
             }
         """
         url = f"{self.url}/equipment/{self.site_id}/list"
-        response = self.get_request(url)
-        if response.ok:
-            data = response.json()
+        data = self.get_json(url, "components")
+        if data is not None:
             return ComponentsListResponse(**data["reporters"])
         logger.error(f"Failed to get components for site {self.site_id}")
         return None
@@ -170,9 +189,8 @@ class Equipment(SolarEdgeClient):
             }
         """
         url = f"{self.url}/site/{self.site_id}/inventory"
-        response = self.get_request(url)
-        if response.ok:
-            data = response.json()
+        data = self.get_json(url, "inventory", priority=LOW)
+        if data is not None:
             return InventoryResponse(**data)
         logger.error(f"Failed to get inventory for site {self.site_id}")
         return None
@@ -182,13 +200,16 @@ class Equipment(SolarEdgeClient):
         inverter_id: str,
         start_time: datetime,
         end_time: datetime,
-    ) -> Union[TelemetryResponse, None]:
+        full_models: bool = True,
+    ) -> Union[TelemetryResponse, TelemetryRecords, None]:
         """Collect the technical data from the inverter within your site.
         Inputs:
             solarEdgeClient: The solarEdgeClient object you created earlier.
             inverter_id: The ID of the inverter you want to collect data from.
             start_time: The start time of the data collection.
             end_time: The end time of the data collection.
+            full_models: Validate every row into a TelemetryData model, or decode only the
+                fields written to InfluxDB into compact TelemetryRecord objects.
         Outputs:
             data: A dictionary containing the technical data of the inverter.
 
@@ -256,15 +277,55 @@ class Equipment(SolarEdgeClient):
         query_params = {
             "startTime": start_time.strftime("%Y-%m-%d %H:%M:%S"),
             "endTime": end_time.strftime("%Y-%m-%d %H:%M:%S"),
-            "api_key": self.api_key,
         }
-        response = self.session.get(url=url, params=query_params)
-        if response.ok:
-            data = response.json()
-            return TelemetryResponse(**data["data"])
+        response = self.get(url, params=query_params, priority=HIGH)
+        if response is not None and response.ok:
+            return decode_technical_data(response.json, full_models)
+        logger.error(f"Failed to get technical data for inverter {inverter_id}")
+        return None
+
+    def get_technical_data_stream(
+        self,
+        inverter_id: str,
+        start_time: datetime,
+        end_time: datetime,
+        full_models: bool = True,
+    ) -> Union[Iterator[Union[TelemetryData, TelemetryRecord]], None]:
+        """Collect the technical data from the inverter like get_technical_data, but decode the
+        telemetries one at a time while the response is read, keeping memory use flat for long windows.
+        The request is sent right away; the returned iterator reads and decodes the response body."""
+        url = f"{self.url}/equipment/{self.site_id}/{inverter_id}/data.json"
+        query_params = {
+            "startTime": start_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "endTime": end_time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        response = self.get(url, params=query_params, priority=HIGH, stream=True)
+        if response is not None and response.ok:
+            return self._iter_telemetries(response, full_models)
+        if response is not None:
+            response.close()
         logger.error(f"Failed to get technical data for inverter {inverter_id}")
         return None
 
+    @staticmethod
+    def _iter_telemetries(response: Response, full_models: bool) -> Iterator[Union[TelemetryData, TelemetryRecord]]:
+        decode = TelemetryData.model_validate if full_models else TelemetryRecord.from_dict
+        model = "TelemetryData" if full_models else "TelemetryRecord"
+        # Decoding time is summed over the rows, reading the body in between isn't counted
+        rows, seconds = 0, 0.0
+        try:
+            with response:
+                for row in iter_json_array(response.iter_content(chunk_size=65536), "telemetries"):
+                    start = time.perf_counter()
+                    telemetry = decode(row)
+                    seconds += time.perf_counter() - start
+                    rows += 1
+                    yield telemetry
+        finally:
+            registry = get_registry()
+            registry.observe("solaredge_decode_seconds", seconds, model=model)
+            registry.inc("solaredge_decoded_rows_total", rows, model=model)
+
     def get_change_log(
         self,
         serial_number: str,
@@ -293,9 +354,8 @@ class Equipment(SolarEdgeClient):
             }
         """
         url = f"{self.url}/equipment/{self.site_id}/{serial_number}/changeLog"
-        response = self.get_request(url)
-        if response.ok:
-            data = response.json()
+        data = self.get_json(url, "changelog", priority=LOW)
+        if data is not None:
             return ChangeLogResponse(**data)
         logger.error(f"Failed to get change log for equipment {serial_number}")
         return None
@@ -1,13 +1,37 @@
+from solaredge_influxdb.metrics import get_registry
 from .models import MeterDataResponse
+from .cache import ResponseCache
 from .client import SolarEdgeClient
-from datetime import datetime
+from .ratelimit import HIGH
+from datetime import datetime, timedelta
 from loguru import logger
-from typing import Union, List
+from requests import Session
+from typing import Callable, Union, List
+
+# Quarter-hourly and hourly meter data is limited to one month per request
+MAX_METER_DATA_RANGE = timedelta(days=28)
+TIME_UNITS = ["QUARTER_OF_AN_HOUR", "HOUR", "DAY", "WEEK", "MONTH", "YEAR"]
+
+
+def decode_meters_data(load: Callable[[], dict]) -> MeterDataResponse:
+    """Decode the body returned by load, e.g. Response.json, of the meters endpoint"""
+    registry = get_registry()
+    with registry.time("solaredge_decode_seconds", model="MeterDataResponse"):
+        result = MeterDataResponse(**load())
+    rows = sum(len(meter.values) for meter in result.meterEnergyDetails.meters)
+    registry.inc("solaredge_decoded_rows_total", rows, model="MeterDataResponse")
+    return result
 
 
 class Meter(SolarEdgeClient):
-    def __init__(self, api_key: str):
-        super().__init__(api_key)
+    def __init__(
+        self,
+        api_key: str,
+        cache: Union[ResponseCache, None] = None,
+        site_id: Union[int, None] = None,
+        session: Union[Session, None] = None,
+    ):
+        super().__init__(api_key, site_id, cache=cache, session=session)
 
     def get_meters_data(
         self,
@@ -30,23 +54,12 @@ class Meter(SolarEdgeClient):
             MeterDataResponse | None: The meter data response object if successful, None otherwise.
         """
 
-        if time_unit:
-            if time_unit not in [
-                "QUARTER_OF_AN_HOUR",
-                "HOUR",
-                "DAY",
-                "WEEK",
-                "MONTH",
-                "YEAR",
-            ]:
-                raise ValueError(
-                    "time_unit must be one of QUARTER_OF_AN_HOUR, HOUR, DAY, WEEK, MONTH, YEAR"
-                )
+        if time_unit and time_unit not in TIME_UNITS:
+            raise ValueError(f"time_unit must be one of {', '.join(TIME_UNITS)}")
         url = f"{self.url}/site/{self.site_id}/meters"
         if meters:
             meters = ",".join(meters)
         query_params = {
-            "api_key": self.api_key,
             "startTime": start_time.strftime("%Y-%m-%d %H:%M:%S"),
             "endTime": end_time.strftime("%Y-%m-%d %H:%M:%S"),
         }
@@ -55,9 +68,8 @@ class Meter(SolarEdgeClient):
         if meters:
             query_params["meters"] = meters
 
-        response = self.session.get(url, params=query_params)
-        if response.ok:
-            data = response.json()
-            return MeterDataResponse(**data)
+        response = self.get(url, params=query_params, priority=HIGH)
+        if response is not None and response.ok:
+            return decode_meters_data(response.json)
         logger.error("Failed to retrieve meter data")
         return None
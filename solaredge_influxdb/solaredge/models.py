@@ -1,7 +1,18 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional
 from pydantic import BaseModel, NaiveDatetime
 
 
+class PhaseData(BaseModel):
+    acCurrent: Optional[float] = None
+    acVoltage: Optional[float] = None
+    acFrequency: Optional[float] = None
+    apparentPower: Optional[float] = None
+    activePower: Optional[float] = None
+    reactivePower: Optional[float] = None
+    cosPhi: Optional[float] = None
+
+
 class TelemetryData(BaseModel):
     date: NaiveDatetime
     totalActivePower: Optional[float] = None
@@ -16,33 +27,9 @@ class TelemetryData(BaseModel):
     vL2To3: Optional[float] = None
     vL3To1: Optional[float] = None
 
-    class L1Data(BaseModel):
-        acCurrent: float
-        acVoltage: float
-        acFrequency: float
-        apparentPower: float
-        activePower: float
-        reactivePower: float
-        cosPhi: float
-
-    class L2Data(BaseModel):
-        acCurrent: float
-        acVoltage: float
-        acFrequency: float
-        apparentPower: float
-        activePower: float
-        reactivePower: float
-        cosPhi: float
-
-    class L3Data(BaseModel):
-        acCurrent: float
-        acVoltage: float
-        acFrequency: float
-        apparentPower: float
-        activePower: float
-        reactivePower: float
-        cosPhi: float
-
+    L1Data: Optional[PhaseData] = None
+    L2Data: Optional[PhaseData] = None
+    L3Data: Optional[PhaseData] = None
     threePhaseInverterTelemetry: Optional[List[dict]] = None
 
 
@@ -51,6 +38,114 @@ class TelemetryResponse(BaseModel):
     telemetries: List[TelemetryData]
 
 
+def _optional_float(value: Any) -> Optional[float]:
+    return None if value is None else float(value)
+
+
+class PhaseRecord(NamedTuple):
+    """Compact per-phase values of a telemetry row, the fast path counterpart of PhaseData"""
+
+    acCurrent: Optional[float]
+    acVoltage: Optional[float]
+    acFrequency: Optional[float]
+    apparentPower: Optional[float]
+    activePower: Optional[float]
+    reactivePower: Optional[float]
+    cosPhi: Optional[float]
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> Optional["PhaseRecord"]:
+        """Decode the L1Data/L2Data/L3Data object of a row, None for phases the inverter doesn't have"""
+        if not data:
+            return None
+        get = data.get
+        return cls(
+            _optional_float(get("acCurrent")),
+            _optional_float(get("acVoltage")),
+            _optional_float(get("acFrequency")),
+            _optional_float(get("apparentPower")),
+            _optional_float(get("activePower")),
+            _optional_float(get("reactivePower")),
+            _optional_float(get("cosPhi")),
+        )
+
+
+class TelemetryRecord:
+    """Compact telemetry row with only the fields written to InfluxDB.
+    Decoding skips pydantic validation, use TelemetryData when the full row is needed."""
+
+    __slots__ = (
+        "date",
+        "totalActivePower",
+        "dcVoltage",
+        "totalEnergy",
+        "inverterMode",
+        "operationMode",
+        "vL1To2",
+        "vL2To3",
+        "vL3To1",
+        "L1Data",
+        "L2Data",
+        "L3Data",
+    )
+
+    def __init__(
+        self,
+        date: datetime,
+        totalActivePower: Optional[float],
+        dcVoltage: Optional[float],
+        totalEnergy: float,
+        inverterMode: str,
+        operationMode: int,
+        vL1To2: Optional[float] = None,
+        vL2To3: Optional[float] = None,
+        vL3To1: Optional[float] = None,
+        L1Data: Optional[PhaseRecord] = None,
+        L2Data: Optional[PhaseRecord] = None,
+        L3Data: Optional[PhaseRecord] = None,
+    ):
+        self.date = date
+        self.totalActivePower = totalActivePower
+        self.dcVoltage = dcVoltage
+        self.totalEnergy = totalEnergy
+        self.inverterMode = inverterMode
+        self.operationMode = operationMode
+        self.vL1To2 = vL1To2
+        self.vL2To3 = vL2To3
+        self.vL3To1 = vL3To1
+        self.L1Data = L1Data
+        self.L2Data = L2Data
+        self.L3Data = L3Data
+
+    @classmethod
+    def from_dict(cls, row: dict) -> "TelemetryRecord":
+        """Decode a telemetry row of the equipment data endpoint"""
+        get = row.get
+        return cls(
+            datetime.fromisoformat(row["date"]),
+            _optional_float(get("totalActivePower")),
+            _optional_float(get("dcVoltage")),
+            float(row["totalEnergy"]),
+            str(row["inverterMode"]),
+            int(row["operationMode"]),
+            _optional_float(get("vL1To2")),
+            _optional_float(get("vL2To3")),
+            _optional_float(get("vL3To1")),
+            PhaseRecord.from_dict(get("L1Data")),
+            PhaseRecord.from_dict(get("L2Data")),
+            PhaseRecord.from_dict(get("L3Data")),
+        )
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"TelemetryRecord({fields})"
+
+
+class TelemetryRecords(NamedTuple):
+    count: int
+    telemetries: List[TelemetryRecord]
+
+
 class ChangeLog(BaseModel):
     serialNumber: str
     partNumber: Optional[str]
@@ -170,7 +265,7 @@ class SitesResponse(BaseModel):
 
 class MeterEnergyValue(BaseModel):
     date: str
-    value: int
+    value: Optional[float] = None
 
 
 class MeterEnergyMeter(BaseModel):
@@ -189,3 +284,34 @@ class MeterEnergyDetails(BaseModel):
 
 class MeterDataResponse(BaseModel):
     meterEnergyDetails: MeterEnergyDetails
+
+
+class SiteValue(BaseModel):
+    date: str
+    value: Optional[float] = None
+
+
+class SiteSeries(BaseModel):
+    timeUnit: Optional[str] = None
+    unit: Optional[str] = None
+    measuredBy: Optional[str] = None
+    values: List[SiteValue]
+
+
+class OverviewData(BaseModel):
+    energy: Optional[float] = None
+    revenue: Optional[float] = None
+
+
+class CurrentPower(BaseModel):
+    power: Optional[float] = None
+
+
+class SiteOverview(BaseModel):
+    lastUpdateTime: str
+    lifeTimeData: Optional[OverviewData] = None
+    lastYearData: Optional[OverviewData] = None
+    lastMonthData: Optional[OverviewData] = None
+    lastDayData: Optional[OverviewData] = None
+    currentPower: Optional[CurrentPower] = None
+    measuredBy: Optional[str] = None
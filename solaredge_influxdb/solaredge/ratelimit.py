@@ -0,0 +1,162 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+from loguru import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: processes sharing a quota file don't coordinate there
+    fcntl = None
+
+from solaredge_influxdb.metrics import get_registry
+
+# Request priorities, low priority requests are skipped once only the reserve of the quota is left
+HIGH = 0
+LOW = 1
+
+
+@contextmanager
+def _file_lock(path: Optional[str]) -> Iterator[None]:
+    """Hold an exclusive lock on path.lock, so processes sharing a file update it one at a time"""
+    if path is None or fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class RateLimiter:
+    """Token bucket shared by every SolarEdge API request, combined with the daily request quota
+    of the API key. The quota state is persisted so it carries over between process runs, and
+    processes sharing the file, e.g. the daemon and a backfill, add their requests to one count."""
+
+    def __init__(
+        self,
+        daily_quota: int = 300,
+        rate: float = 1.0,  # Sustained requests per second
+        burst: int = 3,
+        low_priority_reserve: float = 0.1,  # Fraction of the daily quota kept for high priority requests
+        path: Optional[str] = None,
+    ):
+        self.daily_quota = daily_quota
+        self.rate = rate
+        self.burst = burst
+        self.low_priority_reserve = low_priority_reserve
+        self.path = path
+        self._lock = threading.Lock()
+        self.day = self._today()
+        self.used = 0
+        self.tokens = float(burst)
+        self.updated = time.time()
+        self._load()
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).date().isoformat()
+
+    @property
+    def remaining(self) -> int:
+        return max(self.daily_quota - self.used, 0)
+
+    def _read(self) -> Optional[dict]:
+        if self.path is None or not os.path.isfile(self.path):
+            return None
+        try:
+            with open(self.path, "r") as f:
+                state = json.load(f)
+            return {
+                "day": str(state["day"]),
+                "used": int(state["used"]),
+                "tokens": float(state["tokens"]),
+                "updated": float(state["updated"]),
+            }
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Ignoring unreadable rate limiter state {self.path}: {e}")
+            return None
+
+    def _load(self) -> None:
+        state = self._read()
+        if state is None:
+            return
+        self.tokens = min(state["tokens"], self.burst)
+        self.updated = state["updated"]
+        if state["day"] == self.day:
+            self.used = state["used"]
+
+    def _merge(self) -> None:
+        """Take over the requests other processes counted today in the shared file"""
+        state = self._read()
+        if state is not None and state["day"] == self.day:
+            self.used = max(self.used, state["used"])
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"day": self.day, "used": self.used, "tokens": self.tokens, "updated": self.updated}, f)
+        os.replace(tmp_path, self.path)
+
+    def acquire(self, priority: int = HIGH) -> bool:
+        """Count a request against the daily quota and wait for a token of the bucket.
+        Returns False, without waiting, when the request doesn't fit in the remaining quota."""
+        if not self._count(priority):
+            return False
+        while True:
+            wait = self._take_token()
+            if wait == 0:
+                return True
+            time.sleep(wait)
+
+    async def acquire_async(self, priority: int = HIGH) -> bool:
+        """acquire for coroutines, waiting for a token without blocking the event loop"""
+        import asyncio
+
+        if not self._count(priority):
+            return False
+        while True:
+            wait = self._take_token()
+            if wait == 0:
+                return True
+            await asyncio.sleep(wait)
+
+    def _count(self, priority: int) -> bool:
+        with self._lock, _file_lock(self.path):
+            today = self._today()
+            if today != self.day:
+                self.day = today
+                self.used = 0
+            self._merge()
+            if self.remaining <= 0:
+                return False
+            if priority == LOW and self.remaining <= self.daily_quota * self.low_priority_reserve:
+                return False
+            self.used += 1
+            # Written while the file is locked, so no other process overwrites the request counted here
+            self._save()
+            get_registry().set("solaredge_quota_remaining", self.remaining)
+            return True
+
+    def _take_token(self) -> float:
+        """Take a token of the bucket, or return the seconds until one is available"""
+        with self._lock:
+            now = time.time()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def report(self) -> None:
+        """Log the requests used and remaining today"""
+        logger.info(f"SolarEdge API requests used today: {self.used}, remaining: {self.remaining} of {self.daily_quota}")
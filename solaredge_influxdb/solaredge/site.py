@@ -1,5 +1,6 @@
 from typing import Union
 from .models import SitesResponse
+from .ratelimit import HIGH
 from loguru import logger
 
 
@@ -7,12 +8,10 @@ def list_sites(SolarEdgeClient) -> Union[SitesResponse, None]:
     """ "Request a list of sites from SolarEdge API"""
 
     url = f"{SolarEdgeClient.url}/sites/list"
-    query_params = {"api_key": SolarEdgeClient.api_key}
 
-    response = SolarEdgeClient.session.get(url, params=query_params)
+    data = SolarEdgeClient.get_json(url, "sites", priority=HIGH)
 
-    if response.ok:
-        data = response.json()
+    if data is not None:
         return SitesResponse(**data["sites"])
     logger.error("Failed to retrieve list of sites")
     return None
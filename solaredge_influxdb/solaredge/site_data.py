@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Type, TypeVar, Union
+
+from loguru import logger
+from pydantic import BaseModel
+from requests import RequestException, Session
+
+from solaredge_influxdb.metrics import get_registry
+from .cache import ResponseCache
+from .client import SolarEdgeClient
+from .models import SiteOverview, SiteSeries
+from .ratelimit import HIGH
+
+# Site IDs accepted by one request of the multi-site endpoints
+MAX_BULK_SITES = 100
+# Quarter-hourly energy and power are limited to one month per request
+MAX_SITE_DATA_RANGE = timedelta(days=28)
+
+Model = TypeVar("Model", bound=BaseModel)
+
+# Response keys per endpoint: of the multi-site response, of one site in its siteEnergyList and of the
+# single-site response
+ENDPOINTS = {
+    "energy": ("sitesEnergy", "energyValues", "energy"),
+    "power": ("powerDateValuesList", "powerDataValueSeries", "power"),
+    "overview": ("sitesOverviews", "siteOverview", "overview"),
+}
+
+
+class SiteData(SolarEdgeClient):
+    """Site-level energy, power and overview of many sites. Sites are requested in groups of up to
+    MAX_BULK_SITES through the comma-separated multi-site endpoints, so one request covers a whole
+    account; sites missing from a combined response are requested one by one."""
+
+    def __init__(
+        self,
+        api_key: str,
+        site_ids: Union[List[int], None] = None,
+        cache: Union[ResponseCache, None] = None,
+        session: Union[Session, None] = None,
+    ):
+        if not site_ids:
+            site_ids = SolarEdgeClient.list_site_ids(api_key, cache, session)
+        super().__init__(api_key, site_ids[0], cache=cache, session=session)
+        self.site_ids = site_ids
+
+    def get_energy(
+        self, start_time: datetime, end_time: datetime, site_ids: Union[List[int], None] = None
+    ) -> Dict[int, SiteSeries]:
+        """Get the quarter-hourly energy in Wh of every site, for the whole days from start_time to end_time"""
+        params = {
+            "timeUnit": "QUARTER_OF_AN_HOUR",
+            "startDate": start_time.strftime("%Y-%m-%d"),
+            "endDate": end_time.strftime("%Y-%m-%d"),
+        }
+        return self._get_sites("energy", params, SiteSeries, site_ids)
+
+    def get_power(
+        self, start_time: datetime, end_time: datetime, site_ids: Union[List[int], None] = None
+    ) -> Dict[int, SiteSeries]:
+        """Get the quarter-hourly power in W of every site between start_time and end_time"""
+        params = {
+            "startTime": start_time.strftime("%Y-%m-%d %H:%M:%S"),
+            "endTime": end_time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        return self._get_sites("power", params, SiteSeries, site_ids)
+
+    def get_overview(self, site_ids: Union[List[int], None] = None) -> Dict[int, SiteOverview]:
+        """Get the current power and the lifetime, year, month and day energy of every site"""
+        return self._get_sites("overview", None, SiteOverview, site_ids)
+
+    def _get_sites(
+        self,
+        endpoint: str,
+        params: Optional[Dict[str, str]],
+        model: Type[Model],
+        site_ids: Union[List[int], None] = None,
+    ) -> Dict[int, Model]:
+        """Request the sites in groups through the multi-site endpoint, falling back to the single-site
+        endpoint for sites the combined response doesn't contain. Sites that fail both are left out."""
+        site_ids = site_ids if site_ids is not None else self.site_ids
+        results: Dict[int, Model] = {}
+        for start in range(0, len(site_ids), MAX_BULK_SITES):
+            group = site_ids[start : start + MAX_BULK_SITES]
+            if len(group) > 1:
+                results.update(self._get_group(endpoint, group, params, model))
+                missing = [site_id for site_id in group if site_id not in results]
+                if missing:
+                    logger.warning(
+                        f"Site {endpoint} is missing for {len(missing)} of {len(group)} sites, requesting them one by one"
+                    )
+            else:
+                missing = group
+            for site_id in missing:
+                result = self._get_single(endpoint, site_id, params, model)
+                if result is not None:
+                    results[site_id] = result
+        return results
+
+    def _get_group(
+        self, endpoint: str, site_ids: List[int], params: Optional[Dict[str, str]], model: Type[Model]
+    ) -> Dict[int, Model]:
+        bulk_key, site_key, _ = ENDPOINTS[endpoint]
+        url = f"{self.url}/sites/{','.join(str(site_id) for site_id in site_ids)}/{endpoint}"
+        data = self._get_data(url, params, bulk_key)
+        if data is None:
+            return {}
+        results = {}
+        shared = {key: value for key, value in data.items() if key in ("timeUnit", "unit")}
+        registry = get_registry()
+        with registry.time("solaredge_decode_seconds", model=model.__name__):
+            for site in data.get("siteEnergyList", []):
+                try:
+                    results[int(site["siteId"])] = model(**{**shared, **site[site_key]})
+                except (KeyError, TypeError, ValueError) as e:
+                    logger.error(f"Ignoring unreadable {endpoint} of site {site.get('siteId')}: {e}")
+        registry.inc("solaredge_decoded_rows_total", len(results), model=model.__name__)
+        return results
+
+    def _get_single(
+        self, endpoint: str, site_id: int, params: Optional[Dict[str, str]], model: Type[Model]
+    ) -> Optional[Model]:
+        _, _, single_key = ENDPOINTS[endpoint]
+        data = self._get_data(f"{self.url}/site/{site_id}/{endpoint}", params, single_key)
+        if data is None:
+            return None
+        registry = get_registry()
+        try:
+            with registry.time("solaredge_decode_seconds", model=model.__name__):
+                result = model(**data)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Ignoring unreadable {endpoint} of site {site_id}: {e}")
+            return None
+        registry.inc("solaredge_decoded_rows_total", model=model.__name__)
+        return result
+
+    def _get_data(self, url: str, params: Optional[Dict[str, str]], key: str) -> Optional[dict]:
+        try:
+            response = self.get(url, params=params, priority=HIGH)
+            if response is not None and response.ok:
+                return response.json()[key]
+        except (RequestException, ValueError, KeyError) as e:
+            logger.error(f"Request to {url} failed: {e}")
+            return None
+        logger.error(f"Failed to retrieve {url}")
+        return None
@@ -0,0 +1,70 @@
+import codecs
+import json
+from typing import Iterable, Iterator
+
+_WHITESPACE = " \t\n\r"
+_SEPARATORS = _WHITESPACE + ","
+
+
+def iter_json_array(chunks: Iterable[bytes], key: str) -> Iterator[dict]:
+    """Decode the objects of the array stored under key one at a time, while the JSON document
+    is still being read, so only one object is in memory instead of the whole document"""
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer = ""
+    exhausted = False
+
+    def read() -> bool:
+        nonlocal buffer, exhausted
+        for chunk in chunks:
+            if chunk:
+                buffer += text_decoder.decode(chunk)
+                return True
+        if not exhausted:
+            buffer += text_decoder.decode(b"", final=True)
+            exhausted = True
+        return False
+
+    # Find the start of the array
+    marker = f'"{key}"'
+    while True:
+        index = buffer.find(marker)
+        if index >= 0:
+            buffer = buffer[index + len(marker):]
+            break
+        # Keep the tail in case the marker is split between two chunks
+        buffer = buffer[-len(marker):]
+        if not read():
+            return
+    while True:
+        stripped = buffer.lstrip(_WHITESPACE + ":")
+        if stripped:
+            if stripped[0] != "[":
+                raise ValueError(f"Expected an array for {key}")
+            buffer = stripped[1:]
+            break
+        buffer = stripped
+        if not read():
+            raise ValueError(f"Unexpected end of document after {key}")
+
+    # Decode the elements, reading more data whenever an element is incomplete
+    position = 0
+    while True:
+        while position < len(buffer) and buffer[position] in _SEPARATORS:
+            position += 1
+        if position == len(buffer):
+            buffer, position = "", 0
+            if not read():
+                raise ValueError(f"Unexpected end of document in {key}")
+            continue
+        if buffer[position] == "]":
+            return
+        try:
+            element, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            buffer, position = buffer[position:], 0
+            if not read():
+                raise
+            continue
+        yield element
@@ -0,0 +1,45 @@
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+
+class StateStore:
+    """Persist the date of the last record written to InfluxDB per serial number"""
+
+    def __init__(self, path: str = "state.json"):
+        self.path = path
+        self.watermarks: Dict[str, datetime] = self._load()
+
+    def _load(self) -> Dict[str, datetime]:
+        if not os.path.isfile(self.path):
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                return {key: datetime.fromisoformat(value) for key, value in json.load(f).items()}
+        except (ValueError, AttributeError) as e:
+            logger.error(f"Ignoring unreadable state file {self.path}: {e}")
+            return {}
+
+    def get(self, key: str) -> Optional[datetime]:
+        """Get the date of the last record written for a serial number"""
+        return self.watermarks.get(key)
+
+    def keys(self, prefix: str = "") -> List[str]:
+        """Get the keys with a watermark, optionally only those starting with prefix"""
+        return [key for key in self.watermarks if key.startswith(prefix)]
+
+    def update(self, key: str, value: datetime) -> None:
+        """Move the watermark of a serial number forward to value"""
+        current = self.watermarks.get(key)
+        if current is None or value > current:
+            self.watermarks[key] = value
+
+    def save(self) -> None:
+        """Write the watermarks to disk, replacing the previous file atomically"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({key: value.isoformat() for key, value in self.watermarks.items()}, f)
+        os.replace(tmp_path, self.path)
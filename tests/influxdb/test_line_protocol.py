@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+
+import influxdb_client
+import pytest
+
+from solaredge_influxdb.influxdb.line_protocol import LineProtocolSerializer, format_field_value
+
+TIME = datetime(2025, 5, 6, 22, 0, 0, 123456, tzinfo=timezone.utc)
+
+
+def test_line_matches_point_for_sorted_tags():
+    fields = [("ac_power", 1.5), ("dc_voltage", 750.0), ("operation_mode", 3), ("state", 'MPPT "on"'), ("ok", True)]
+    point = influxdb_client.Point("solar").tag("model", "SE 5000").tag("serial_number", "INV,1").time(TIME, "ms")
+    for key, value in fields:
+        point.field(key, value)
+
+    serializer = LineProtocolSerializer("solar", [("model", "SE 5000"), ("serial_number", "INV,1")])
+
+    # Point sorts field keys, the serializer keeps the given order
+    expected = point.to_line_protocol()
+    line = serializer.line(TIME, sorted(fields))
+    assert line == expected
+    assert line == (
+        "solar,model=SE\\ 5000,serial_number=INV\\,1 "
+        'ac_power=1.5,dc_voltage=750,ok=true,operation_mode=3i,state="MPPT \\"on\\"" 1746568800123'
+    )
+
+
+def test_line_skips_missing_values_and_empty_tags():
+    serializer = LineProtocolSerializer("solar", [("serial_number", "INV-1"), ("model", None)])
+
+    assert serializer.line(TIME, [("ac_power", None), ("dc_voltage", float("nan"))]) is None
+    assert serializer.line(TIME, [("ac_power", None), ("energy", 2.0)], [("inverter_mode", "")]) == (
+        "solar,serial_number=INV-1 energy=2 1746568800123"
+    )
+
+
+def test_serialize_appends_to_buffer():
+    serializer = LineProtocolSerializer("meter")
+    buffer = bytearray(b"meter energy=1 0")
+
+    assert serializer.serialize(buffer, TIME, [("energy", 2)], [("meter_type", "Production")]) == 1
+    assert serializer.serialize(buffer, TIME, [("energy", None)]) == 0
+    assert buffer == b"meter energy=1 0\nmeter,meter_type=Production energy=2i 1746568800123"
+
+
+def test_format_field_value_rejects_unsupported_types():
+    with pytest.raises(ValueError):
+        format_field_value([1, 2])
@@ -0,0 +1,107 @@
+import threading
+from unittest.mock import Mock, patch
+
+from solaredge_influxdb.influxdb.pipeline import DrainResult, WritePipeline, is_retryable
+from solaredge_influxdb.metrics import MetricsRegistry, set_registry
+
+
+class ApiError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+def test_pipeline_writes_batches_in_order_on_background_thread():
+    written = []
+    pipeline = WritePipeline(lambda bucket, payload: written.append((bucket, payload, threading.current_thread().name)))
+
+    pipeline.submit("energy", b"a")
+    pipeline.submit("energy_flow", b"b")
+    assert pipeline.drain()
+    pipeline.close()
+
+    assert written == [("energy", b"a", "influxdb-writer"), ("energy_flow", b"b", "influxdb-writer")]
+    assert pipeline.stats()["written"] == 2
+
+
+@patch("solaredge_influxdb.influxdb.pipeline.time.sleep")
+def test_pipeline_retries_with_backoff_then_reports_failure(mock_sleep):
+    write = Mock(side_effect=[ConnectionError("reset"), ApiError(503), None, ApiError(400)])
+    pipeline = WritePipeline(write, max_retries=3, base_delay=1.0)
+
+    pipeline.submit("energy", b"a")
+    assert pipeline.drain()
+    pipeline.submit("energy", b"rejected")
+    assert not pipeline.drain()
+    pipeline.close()
+
+    assert write.call_count == 4
+    delays = [c.args[0] for c in mock_sleep.call_args_list]
+    assert 0.5 <= delays[0] <= 1.0 and 1.0 <= delays[1] <= 2.0
+    assert pipeline.stats()["retries"] == 2
+    assert pipeline.stats()["failed"] == 1
+
+
+def test_pipeline_hands_retryable_failures_to_on_failure():
+    on_failure = Mock()
+    write = Mock(side_effect=[ConnectionError("refused"), ApiError(400)])
+    pipeline = WritePipeline(write, max_retries=0, on_failure=on_failure)
+
+    pipeline.submit("energy", b"unavailable")
+    # The batch is kept by on_failure, so nothing was lost, but it is reported as spooled
+    result = pipeline.drain()
+    assert result and result == DrainResult(failed=0, spooled=1)
+    pipeline.submit("energy", b"rejected")
+    # Rejected data would be rejected again, so it isn't handed to on_failure
+    assert pipeline.drain() == DrainResult(failed=1, spooled=0)
+    pipeline.close()
+
+    on_failure.assert_called_once_with("energy", b"unavailable")
+    assert pipeline.stats()["spooled"] == 1
+    assert pipeline.stats()["failed"] == 1
+
+
+def test_submit_blocks_while_queue_is_full():
+    release = threading.Event()
+    pipeline = WritePipeline(lambda bucket, payload: release.wait(), max_queue=1)
+
+    pipeline.submit("energy", b"a")  # Taken by the writer, which waits for release
+    pipeline.submit("energy", b"b")  # Fills the queue
+    producer = threading.Thread(target=pipeline.submit, args=("energy", b"c"))
+    producer.start()
+    producer.join(timeout=0.1)
+    assert producer.is_alive()
+
+    release.set()
+    producer.join(timeout=1)
+    assert not producer.is_alive()
+    pipeline.close()
+    assert pipeline.stats()["blocked"] >= 1
+
+
+def test_is_retryable():
+    assert is_retryable(ConnectionError("reset"))
+    assert is_retryable(ApiError(429))
+    assert is_retryable(ApiError(502))
+    assert not is_retryable(ApiError(400))
+
+
+def test_pipeline_exports_queue_depth_and_high_water_mark():
+    registry = MetricsRegistry()
+    previous = set_registry(registry)
+    release = threading.Event()
+    pipeline = WritePipeline(lambda bucket, payload: release.wait(), max_queue=4)
+    try:
+        for payload in (b"a", b"b", b"c"):
+            pipeline.submit("energy", payload)
+        high_water = registry.summary()["influxdb_queue_high_water"][0]["value"]
+        release.set()
+        pipeline.drain()
+        pipeline.close()
+    finally:
+        set_registry(previous)
+
+    # The writer takes the first batch, at least two wait behind it
+    assert high_water >= 2
+    assert registry.summary()["influxdb_queue_depth"][0]["value"] == 0
+    assert pipeline.stats()["high_water"] == high_water
@@ -0,0 +1,103 @@
+from unittest.mock import Mock, call, patch
+
+import pytest
+
+from solaredge_influxdb.influxdb.spool import Spool
+
+
+def test_replay_writes_batches_in_order_and_empties_spool(tmp_path):
+    spool = Spool(str(tmp_path), segment_size=20)
+    spool.append("energy", b"solar total_energy=1 1")
+    spool.append("energy_flow", b"solar ac_power=2 2")
+    spool.append("energy", b"solar total_energy=3 3")
+    assert len(spool.segments()) == 3  # Every batch fills a segment of 20 bytes
+
+    write = Mock()
+    assert spool.replay(write)
+
+    assert write.call_args_list == [
+        call("energy", b"solar total_energy=1 1"),
+        call("energy_flow", b"solar ac_power=2 2"),
+        call("energy", b"solar total_energy=3 3"),
+    ]
+    assert not spool
+    assert spool.segments() == []
+
+
+def test_replay_keeps_remaining_batches_after_failure(tmp_path):
+    spool = Spool(str(tmp_path))
+    spool.append("energy", b"a")
+    spool.append("energy", b"b")
+    spool.append("energy", b"c")
+
+    assert not spool.replay(Mock(side_effect=[None, ConnectionError("refused")]))
+    spool.append("energy", b"d")
+
+    write = Mock()
+    assert Spool(str(tmp_path)).replay(write)
+    assert write.call_args_list == [call("energy", b"b"), call("energy", b"c"), call("energy", b"d")]
+
+
+def test_oldest_segments_are_evicted_beyond_max_size(tmp_path):
+    spool = Spool(str(tmp_path), segment_size=10, max_size=40)
+    for i in range(6):
+        spool.append("energy", b"batch-%d" % i)
+
+    write = Mock()
+    spool.replay(write)
+
+    # Every segment holds one 19 byte record, two of them fit in the cap
+    assert [c.args[1] for c in write.call_args_list] == [b"batch-4", b"batch-5"]
+
+
+def test_incomplete_record_at_the_end_is_ignored(tmp_path):
+    spool = Spool(str(tmp_path))
+    spool.append("energy", b"complete")
+    spool.close()
+    with open(spool.segments()[0], "ab") as f:
+        f.write(b"\x00\x06\x00\x00\x00\x10ener")
+
+    write = Mock()
+    assert spool.replay(write)
+    write.assert_called_once_with("energy", b"complete")
+
+
+@patch("solaredge_influxdb.influxdb.spool.time.sleep")
+def test_replay_is_throttled(mock_sleep, tmp_path):
+    spool = Spool(str(tmp_path), replay_rate=10)
+    spool.append("energy", b"x" * 100)
+    spool.append("energy", b"y" * 100)
+
+    spool.replay(Mock())
+
+    (sleep_call,) = mock_sleep.call_args_list
+    assert 9 < sleep_call.args[0] <= 10
+
+
+def test_fsync_always_syncs_every_append(tmp_path):
+    spool = Spool(str(tmp_path), fsync="always")
+    with patch("solaredge_influxdb.influxdb.spool.os.fsync") as mock_fsync:
+        spool.append("energy", b"a")
+        spool.append("energy", b"b")
+    assert mock_fsync.call_count == 2
+
+    with pytest.raises(ValueError):
+        Spool(str(tmp_path), fsync="sometimes")
+
+
+def test_replay_moves_rejected_batches_aside(tmp_path):
+    class ApiError(Exception):
+        status = 400
+
+    spool = Spool(str(tmp_path))
+    spool.append("energy", b"solar total_energy=\"text\" 1")
+    spool.append("energy", b"solar total_energy=2 2")
+
+    write = Mock(side_effect=[ApiError("field type conflict"), None])
+    assert spool.replay(write)
+
+    assert write.call_args_list[-1] == call("energy", b"solar total_energy=2 2")
+    assert not spool
+    assert (tmp_path / "rejected.lp").read_bytes() == b"# bucket=energy\nsolar total_energy=\"text\" 1\n"
+    # Later replays aren't blocked by the rejected batch
+    assert spool.replay(Mock())
@@ -1,4 +1,4 @@
-from solaredge_influxdb.influxdb import InfluxDBClient
+from solaredge_influxdb.influxdb import InfluxDBClient, LineProtocolSerializer
 
 from influxdb_client.client.query_api import QueryApi
 from datetime import datetime, timedelta, tzinfo
@@ -37,14 +37,9 @@ def test_write_api(create_influx_config) -> None:
 
     event_time = datetime.now().replace(tzinfo=pytz.utc) + timedelta(minutes=-15)
 
-    test_data = InfluxClient.convert_to_point(
-        event_time,
-        "test_measurement",
-        [("field1", 123), ("field2", 456)],
-        [("tag1", "value1"), ("tag2", "value2")],
-    )
-
-    InfluxClient.write(test_data, "test")
+    serializer = LineProtocolSerializer("test_measurement", [("tag1", "value1"), ("tag2", "value2")])
+    InfluxClient.add_fields(serializer, "test", event_time, [("field1", 123), ("field2", 456)])
+    assert InfluxClient.drain()
     print("Test data written to InfluxDB successfully.")
 
     influxQueryAPI: QueryApi = InfluxClient.client.query_api()
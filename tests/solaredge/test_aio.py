@@ -0,0 +1,151 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from solaredge_influxdb.solaredge.cache import ResponseCache
+from solaredge_influxdb.solaredge.client import SolarEdgeClient
+from solaredge_influxdb.solaredge.ratelimit import RateLimiter
+
+web = pytest.importorskip("aiohttp.web")
+from solaredge_influxdb.solaredge.aio import AsyncSolarEdgeClient  # noqa: E402
+
+TELEMETRY = {
+    "date": "2026-05-06 12:05:00",
+    "totalActivePower": 1954.0,
+    "dcVoltage": 750.5,
+    "powerLimit": 100.0,
+    "totalEnergy": 12653300.0,
+    "inverterMode": "MPPT",
+    "operationMode": 0,
+    "L1Data": {"acCurrent": 8.5, "acVoltage": 231.2, "activePower": 1954.0},
+}
+
+
+@asynccontextmanager
+async def _server(routes, tmp_path, daily_quota=100):
+    app = web.Application()
+    app.add_routes(routes)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    limiter = RateLimiter(daily_quota, rate=1000.0, burst=1000)
+    with patch.object(AsyncSolarEdgeClient, "url", f"http://127.0.0.1:{port}"), patch.object(
+        SolarEdgeClient, "rate_limiter", limiter
+    ):
+        client = AsyncSolarEdgeClient("api-key", site_id=123, cache=ResponseCache(str(tmp_path)), backoff_factor=0)
+        try:
+            yield client
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+
+def test_technical_data_decodes_into_the_same_models(tmp_path):
+    async def technical_data(request):
+        assert request.query["api_key"] == "api-key"
+        assert request.query["startTime"] == "2026-05-06 12:00:00"
+        return web.json_response({"data": {"count": 1, "telemetries": [TELEMETRY]}})
+
+    async def run():
+        routes = [web.get("/equipment/123/7E1234AB-01/data.json", technical_data)]
+        async with _server(routes, tmp_path) as client:
+            start, end = datetime(2026, 5, 6, 12, 0), datetime(2026, 5, 6, 12, 15)
+            return (
+                await client.get_technical_data("7E1234AB-01", start, end),
+                await client.get_technical_data("7E1234AB-01", start, end, full_models=False),
+            )
+
+    full, records = asyncio.run(run())
+
+    assert full.telemetries[0].totalActivePower == 1954.0
+    assert records.count == 1
+    assert records.telemetries[0].date == datetime(2026, 5, 6, 12, 5)
+    assert records.telemetries[0].L1Data.acVoltage == 231.2
+
+
+def test_components_are_served_from_the_cache(tmp_path):
+    calls = []
+
+    async def components(request):
+        calls.append(request)
+        inverter = {"name": "Inverter 1", "manufacturer": "SolarEdge", "model": "SE16K", "serialNumber": "7E1234AB-01"}
+        return web.json_response({"reporters": {"count": 1, "list": [inverter]}})
+
+    async def run():
+        async with _server([web.get("/equipment/123/list", components)], tmp_path) as client:
+            return await client.get_components(), await client.get_components()
+
+    first, second = asyncio.run(run())
+
+    assert first.list[0].serialNumber == second.list[0].serialNumber == "7E1234AB-01"
+    assert len(calls) == 1
+
+
+def test_server_errors_are_retried_but_throttling_is_not(tmp_path):
+    statuses = {"inventory": [503, 502], "meters": [429]}
+    calls = {"inventory": 0, "meters": 0}
+
+    def handler(name, body):
+        async def handle(request):
+            calls[name] += 1
+            if statuses[name]:
+                return web.json_response({}, status=statuses[name].pop(0))
+            return web.json_response(body)
+
+        return handle
+
+    inventory = {"Inventory": {"meters": [], "sensors": [], "gateways": [], "batteries": [], "inverters": []}}
+
+    async def run():
+        routes = [
+            web.get("/site/123/inventory", handler("inventory", inventory)),
+            web.get("/site/123/meters", handler("meters", {})),
+        ]
+        async with _server(routes, tmp_path) as client:
+            return (
+                await client.get_inventory(),
+                await client.get_meters_data(datetime(2026, 5, 6, 12, 0), datetime(2026, 5, 6, 13, 0)),
+            )
+
+    inventory_response, meters_response = asyncio.run(run())
+
+    assert inventory_response.Inventory.inverters == []
+    assert calls == {"inventory": 3, "meters": 1}
+    assert meters_response is None
+
+
+def test_requests_reuse_one_kept_alive_connection(tmp_path):
+    connections = set()
+
+    async def sites(request):
+        connections.add(id(request.transport))
+        return web.json_response({"sites": {"count": 0, "site": []}})
+
+    async def run():
+        async with _server([web.get("/sites/list", sites)], tmp_path) as client:
+            for _ in range(5):
+                await client.get(f"{client.url}/sites/list")
+
+    asyncio.run(run())
+
+    assert len(connections) == 1
+
+
+def test_requests_without_quota_are_skipped(tmp_path):
+    calls = []
+
+    async def sites(request):
+        calls.append(request)
+        return web.json_response({"sites": {"count": 0, "site": []}})
+
+    async def run():
+        async with _server([web.get("/sites/list", sites)], tmp_path, daily_quota=0) as client:
+            return await client.list_sites()
+
+    assert asyncio.run(run()) is None
+    assert calls == []
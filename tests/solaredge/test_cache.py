@@ -0,0 +1,61 @@
+import os
+from datetime import timedelta
+
+from solaredge_influxdb.solaredge.cache import ResponseCache
+
+
+def test_key_ignores_param_order_and_hashes_api_key():
+    key = ResponseCache.key("https://api/site", {"b": "2", "api_key": "secret", "a": "1"})
+
+    assert key == "https://api/site?a=1&b=2"
+    account_key = ResponseCache.key("https://api/sites/list", api_key="secret")
+    assert account_key.startswith("https://api/sites/list?#")
+    assert "secret" not in account_key
+    assert account_key != ResponseCache.key("https://api/sites/list", api_key="other")
+
+
+def test_entries_expire_per_endpoint(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttls={"components": timedelta(hours=1), "inventory": timedelta(0)})
+    cache.put("components", "components", {"list": []})
+    cache.put("inventory", "inventory", {"Inventory": {}})
+
+    assert cache.is_fresh(cache.get("components"))
+    assert not cache.is_fresh(cache.get("inventory"))
+    assert cache.get("missing") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_entries=2)
+    cache.put("a", "sites", {"a": 1})
+    cache.put("b", "sites", {"b": 1})
+    os.utime(cache._path("a"), (1, 1))
+    os.utime(cache._path("b"), (2, 2))
+    cache.get("a")  # Reading "a" makes "b" the least recently used entry
+
+    cache.put("c", "sites", {"c": 1})
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+def test_invalidate_by_endpoint(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put("sites", "sites", {})
+    cache.put("components", "components", {})
+
+    cache.invalidate("components")
+    assert cache.get("sites") is not None
+    assert cache.get("components") is None
+
+    cache.invalidate()
+    assert cache.get("sites") is None
+
+
+def test_invalidate_includes_site_caches(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    site_cache = ResponseCache(str(tmp_path / "site-123"))
+    site_cache.put("components", "components", {})
+
+    cache.invalidate()
+    assert site_cache.get("components") is None
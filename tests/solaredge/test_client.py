@@ -1,41 +1,201 @@
+import gzip
+import json
+import threading
 import pytest
-from unittest.mock import Mock, mock_open, patch
-from solaredge_influxdb.solaredge.client import SolarEdgeClient
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch
+from solaredge_influxdb.solaredge.cache import ResponseCache
+from solaredge_influxdb.solaredge.client import DEFAULT_TIMEOUT, SolarEdgeClient, create_session
+
+SITE = {
+    "id": 123,
+    "name": "Site 1",
+    "accountId": 456,
+    "status": "Active",
+    "peakPower": 1000.0,
+    "installationDate": "2022-01-01",
+    "notes": "",
+    "type": "Residential",
+    "location": {
+        "country": "Netherlands",
+        "city": "Amsterdam",
+        "address": "Dam 1",
+        "zip": "1012 JS",
+        "timeZone": "Europe/Amsterdam",
+    },
+    "uris": {},
+}
 
 
 class TestSolarEdgeClient:
 
+    def test_create_session(self):
+        session = create_session(pool_maxsize=20)
+        assert session.headers["Accept"] == "application/json"
+        assert "gzip" in session.headers["Accept-Encoding"]
+        adapter = session.get_adapter("https://monitoringapi.solaredge.com")
+        assert 429 not in adapter.max_retries.status_forcelist
+        assert adapter._pool_maxsize == 20
+        assert session.get_adapter("http://127.0.0.1") is adapter
+
     @patch("solaredge_influxdb.solaredge.client.list_sites")
-    def test_init_session(self, mock_list_sites):
+    def test_clients_share_session(self, mock_list_sites):
         mock_list_sites.return_value = Mock(count=1, site=[Mock(id=123)])
-        client = SolarEdgeClient("api_key")
-        assert client.session.headers["Accept"] == "application/json"
+        first, second = SolarEdgeClient("api_key"), SolarEdgeClient("api_key")
+        assert first.session is second.session is SolarEdgeClient.session
+        adapter = first.session.get_adapter("https://monitoringapi.solaredge.com")
+        SolarEdgeClient("api_key")
+        assert first.session.get_adapter("https://monitoringapi.solaredge.com") is adapter
 
-    @patch("solaredge_influxdb.solaredge.client.os.path.isfile", return_value=True)
-    @patch("solaredge_influxdb.solaredge.client.open", mock_open(read_data="123"))
-    def test_get_site_from_file(self, mock_isfile):
-        client = SolarEdgeClient("api_key")
-        site_id = client.get_site()
+    def test_own_session(self):
+        session = create_session()
+        client = SolarEdgeClient("api_key", site_id=123, session=session)
+        assert client.session is session
+        assert SolarEdgeClient.session is not session
+
+    def test_session_keeps_connection_alive(self):
+        body = json.dumps({"sites": {"count": 0, "site": []}}).encode()
+        connections = set()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                connections.add(self.client_address)
+                payload = gzip.compress(body) if "gzip" in self.headers.get("Accept-Encoding", "") else body
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                if payload is not body:
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            client = SolarEdgeClient("api_key", site_id=123, session=create_session())
+            client.rate_limiter = Mock()
+            client.rate_limiter.acquire.return_value = True
+            url = f"http://127.0.0.1:{server.server_address[1]}/sites/list"
+            responses = [client.get(url) for _ in range(5)]
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert all(response.json() == {"sites": {"count": 0, "site": []}} for response in responses)
+        assert responses[0].headers["Content-Encoding"] == "gzip"
+        assert len(connections) == 1
+
+    def test_get_site_from_cache(self, tmp_path):
+        cache = ResponseCache(str(tmp_path))
+        url = f"{SolarEdgeClient.url}/sites/list"
+        cache.put(cache.key(url, api_key="api_key"), "sites", {"sites": {"count": 1, "site": [SITE]}})
+        with patch.object(SolarEdgeClient, "session") as mock_session:
+            client = SolarEdgeClient("api_key", cache=cache)
+            site_id = client.get_site()
         assert site_id == 123
+        mock_session.get.assert_not_called()
 
-    @patch(
-        "solaredge_influxdb.solaredge.client.os.path.isfile",
-        return_value=False,
-    )
     @patch("solaredge_influxdb.solaredge.client.list_sites")
-    def test_get_site_from_api(self, mock_list_sites, mock_isfile):
+    def test_get_site_from_api(self, mock_list_sites):
         mock_list_sites.return_value = Mock(count=1, site=[Mock(id=123)])
         client = SolarEdgeClient("api_key")
         site_id = client.get_site()
         assert site_id == 123
 
-    @patch(
-        "solaredge_influxdb.solaredge.client.os.path.isfile",
-        return_value=False,
-    )
     @patch("solaredge_influxdb.solaredge.client.list_sites")
-    def test_get_site_no_site(self, mock_list_sites, mock_isfile):
+    def test_get_sites_lists_every_site(self, mock_list_sites):
+        mock_list_sites.return_value = Mock(count=2, site=[Mock(id=123), Mock(id=456)])
+        client = SolarEdgeClient("api_key")
+        assert client.site_id == 123
+        assert client.get_sites() == [123, 456]
+
+    @patch("solaredge_influxdb.solaredge.client.list_sites")
+    def test_list_site_ids_doesnt_choose_a_site(self, mock_list_sites):
+        mock_list_sites.return_value = Mock(count=2, site=[Mock(id=123), Mock(id=456)])
+        with patch.object(SolarEdgeClient, "get_site") as mock_get_site:
+            assert SolarEdgeClient.list_site_ids("api_key") == [123, 456]
+        mock_get_site.assert_not_called()
+
+    @patch("solaredge_influxdb.solaredge.client.list_sites")
+    def test_get_site_no_site(self, mock_list_sites):
         mock_list_sites.return_value = None
         with pytest.raises(AttributeError):
             client = SolarEdgeClient("api_key")
             client.get_site()
+
+    @patch("solaredge_influxdb.solaredge.client.list_sites")
+    def test_get_skips_request_without_quota(self, mock_list_sites):
+        mock_list_sites.return_value = Mock(count=1, site=[Mock(id=123)])
+        client = SolarEdgeClient("api_key")
+        client.rate_limiter = Mock()
+        client.rate_limiter.acquire.return_value = False
+        client.session = Mock()
+
+        assert client.get("https://monitoringapi.solaredge.com/site/123/overview") is None
+        client.session.get.assert_not_called()
+
+    @patch("solaredge_influxdb.solaredge.client.list_sites")
+    def test_get_adds_api_key(self, mock_list_sites):
+        mock_list_sites.return_value = Mock(count=1, site=[Mock(id=123)])
+        client = SolarEdgeClient("api_key")
+        client.rate_limiter = Mock()
+        client.rate_limiter.acquire.return_value = True
+        client.session = Mock()
+
+        client.get("https://monitoringapi.solaredge.com/site/123/overview", {"startTime": "2026-05-06 12:00:00"})
+
+        client.session.get.assert_called_once_with(
+            "https://monitoringapi.solaredge.com/site/123/overview",
+            params={"api_key": "api_key", "startTime": "2026-05-06 12:00:00"},
+            headers=None,
+            timeout=DEFAULT_TIMEOUT,
+        )
+
+    @patch("solaredge_influxdb.solaredge.client.list_sites")
+    def test_get_json_caches_response(self, mock_list_sites, tmp_path):
+        mock_list_sites.return_value = Mock(count=1, site=[Mock(id=123)])
+        client = SolarEdgeClient("api_key", cache=ResponseCache(str(tmp_path)))
+        client.get = Mock(return_value=Mock(ok=True, status_code=200, headers={}, json=Mock(return_value={"a": 1})))
+
+        assert client.get_json("https://monitoringapi.solaredge.com/site/123/inventory", "inventory") == {"a": 1}
+        assert client.get_json("https://monitoringapi.solaredge.com/site/123/inventory", "inventory") == {"a": 1}
+        client.get.assert_called_once()
+
+    @patch("solaredge_influxdb.solaredge.client.list_sites")
+    def test_get_json_revalidates_expired_response(self, mock_list_sites, tmp_path):
+        mock_list_sites.return_value = Mock(count=1, site=[Mock(id=123)])
+        cache = ResponseCache(str(tmp_path), ttls={"inventory": timedelta(0)})
+        url = "https://monitoringapi.solaredge.com/site/123/inventory"
+        cache.put(cache.key(url, api_key="api_key"), "inventory", {"a": 1}, etag='"v1"')
+        client = SolarEdgeClient("api_key", cache=cache)
+        client.get = Mock(return_value=Mock(ok=False, status_code=304))
+
+        assert client.get_json(url, "inventory") == {"a": 1}
+        assert client.get.call_args.kwargs["headers"] == {"If-None-Match": '"v1"'}
+
+    @patch("solaredge_influxdb.solaredge.client.list_sites")
+    def test_get_json_serves_expired_response_on_error(self, mock_list_sites, tmp_path):
+        mock_list_sites.return_value = Mock(count=1, site=[Mock(id=123)])
+        cache = ResponseCache(str(tmp_path), ttls={"components": timedelta(0)})
+        url = "https://monitoringapi.solaredge.com/equipment/123/list"
+        cache.put(cache.key(url, api_key="api_key"), "components", {"list": []})
+        client = SolarEdgeClient("api_key", cache=cache)
+        client.get = Mock(return_value=Mock(ok=False, status_code=503))
+
+        assert client.get_json(url, "components") == {"list": []}
+
+    def test_get_json_keeps_accounts_apart(self, tmp_path):
+        cache = ResponseCache(str(tmp_path))
+        url = f"{SolarEdgeClient.url}/sites/list"
+        cache.put(cache.key(url, api_key="other"), "sites", {"sites": {"count": 1, "site": [SITE]}})
+        with patch.object(SolarEdgeClient, "session") as mock_session, patch.object(SolarEdgeClient, "rate_limiter"):
+            mock_session.get.return_value = Mock(ok=False, status_code=403)
+            with pytest.raises(AttributeError):
+                SolarEdgeClient("api_key", cache=cache)
+        mock_session.get.assert_called_once()
@@ -0,0 +1,66 @@
+import pytest
+
+from solaredge_influxdb.solaredge.models import PhaseRecord, TelemetryData, TelemetryRecord
+
+ROW = {
+    "date": "2026-05-06 12:05:00",
+    "totalActivePower": 1200,
+    "dcVoltage": 400.5,
+    "groundFaultResistance": 6672.34,
+    "powerLimit": 100.0,
+    "totalEnergy": 2500,
+    "temperature": 54.8,
+    "inverterMode": "MPPT",
+    "operationMode": 0,
+    "vL1To2": 400.1,
+    "vL2To3": 400.2,
+    "vL3To1": 400.3,
+    "L1Data": {
+        "acCurrent": 22.653,
+        "acVoltage": 231.2,
+        "acFrequency": 50.01,
+        "apparentPower": 1964.0,
+        "activePower": 1954.0,
+        "reactivePower": -89.0,
+        "cosPhi": 1.0,
+    },
+}
+
+
+def test_record_matches_model_on_written_fields():
+    model = TelemetryData(**ROW)
+    record = TelemetryRecord.from_dict(ROW)
+
+    for field in TelemetryRecord.__slots__:
+        if field.endswith("Data"):
+            continue
+        assert getattr(record, field) == getattr(model, field)
+    assert record.L1Data._asdict() == model.L1Data.model_dump()
+    assert record.L2Data is None and model.L2Data is None
+
+
+def test_record_optional_fields_default_to_none():
+    row = {key: ROW[key] for key in ("date", "totalEnergy", "inverterMode", "operationMode")}
+
+    record = TelemetryRecord.from_dict(row)
+
+    assert record.totalActivePower is None
+    assert record.dcVoltage is None
+    assert record.vL1To2 is None
+    assert record.L1Data is None
+
+
+def test_record_rejects_rows_without_required_fields():
+    row = dict(ROW)
+    del row["totalEnergy"]
+
+    with pytest.raises(KeyError):
+        TelemetryRecord.from_dict(row)
+
+
+def test_phase_record_keeps_missing_phase_values_empty():
+    phase = PhaseRecord.from_dict({"acCurrent": 1, "acVoltage": 230.5})
+
+    assert phase.acCurrent == 1.0
+    assert phase.acVoltage == 230.5
+    assert phase.cosPhi is None
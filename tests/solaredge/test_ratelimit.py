@@ -0,0 +1,82 @@
+import asyncio
+from unittest.mock import patch
+
+from solaredge_influxdb.solaredge.ratelimit import HIGH, LOW, RateLimiter
+
+
+def test_acquire_stops_at_daily_quota():
+    limiter = RateLimiter(daily_quota=3, rate=1000, burst=10)
+
+    assert [limiter.acquire() for _ in range(4)] == [True, True, True, False]
+    assert limiter.used == 3
+    assert limiter.remaining == 0
+
+
+def test_low_priority_requests_are_skipped_when_quota_is_tight():
+    limiter = RateLimiter(daily_quota=10, rate=1000, burst=10, low_priority_reserve=0.2)
+    limiter.used = 8
+
+    assert limiter.acquire(LOW) is False
+    assert limiter.acquire(HIGH) is True
+    assert limiter.used == 9
+
+
+def test_quota_is_persisted_between_runs(tmp_path):
+    path = str(tmp_path / "quota.json")
+    limiter = RateLimiter(daily_quota=10, rate=1000, burst=10, path=path)
+    limiter.acquire()
+    limiter.acquire()
+
+    assert RateLimiter(daily_quota=10, path=path).used == 2
+
+
+def test_processes_sharing_the_quota_file_add_up_their_requests(tmp_path):
+    path = str(tmp_path / "quota.json")
+    daemon = RateLimiter(daily_quota=4, rate=1000, burst=10, path=path)
+    backfill = RateLimiter(daily_quota=4, rate=1000, burst=10, path=path)
+
+    assert [daemon.acquire(), backfill.acquire(), daemon.acquire(), backfill.acquire()] == [True] * 4
+    assert daemon.acquire() is False
+    assert backfill.acquire() is False
+    assert RateLimiter(daily_quota=4, path=path).used == 4
+
+
+def test_quota_file_is_written_only_when_a_request_is_counted(tmp_path):
+    limiter = RateLimiter(daily_quota=1, rate=1000, burst=10, path=str(tmp_path / "quota.json"))
+
+    with patch.object(RateLimiter, "_save") as mock_save:
+        limiter.acquire()
+        limiter.acquire()
+
+    mock_save.assert_called_once()
+
+
+def test_quota_resets_on_a_new_day(tmp_path):
+    path = str(tmp_path / "quota.json")
+    limiter = RateLimiter(daily_quota=1, rate=1000, burst=10, path=path)
+    limiter.acquire()
+
+    with patch.object(RateLimiter, "_today", return_value="2999-01-01"):
+        assert limiter.acquire() is True
+    assert limiter.used == 1
+
+
+def test_acquire_waits_for_a_token():
+    limiter = RateLimiter(daily_quota=10, rate=2, burst=1)
+    limiter.acquire()
+
+    with patch("solaredge_influxdb.solaredge.ratelimit.time.sleep") as mock_sleep:
+        with patch("solaredge_influxdb.solaredge.ratelimit.time.time", side_effect=[limiter.updated, limiter.updated + 0.5]):
+            assert limiter.acquire() is True
+
+    mock_sleep.assert_called_once()
+    assert mock_sleep.call_args.args[0] == 0.5
+
+
+def test_acquire_async_shares_the_quota():
+    limiter = RateLimiter(daily_quota=2, rate=1000, burst=10)
+    limiter.acquire()
+
+    assert asyncio.run(limiter.acquire_async()) is True
+    assert asyncio.run(limiter.acquire_async()) is False
+    assert limiter.used == 2
@@ -9,6 +9,10 @@ class MockSolarEdgeClient:
         self.api_key = api_key
         self.session = None
 
+    def get_json(self, url, endpoint, params=None, priority=None):
+        response = self.session.get(url, params)
+        return response.json() if response.ok else None
+
 
 class MockSession:
     def __init__(self, response):
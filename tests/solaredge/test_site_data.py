@@ -0,0 +1,76 @@
+from datetime import datetime
+from unittest.mock import Mock, patch
+
+from requests import ConnectionError
+
+from solaredge_influxdb.solaredge.site_data import MAX_BULK_SITES, SiteData
+
+START = datetime(2026, 5, 6, 11, 0, 0)
+END = datetime(2026, 5, 6, 12, 0, 0)
+
+
+def _client(site_ids):
+    client = SiteData.__new__(SiteData)
+    client.api_key = "api_key"
+    client.site_id = site_ids[0]
+    client.site_ids = site_ids
+    return client
+
+
+def _response(data, ok=True):
+    return Mock(ok=ok, json=Mock(return_value=data))
+
+
+def _series(value):
+    return {"measuredBy": "INVERTER", "values": [{"date": "2026-05-06 11:00:00", "value": value}]}
+
+
+def test_power_of_many_sites_uses_one_request_per_group():
+    site_ids = list(range(1, MAX_BULK_SITES + 2))
+    client = _client(site_ids)
+    bulk = {
+        "powerDateValuesList": {
+            "timeUnit": "QUARTER_OF_AN_HOUR",
+            "unit": "W",
+            "siteEnergyList": [{"siteId": site_id, "powerDataValueSeries": _series(site_id)} for site_id in site_ids],
+        }
+    }
+    single = {"power": {"timeUnit": "QUARTER_OF_AN_HOUR", "unit": "W", **_series(101.0)}}
+    with patch.object(SiteData, "get", side_effect=[_response(bulk), _response(single)]) as mock_get:
+        power = client.get_power(START, END)
+
+    first_url, second_url = (c.args[0] for c in mock_get.call_args_list)
+    assert first_url == f"{SiteData.url}/sites/{','.join(str(site_id) for site_id in range(1, 101))}/power"
+    # The remaining site is requested on its own
+    assert second_url == f"{SiteData.url}/site/101/power"
+    assert len(power) == len(site_ids)
+    assert power[2].unit == "W"
+    assert power[2].values[0].value == 2
+    assert power[101].values[0].value == 101.0
+
+
+def test_sites_missing_from_the_combined_response_are_requested_one_by_one():
+    client = _client([1, 2, 3])
+    bulk = {"sitesOverviews": {"count": 1, "siteEnergyList": [{"siteId": 1, "siteOverview": {"lastUpdateTime": "x"}}]}}
+    overview = {"overview": {"lastUpdateTime": "2026-05-06 11:55:00", "currentPower": {"power": 1200.0}}}
+    responses = [_response(bulk), _response(overview), _response(None, ok=False)]
+    with patch.object(SiteData, "get", side_effect=responses) as mock_get:
+        overviews = client.get_overview()
+
+    assert [c.args[0] for c in mock_get.call_args_list] == [
+        f"{SiteData.url}/sites/1,2,3/overview",
+        f"{SiteData.url}/site/2/overview",
+        f"{SiteData.url}/site/3/overview",
+    ]
+    assert set(overviews) == {1, 2}
+    assert overviews[2].currentPower.power == 1200.0
+
+
+def test_failed_combined_request_falls_back_to_every_site():
+    client = _client([1, 2])
+    energy = {"energy": {"timeUnit": "QUARTER_OF_AN_HOUR", "unit": "Wh", **_series(50.0)}}
+    with patch.object(SiteData, "get", side_effect=[ConnectionError("reset"), _response(energy), _response(energy)]):
+        result = client.get_energy(START, END)
+
+    assert set(result) == {1, 2}
+    assert result[1].values[0].value == 50.0
@@ -0,0 +1,71 @@
+import json
+from datetime import datetime
+from unittest.mock import MagicMock, Mock, patch
+
+import pytest
+
+from solaredge_influxdb.solaredge.equipment import Equipment
+from solaredge_influxdb.solaredge.stream import iter_json_array
+
+TELEMETRY = {
+    "date": "2026-05-06 12:05:00",
+    "totalActivePower": 1200.0,
+    "dcVoltage": 400.0,
+    "powerLimit": 100.0,
+    "totalEnergy": 2500.0,
+    "inverterMode": "MPPT",
+    "operationMode": 0,
+    "vL1To2": 400.1,
+    "vL2To3": 400.2,
+    "vL3To1": 400.3,
+}
+
+
+def _chunks(document: bytes, size: int):
+    return [document[i : i + size] for i in range(0, len(document), size)]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64, 1 << 20])
+def test_iter_json_array_across_chunk_boundaries(chunk_size):
+    telemetries = [{"index": i, "mode": "é" * i} for i in range(50)]
+    document = json.dumps({"data": {"count": 50, "telemetries": telemetries}}, indent=1).encode()
+
+    assert list(iter_json_array(_chunks(document, chunk_size), "telemetries")) == telemetries
+
+
+def test_iter_json_array_empty_and_missing():
+    assert list(iter_json_array([b'{"data": {"count": 0, "telemetries": []}}'], "telemetries")) == []
+    assert list(iter_json_array([b'{"data": {"count": 0}}'], "telemetries")) == []
+
+
+def test_iter_json_array_truncated_document():
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'{"data": {"telemetries": [{"index": 1}, {"ind'], "telemetries"))
+
+
+@patch("solaredge_influxdb.solaredge.client.list_sites")
+def test_get_technical_data_stream_decodes_telemetries(mock_list_sites):
+    mock_list_sites.return_value = Mock(count=1, site=[Mock(id=123)])
+    document = json.dumps({"data": {"count": 2, "telemetries": [TELEMETRY, TELEMETRY]}}).encode()
+    response = MagicMock(ok=True)
+    response.iter_content.return_value = _chunks(document, 16)
+    client = Equipment("api_key", inverters=[Mock()])
+    client.get = Mock(return_value=response)
+
+    telemetries = client.get_technical_data_stream("INV-1", datetime(2026, 5, 6, 12), datetime(2026, 5, 6, 13))
+
+    assert client.get.call_args.kwargs["stream"] is True
+    telemetries = list(telemetries)
+    assert [telemetry.totalEnergy for telemetry in telemetries] == [2500.0, 2500.0]
+    response.__exit__.assert_called_once()
+
+
+@patch("solaredge_influxdb.solaredge.client.list_sites")
+def test_get_technical_data_stream_failure(mock_list_sites):
+    mock_list_sites.return_value = Mock(count=1, site=[Mock(id=123)])
+    client = Equipment("api_key", inverters=[Mock()])
+    response = Mock(ok=False)
+    client.get = Mock(return_value=response)
+
+    assert client.get_technical_data_stream("INV-1", datetime(2026, 5, 6, 12), datetime(2026, 5, 6, 13)) is None
+    response.close.assert_called_once()
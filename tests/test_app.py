@@ -1,8 +1,29 @@
-from datetime import datetime, timezone
+import time
+from importlib import import_module
+from datetime import datetime, timedelta, timezone
 from types import SimpleNamespace
-from unittest.mock import Mock, call, patch
+from unittest.mock import Mock, patch
 
-from solaredge_influxdb.app import app
+from requests import ConnectionError
+
+import pytz
+
+from solaredge_influxdb.app import (
+    SiteClients,
+    app,
+    collect,
+    collect_site_data,
+    collect_sites,
+    fetch_technical_data,
+    is_daylight,
+    setup_sites,
+    site_state_path,
+    use_session,
+)
+from solaredge_influxdb.dedup import ChangeDetector
+from solaredge_influxdb.schema import get_schema
+from solaredge_influxdb.solaredge import PhaseRecord, SiteOverview, SiteSeries, SolarEdgeClient
+from solaredge_influxdb.state import StateStore
 
 
 def _build_telemetry():
@@ -16,15 +37,21 @@ def _build_telemetry():
         vL2To3=231,
         vL3To1=229,
         dcVoltage=400,
+        L1Data=None,
+        L2Data=None,
+        L3Data=None,
     )
 
 
+@patch("solaredge_influxdb.app.get_calendar", return_value=None)
 @patch("solaredge_influxdb.app.get_sunset")
 @patch("solaredge_influxdb.app.get_sunrise")
 @patch("solaredge_influxdb.app.datetime")
 @patch("solaredge_influxdb.app.InfluxDBClient")
 @patch("solaredge_influxdb.app.Equipment")
-def test_app_skips_collection_after_sundown(mock_equipment, mock_influxdb_client, mock_datetime, mock_get_sunrise, mock_get_sunset):
+def test_app_skips_collection_after_sundown(
+    mock_equipment, mock_influxdb_client, mock_datetime, mock_get_sunrise, mock_get_sunset, mock_get_calendar
+):
     # 20:00 UTC = 22:00 CEST, which is still May 6 in Amsterdam and after sunset
     current_time = datetime(2026, 5, 6, 20, 0, 0, tzinfo=timezone.utc)
     sunrise = datetime(2026, 5, 6, 3, 30, 0, tzinfo=timezone.utc)
@@ -36,15 +63,26 @@ def test_app_skips_collection_after_sundown(mock_equipment, mock_influxdb_client
     app(api_key="api-key")
 
     mock_equipment.assert_not_called()
-    mock_influxdb_client.return_value.write.assert_not_called()
+    mock_influxdb_client.assert_not_called()
 
 
+@patch("solaredge_influxdb.app.get_calendar", return_value=None)
 @patch("solaredge_influxdb.app.get_sunset")
 @patch("solaredge_influxdb.app.get_sunrise")
 @patch("solaredge_influxdb.app.datetime")
 @patch("solaredge_influxdb.app.InfluxDBClient")
 @patch("solaredge_influxdb.app.Equipment")
-def test_app_collects_after_sundown_when_forced(mock_equipment, mock_influxdb_client, mock_datetime, mock_get_sunrise, mock_get_sunset):
+@patch("solaredge_influxdb.app.Meter")
+def test_app_collects_after_sundown_when_forced(
+    mock_meter,
+    mock_equipment,
+    mock_influxdb_client,
+    mock_datetime,
+    mock_get_sunrise,
+    mock_get_sunset,
+    mock_get_calendar,
+    tmp_path,
+):
     # 20:00 UTC = 22:00 CEST, which is still May 6 in Amsterdam and after sunset
     current_time = datetime(2026, 5, 6, 20, 0, 0, tzinfo=timezone.utc)
     sunrise = datetime(2026, 5, 6, 3, 30, 0, tzinfo=timezone.utc)
@@ -54,19 +92,381 @@ def test_app_collects_after_sundown_when_forced(mock_equipment, mock_influxdb_cl
     equipment_client.inverters = [SimpleNamespace(serialNumber="INV-1", model="SE5000")]
     equipment_client.get_technical_data.return_value = SimpleNamespace(telemetries=[telemetry])
     influx_client = mock_influxdb_client.return_value
-    influx_client.convert_to_point.side_effect = ["energy-point", "power-point", "voltage-point"]
 
     mock_datetime.now.return_value = current_time
     mock_get_sunrise.return_value = sunrise
     mock_get_sunset.return_value = sunset
     mock_equipment.return_value = equipment_client
+    mock_meter.return_value.get_meters_data.return_value = None
 
-    app(api_key="api-key", force=True)
+    app(
+        api_key="api-key",
+        force=True,
+        state_path=str(tmp_path / "state.json"),
+        quota_path=str(tmp_path / "quota.json"),
+    )
 
+    mock_get_calendar.assert_not_called()
     mock_equipment.assert_called_once_with("api-key")
+    mock_meter.assert_called_once_with("api-key", cache=None, site_id=None)
+    mock_meter.return_value.get_meters_data.assert_called_once()
     equipment_client.get_technical_data.assert_called_once()
-    assert influx_client.write.call_args_list == [
-        call("energy-point", "energy"),
-        call("power-point", "energy_flow"),
-        call("voltage-point", "voltage_current"),
+    assert [c.args[1] for c in influx_client.add_fields.call_args_list] == ["energy", "energy_flow", "voltage_current"]
+    influx_client.write.assert_not_called()
+    influx_client.close.assert_called_once()
+
+
+def test_use_session_sizes_pool_for_workers():
+    previous = Mock()
+    with patch.object(SolarEdgeClient, "session", previous), patch.object(SolarEdgeClient, "timeout"):
+        session = use_session(max_workers=16, request_timeout=30.0)
+        assert SolarEdgeClient.session is session
+        assert SolarEdgeClient.timeout == (10.0, 30.0)
+        assert session.get_adapter("https://monitoringapi.solaredge.com")._pool_maxsize == 16
+    previous.close.assert_called_once()
+
+
+@patch("solaredge_influxdb.app.get_sunrise")
+def test_is_daylight_uses_the_calendar_before_astral(mock_get_sunrise, tmp_path):
+    # 22:00 CEST is within an hour after the sunset of May 6 in Amsterdam, 23:30 CEST isn't
+    evening = datetime(2026, 5, 6, 20, 0, 0, tzinfo=timezone.utc)
+    night = datetime(2026, 5, 6, 21, 30, 0, tzinfo=timezone.utc)
+    assert is_daylight(52.3676, 4.9041, "Europe/Amsterdam", evening, 60, str(tmp_path)) is True
+    assert is_daylight(52.3676, 4.9041, "Europe/Amsterdam", night, 60, str(tmp_path)) is False
+
+    mock_get_sunrise.assert_not_called()
+
+
+def test_fetch_technical_data_keeps_inverter_order_and_skips_failures():
+    inverters = [SimpleNamespace(serialNumber=f"INV-{i}") for i in range(4)]
+
+    def get_technical_data(serial_number, start_time, end_time, full_models):
+        if serial_number == "INV-1":
+            raise ConnectionError("connection reset")
+        if serial_number == "INV-2":
+            return None
+        # Finish the first inverter last to prove results are not returned in completion order
+        time.sleep(0.05 if serial_number == "INV-0" else 0)
+        return serial_number
+
+    equipment_client = Mock()
+    equipment_client.get_technical_data.side_effect = get_technical_data
+    start_time = datetime(2026, 5, 6, 12, 0, 0)
+    end_time = datetime(2026, 5, 6, 12, 15, 0)
+
+    result = fetch_technical_data(equipment_client, inverters, start_time, end_time, max_workers=4)
+
+    assert result == ["INV-0", None, None, "INV-3"]
+    assert equipment_client.get_technical_data.call_count == 4
+
+
+def test_collect_resumes_from_watermark_and_skips_written_telemetries(tmp_path):
+    amsterdam = pytz.timezone("Europe/Amsterdam")
+    current_time = datetime(2026, 5, 6, 12, 0, 0, tzinfo=timezone.utc)
+    state = StateStore(str(tmp_path / "state.json"))
+    state.update("INV-1", amsterdam.localize(datetime(2026, 5, 6, 11, 0, 0)))
+    written, new = _build_telemetry(), _build_telemetry()
+    written.date = datetime(2026, 5, 6, 11, 0, 0)
+    new.date = datetime(2026, 5, 6, 11, 5, 0)
+    equipment_client = Mock()
+    equipment_client.inverters = [
+        SimpleNamespace(serialNumber="INV-1", model="SE5000"),
+        SimpleNamespace(serialNumber="INV-2", model="SE5000"),
+    ]
+    equipment_client.get_technical_data.side_effect = [SimpleNamespace(telemetries=[written, new]), None]
+    influx_client = Mock()
+
+    collect(equipment_client, influx_client, current_time, 15, amsterdam, state=state)
+
+    (inv1_call, inv2_call) = equipment_client.get_technical_data.call_args_list
+    # INV-1 resumes from its watermark, INV-2 has none yet and uses the time window
+    assert inv1_call.args[1] == amsterdam.localize(datetime(2026, 5, 6, 11, 0, 0))
+    assert inv2_call.args[1] == amsterdam.localize(datetime(2026, 5, 6, 13, 45, 0))
+    assert influx_client.add_fields.call_count == 3
+    assert influx_client.add_fields.call_args_list[0].args[2] == amsterdam.localize(new.date)
+    influx_client.drain.assert_called_once()
+    assert StateStore(state.path).get("INV-1") == amsterdam.localize(new.date)
+    assert StateStore(state.path).get("INV-2") is None
+
+
+def test_collect_clamps_old_watermark_to_api_range(tmp_path):
+    amsterdam = pytz.timezone("Europe/Amsterdam")
+    current_time = datetime(2026, 5, 6, 12, 0, 0, tzinfo=timezone.utc)
+    state = StateStore(str(tmp_path / "state.json"))
+    state.update("INV-1", amsterdam.localize(datetime(2026, 3, 1, 12, 0, 0)))
+    equipment_client = Mock()
+    equipment_client.inverters = [SimpleNamespace(serialNumber="INV-1", model="SE5000")]
+    equipment_client.get_technical_data.return_value = None
+
+    collect(equipment_client, Mock(), current_time, 15, amsterdam, state=state)
+
+    start_time = equipment_client.get_technical_data.call_args.args[1]
+    assert start_time == current_time - timedelta(days=7)
+
+
+def test_collect_writes_one_point_per_row_with_single_schema():
+    amsterdam = pytz.timezone("Europe/Amsterdam")
+    equipment_client = Mock()
+    equipment_client.inverters = [SimpleNamespace(serialNumber="INV-1", model="SE5000")]
+    equipment_client.get_technical_data.return_value = SimpleNamespace(telemetries=[_build_telemetry()])
+    influx_client = Mock()
+
+    collect(
+        equipment_client,
+        influx_client,
+        datetime(2026, 5, 6, 12, 0, 0, tzinfo=timezone.utc),
+        15,
+        amsterdam,
+        schema=get_schema("single", "solar"),
+    )
+
+    (add_call,) = influx_client.add_fields.call_args_list
+    assert add_call.args[1] == "solar"
+    assert [key for key, _ in add_call.args[3]][:2] == ["total_energy", "ac_power"]
+
+
+def test_collect_keeps_watermarks_when_influxdb_write_fails(tmp_path):
+    amsterdam = pytz.timezone("Europe/Amsterdam")
+    state = StateStore(str(tmp_path / "state.json"))
+    equipment_client = Mock()
+    equipment_client.inverters = [SimpleNamespace(serialNumber="INV-1", model="SE5000")]
+    equipment_client.get_technical_data.return_value = SimpleNamespace(telemetries=[_build_telemetry()])
+    influx_client = Mock()
+    influx_client.drain.return_value = False
+
+    collect(equipment_client, influx_client, datetime(2026, 5, 6, 12, 0, 0, tzinfo=timezone.utc), 15, amsterdam, state=state)
+
+    assert state.get("INV-1") is None
+    assert not (tmp_path / "state.json").exists()
+
+
+def test_collect_skips_unchanged_points_and_forgets_them_when_write_fails():
+    amsterdam = pytz.timezone("Europe/Amsterdam")
+    current_time = datetime(2026, 5, 6, 20, 15, 0, tzinfo=timezone.utc)
+    first, second, third = _build_telemetry(), _build_telemetry(), _build_telemetry()
+    second.date = datetime(2026, 5, 6, 22, 5, 0)
+    third.date = datetime(2026, 5, 6, 22, 10, 0)
+    third.totalEnergy = 2510
+    equipment_client = Mock()
+    equipment_client.inverters = [SimpleNamespace(serialNumber="INV-1", model="SE5000")]
+    equipment_client.get_technical_data.return_value = SimpleNamespace(telemetries=[first, second, third])
+    influx_client = Mock()
+    influx_client.drain.return_value = False
+    detector = ChangeDetector()
+
+    collect(equipment_client, influx_client, current_time, 15, amsterdam, detector=detector)
+    influx_client.drain.return_value = True
+    influx_client.add_fields.reset_mock()
+    collect(equipment_client, influx_client, current_time, 15, amsterdam, detector=detector)
+
+    # Only the energy of the third row changed, the failed first write doesn't suppress anything
+    written = [(c.args[1], c.args[2].replace(tzinfo=None)) for c in influx_client.add_fields.call_args_list]
+    assert written == [
+        ("energy", first.date),
+        ("energy_flow", first.date),
+        ("voltage_current", first.date),
+        ("energy", third.date),
+    ]
+
+
+def test_collect_writes_a_point_per_phase():
+    amsterdam = pytz.timezone("Europe/Amsterdam")
+    telemetry = _build_telemetry()
+    telemetry.L1Data = PhaseRecord(10.5, 231.2, 50.01, 2430.0, 2400.0, -89.0, 0.99)
+    telemetry.L2Data = PhaseRecord(10.1, 230.8, 50.01, 2330.0, 2300.0, -80.0, 0.99)
+    equipment_client = Mock()
+    equipment_client.inverters = [SimpleNamespace(serialNumber="INV-1", model="SE5000")]
+    equipment_client.get_technical_data.return_value = SimpleNamespace(telemetries=[telemetry])
+    influx_client = Mock()
+
+    collect(equipment_client, influx_client, datetime(2026, 5, 6, 12, 0, 0, tzinfo=timezone.utc), 15, amsterdam)
+
+    phase_calls = [c for c in influx_client.add_fields.call_args_list if c.args[4][-1][0] == "phase"]
+    assert [(c.args[1], c.args[4][-1][1]) for c in phase_calls] == [("voltage_current", "L1"), ("voltage_current", "L2")]
+    assert phase_calls[0].args[3][:2] == [("ac_current", 10.5), ("ac_voltage", 231.2)]
+    assert ("active_power", 2.4) in phase_calls[0].args[3]
+
+
+def _build_meter(serial_number, meter_type, values):
+    return SimpleNamespace(
+        meterSerialNumber=serial_number,
+        model="SE-MTR-3Y",
+        meterType=meter_type,
+        values=[SimpleNamespace(date=value_date, value=value) for value_date, value in values],
+    )
+
+
+def test_collect_meters_uses_one_request_and_skips_written_readings(tmp_path):
+    amsterdam = pytz.timezone("Europe/Amsterdam")
+    # 14:00 in Amsterdam, the 14:00 quarter has only just started
+    current_time = datetime(2026, 5, 6, 12, 0, 0, tzinfo=timezone.utc)
+    state = StateStore(str(tmp_path / "state.json"))
+    state.update("INV-1", amsterdam.localize(datetime(2026, 5, 6, 11, 0, 0)))
+    state.update("meter:M-1", amsterdam.localize(datetime(2026, 5, 6, 13, 30, 0)))
+    state.update("meter:M-2", amsterdam.localize(datetime(2026, 5, 6, 13, 15, 0)))
+    meter_client = Mock()
+    meter_client.get_meters_data.return_value = SimpleNamespace(
+        meterEnergyDetails=SimpleNamespace(
+            meters=[
+                _build_meter(
+                    "M-1",
+                    "Production",
+                    [("2026-05-06 13:30:00", 1000.0), ("2026-05-06 13:45:00", 1200.0), ("2026-05-06 14:00:00", 1210.0)],
+                ),
+                _build_meter("M-2", "FeedIn", [("2026-05-06 13:30:00", 500.0), ("2026-05-06 13:45:00", None)]),
+            ]
+        )
+    )
+    equipment_client = Mock()
+    equipment_client.inverters = []
+    influx_client = Mock()
+
+    collect(equipment_client, influx_client, current_time, 15, amsterdam, state=state, MeterClient=meter_client)
+
+    # One request for all meters, starting at the oldest meter watermark
+    meter_client.get_meters_data.assert_called_once_with(
+        amsterdam.localize(datetime(2026, 5, 6, 13, 15, 0)),
+        current_time.astimezone(amsterdam),
+        time_unit="QUARTER_OF_AN_HOUR",
+    )
+    written = [(c.args[0].prefix, c.args[2].strftime("%H:%M"), c.args[3]) for c in influx_client.add_fields.call_args_list]
+    assert written == [
+        ("meter,serial_number=M-1,model=SE-MTR-3Y,meter_type=Production", "13:45", (("energy", 1.2),)),
+        ("meter,serial_number=M-1,model=SE-MTR-3Y,meter_type=Production", "14:00", (("energy", 1.21),)),
+        ("meter,serial_number=M-2,model=SE-MTR-3Y,meter_type=FeedIn", "13:30", (("energy", 0.5),)),
+    ]
+    saved = StateStore(state.path)
+    # The 14:00 quarter is still in progress, so the watermark stays at the last complete one
+    assert saved.get("meter:M-1") == amsterdam.localize(datetime(2026, 5, 6, 13, 45))
+    assert saved.get("meter:M-2") == amsterdam.localize(datetime(2026, 5, 6, 13, 30))
+    assert saved.get("INV-1") == amsterdam.localize(datetime(2026, 5, 6, 11, 0))
+
+
+def test_collect_meters_starts_with_time_window_and_survives_failed_request():
+    amsterdam = pytz.timezone("Europe/Amsterdam")
+    current_time = datetime(2026, 5, 6, 12, 0, 0, tzinfo=timezone.utc)
+    meter_client = Mock()
+    meter_client.get_meters_data.side_effect = ConnectionError("connection reset")
+    equipment_client = Mock()
+    equipment_client.inverters = []
+    influx_client = Mock()
+
+    collect(equipment_client, influx_client, current_time, 15, amsterdam, MeterClient=meter_client)
+
+    assert meter_client.get_meters_data.call_args.args[0] == current_time.astimezone(amsterdam) - timedelta(minutes=15)
+    influx_client.add_fields.assert_not_called()
+    influx_client.drain.assert_called_once()
+
+
+def test_collect_keeps_rows_decoded_before_a_truncated_stream(tmp_path):
+    amsterdam = pytz.timezone("Europe/Amsterdam")
+    state = StateStore(str(tmp_path / "state.json"))
+    telemetry = _build_telemetry()
+    telemetry.date = datetime(2026, 5, 6, 13, 50, 0)
+
+    def truncated(*args, **kwargs):
+        yield telemetry
+        raise ValueError("Unexpected end of document in telemetries")
+
+    equipment_client = Mock()
+    equipment_client.inverters = [
+        SimpleNamespace(serialNumber="INV-1", model="SE5000"),
+        SimpleNamespace(serialNumber="INV-2", model="SE5000"),
+    ]
+    equipment_client.get_technical_data_stream.side_effect = truncated
+    influx_client = Mock()
+
+    current_time = datetime(2026, 5, 6, 12, 0, 0, tzinfo=timezone.utc)
+    collect(equipment_client, influx_client, current_time, 15, amsterdam, state=state, stream=True)
+
+    saved = StateStore(state.path)
+    assert saved.get("INV-1") == amsterdam.localize(telemetry.date)
+    assert saved.get("INV-2") == amsterdam.localize(telemetry.date)
+
+
+def _site(tmp_path, site_id, telemetries):
+    site = SiteClients.__new__(SiteClients)
+    site.site_id = site_id
+    site.state = StateStore(site_state_path(str(tmp_path / "state.json"), site_id))
+    site.EquipmentClient = Mock(site_id=site_id, inverters=[SimpleNamespace(serialNumber=f"INV-{site_id}", model="SE5000")])
+    site.EquipmentClient.get_technical_data.return_value = telemetries
+    site.MeterClient = None
+    return site
+
+
+def test_collect_sites_tags_points_and_keeps_state_per_site(tmp_path):
+    amsterdam = pytz.timezone("Europe/Amsterdam")
+    sites = [
+        _site(tmp_path, 1, SimpleNamespace(telemetries=[_build_telemetry()])),
+        _site(tmp_path, 2, SimpleNamespace(telemetries=[_build_telemetry()])),
+        _site(tmp_path, 3, None),
+    ]
+    sites[2].EquipmentClient.get_technical_data.side_effect = RuntimeError("unexpected")
+    influx_client = Mock()
+
+    collect_sites(sites, influx_client, datetime(2026, 5, 6, 12, 0, 0, tzinfo=timezone.utc), 15, amsterdam, max_workers=3)
+
+    prefixes = {add_call.args[0].prefix for add_call in influx_client.add_fields.call_args_list}
+    assert prefixes == {"solar,serial_number=INV-1,model=SE5000,site_id=1", "solar,serial_number=INV-2,model=SE5000,site_id=2"}
+    influx_client.replay_spool.assert_called_once()
+    influx_client.drain.assert_called_once()
+    assert StateStore(str(tmp_path / "state.1.json")).get("INV-1") == amsterdam.localize(_build_telemetry().date)
+    assert StateStore(str(tmp_path / "state.2.json")).get("INV-2") == amsterdam.localize(_build_telemetry().date)
+    assert StateStore(str(tmp_path / "state.3.json")).get("INV-3") is None
+
+
+@patch("solaredge_influxdb.app.Meter")
+@patch("solaredge_influxdb.app.Equipment")
+@patch("solaredge_influxdb.app.SolarEdgeClient")
+def test_setup_sites_gives_every_site_its_own_state_and_cache(mock_client, mock_equipment, mock_meter, tmp_path):
+    mock_client.cache.directory = str(tmp_path / "cache")
+    mock_client.list_site_ids.return_value = [1, 2]
+    inverters = [SimpleNamespace(serialNumber=f"INV-{index}", model="SE5000") for index in range(300)]
+    mock_equipment.side_effect = [Mock(inverters=inverters), AttributeError("Inverters must be defined and valid")]
+
+    (site,) = setup_sites("api-key", str(tmp_path / "state.json"), max_workers=1)
+
+    # The sites are listed without the single-site constructor, which warns about the other sites
+    mock_client.list_site_ids.assert_called_once_with("api-key")
+    mock_client.assert_not_called()
+    # Room for a serializer per inverter, meter and site
+    assert import_module("solaredge_influxdb.app").get_serializer.cache_info().maxsize >= 306
+    assert site.site_id == 1
+    assert site.state.path == str(tmp_path / "state.1.json")
+    cache = mock_equipment.call_args_list[0].kwargs["cache"]
+    assert cache.directory == str(tmp_path / "cache" / "site-1")
+    mock_meter.assert_called_once_with("api-key", cache=cache, site_id=1)
+
+
+def test_collect_site_data_writes_series_and_overview_per_site(tmp_path):
+    amsterdam = pytz.timezone("Europe/Amsterdam")
+    current_time = amsterdam.localize(datetime(2026, 5, 6, 12, 10, 0))
+    states = {1: StateStore(str(tmp_path / "state.1.json")), 2: StateStore(str(tmp_path / "state.2.json"))}
+    states[1].update("site:power", amsterdam.localize(datetime(2026, 5, 6, 11, 45, 0)))
+    values = [
+        {"date": "2026-05-06 11:45:00", "value": 900.0},
+        {"date": "2026-05-06 12:00:00", "value": 1000.0},
+        {"date": "2026-05-06 12:15:00", "value": None},
+    ]
+    site_data_client = Mock()
+    site_data_client.get_energy.return_value = {}
+    site_data_client.get_power.return_value = {site_id: SiteSeries(values=values) for site_id in (1, 2)}
+    site_data_client.get_overview.return_value = {
+        2: SiteOverview(lastUpdateTime="2026-05-06 12:05:00", lifeTimeData={"energy": 5000.0}, currentPower={"power": 1500.0})
+    }
+    influx_client = Mock()
+
+    written = collect_site_data(site_data_client, influx_client, current_time, 15, amsterdam, states)
+
+    # One request per endpoint for all sites, starting at the oldest watermark
+    start_time = amsterdam.localize(datetime(2026, 5, 6, 11, 45, 0))
+    site_data_client.get_power.assert_called_once_with(start_time, current_time, [1, 2])
+    points = [(c.args[0].prefix, c.args[2].strftime("%H:%M"), c.args[3]) for c in influx_client.add_fields.call_args_list]
+    assert points == [
+        ("site,site_id=1", "12:00", (("power", 1.0),)),
+        ("site,site_id=2", "11:45", (("power", 0.9),)),
+        ("site,site_id=2", "12:00", (("power", 1.0),)),
+        ("site,site_id=2", "12:05", [("current_power", 1.5), ("lifetime_energy", 5.0)]),
     ]
+    # The quarter in progress is written again once it has ended
+    assert written == {1: {}, 2: {"site:power": start_time}}
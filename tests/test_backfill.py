@@ -0,0 +1,124 @@
+import runpy
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+import pytest
+
+from solaredge_influxdb.backfill import Checkpoint, backfill, split_range
+
+
+def test_split_range_respects_max_range():
+    start_time = datetime(2026, 1, 1)
+
+    chunks = split_range(start_time, datetime(2026, 1, 20), timedelta(days=7))
+
+    assert chunks == [
+        (datetime(2026, 1, 1), datetime(2026, 1, 8)),
+        (datetime(2026, 1, 8), datetime(2026, 1, 15)),
+        (datetime(2026, 1, 15), datetime(2026, 1, 20)),
+    ]
+
+
+def _equipment_client():
+    equipment_client = Mock()
+    equipment_client.inverters = [SimpleNamespace(serialNumber="INV-1", model="SE5000")]
+    equipment_client.get_technical_data_stream.side_effect = lambda *args, **kwargs: iter([])
+    return equipment_client
+
+
+@patch("solaredge_influxdb.backfill.Meter")
+@patch("solaredge_influxdb.backfill.InfluxDBClient")
+@patch("solaredge_influxdb.backfill.Equipment")
+def test_backfill_fetches_every_chunk_once_within_budget(mock_equipment, mock_influxdb_client, mock_meter, tmp_path):
+    checkpoint_path = str(tmp_path / "backfill.json")
+    equipment_client = _equipment_client()
+    mock_equipment.return_value = equipment_client
+    mock_meter.return_value.get_meters_data.return_value = SimpleNamespace(meterEnergyDetails=SimpleNamespace(meters=[]))
+
+    # Three weeks of inverter data and one meter chunk, but only budget for three requests
+    backfill("2026-01-01", "2026-01-22", api_key="api-key", request_budget=3, checkpoint_path=checkpoint_path)
+
+    assert equipment_client.get_technical_data_stream.call_count == 3
+    mock_meter.return_value.get_meters_data.assert_not_called()
+    assert len(Checkpoint(checkpoint_path).done) == 3
+    mock_influxdb_client.return_value.close.assert_called_once()
+
+    backfill("2026-01-01", "2026-01-22", api_key="api-key", request_budget=3, checkpoint_path=checkpoint_path)
+
+    assert equipment_client.get_technical_data_stream.call_count == 3
+    mock_meter.return_value.get_meters_data.assert_called_once()
+    assert len(Checkpoint(checkpoint_path).done) == 4
+
+
+@patch("solaredge_influxdb.backfill.Meter")
+@patch("solaredge_influxdb.backfill.InfluxDBClient")
+@patch("solaredge_influxdb.backfill.Equipment")
+def test_backfill_retries_failed_chunks_on_next_run(mock_equipment, mock_influxdb_client, mock_meter, tmp_path):
+    checkpoint_path = str(tmp_path / "backfill.json")
+    equipment_client = _equipment_client()
+    equipment_client.get_technical_data_stream.side_effect = [None, iter([])]
+    mock_equipment.return_value = equipment_client
+
+    backfill("2026-01-01", "2026-01-08", api_key="api-key", meters=False, checkpoint_path=checkpoint_path)
+    assert Checkpoint(checkpoint_path).done == set()
+
+    backfill("2026-01-01", "2026-01-08", api_key="api-key", meters=False, checkpoint_path=checkpoint_path)
+    assert len(Checkpoint(checkpoint_path).done) == 1
+    mock_meter.assert_not_called()
+
+
+@patch("solaredge_influxdb.backfill.add_telemetry_points")
+@patch("solaredge_influxdb.backfill.Meter")
+@patch("solaredge_influxdb.backfill.InfluxDBClient")
+@patch("solaredge_influxdb.backfill.Equipment")
+def test_backfill_keeps_rows_of_truncated_chunk_and_retries_it(
+    mock_equipment, mock_influxdb_client, mock_meter, mock_add_telemetry_points, tmp_path
+):
+    checkpoint_path = str(tmp_path / "backfill.json")
+
+    def truncated(*args, **kwargs):
+        yield SimpleNamespace(date=datetime(2026, 1, 1, 12, 0, 0))
+        raise ValueError("Unexpected end of document in telemetries")
+
+    equipment_client = _equipment_client()
+    equipment_client.get_technical_data_stream.side_effect = truncated
+    mock_equipment.return_value = equipment_client
+
+    backfill(
+        "2026-01-01",
+        "2026-01-08",
+        api_key="api-key",
+        meters=False,
+        checkpoint_path=checkpoint_path,
+        quota_path=str(tmp_path / "quota.json"),
+    )
+
+    mock_add_telemetry_points.assert_called_once()
+    assert Checkpoint(checkpoint_path).done == set()
+    mock_influxdb_client.return_value.close.assert_called_once()
+
+
+def _run_cli(*args: str) -> Mock:
+    """Run the command line with backfill patched out, returning the backfill mock"""
+    with patch("sys.argv", ["solaredge_influxdb", *args]), patch("solaredge_influxdb.backfill.backfill") as mock_backfill:
+        runpy.run_module("solaredge_influxdb", run_name="__main__")
+    return mock_backfill
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["--no-meters", "backfill", "--start", "2026-01-01"],
+        ["backfill", "--start", "2026-01-01", "--no-meters"],
+    ],
+)
+def test_cli_no_meters_is_kept_on_either_side_of_backfill(args):
+    assert _run_cli(*args).call_args.kwargs["meters"] is False
+
+
+def test_cli_rejects_options_backfill_doesnt_support(capsys):
+    with pytest.raises(SystemExit):
+        _run_cli("--all-sites", "--dedup", "backfill", "--start", "2026-01-01")
+
+    assert "backfill doesn't support --all-sites, --dedup" in capsys.readouterr().err
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+
+from astral import Observer
+
+from solaredge_influxdb.cadence import AdaptiveCadence
+
+AMSTERDAM = Observer(latitude=52.3676, longitude=4.9041)
+# Solar noon in Amsterdam is around 11:40 UTC, the sun rises around 04:00 and sets around 19:30 UTC in May
+NOON = datetime(2026, 5, 6, 11, 40, 0, tzinfo=timezone.utc)
+DAWN = datetime(2026, 5, 6, 5, 0, 0, tzinfo=timezone.utc)
+NIGHT = datetime(2026, 5, 6, 23, 0, 0, tzinfo=timezone.utc)
+DAY_END = datetime(2026, 5, 6, 20, 30, 0, tzinfo=timezone.utc)
+
+
+def test_interval_is_short_around_noon_and_long_at_night():
+    cadence = AdaptiveCadence(AMSTERDAM)
+
+    assert cadence.next_interval(NOON, DAY_END) <= timedelta(minutes=6)
+    assert cadence.next_interval(NIGHT, DAY_END) == timedelta(minutes=60)
+    assert timedelta(minutes=6) < cadence.next_interval(DAWN, DAY_END) < timedelta(minutes=60)
+
+
+def test_low_production_slows_down_the_cadence():
+    cadence = AdaptiveCadence(AMSTERDAM)
+    cadence.record(5000.0, 3)
+    sunny = cadence.next_interval(NOON, DAY_END)
+
+    cadence.record(500.0, 3)
+
+    assert cadence.next_interval(NOON, DAY_END) > sunny
+
+
+def test_interval_is_stretched_to_fit_the_remaining_quota():
+    cadence = AdaptiveCadence(AMSTERDAM)
+    cadence.record(None, 3)
+
+    unlimited = cadence.next_interval(NOON, DAY_END)
+    limited = cadence.next_interval(NOON, DAY_END, remaining=30)
+
+    assert limited > unlimited
+    assert cadence.next_interval(NOON, DAY_END, remaining=1000) == unlimited
+    assert cadence.next_interval(NOON, DAY_END, remaining=0) == timedelta(minutes=60)
+
+
+def test_requests_per_run_is_averaged():
+    cadence = AdaptiveCadence(AMSTERDAM)
+
+    cadence.record(None, 2)
+    cadence.record(None, 4)
+    cadence.record(None, 0)
+
+    assert cadence.requests_per_run == 3
+    assert cadence.power is None
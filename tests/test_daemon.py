@@ -0,0 +1,146 @@
+import threading
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock, patch
+
+import pytz
+
+from solaredge_influxdb.daemon import daemon, next_adaptive_time, next_collection_time, next_tick
+
+AMSTERDAM = pytz.timezone("Europe/Amsterdam")
+
+
+def _daylight_window(observer, local_date, _timezone, calendar=None):
+    sunrise = datetime(local_date.year, local_date.month, local_date.day, 4, 0, 0, tzinfo=timezone.utc)
+    sunset = datetime(local_date.year, local_date.month, local_date.day, 19, 0, 0, tzinfo=timezone.utc)
+    return sunrise, sunset
+
+
+def test_next_tick_is_aligned_to_interval():
+    interval = timedelta(minutes=15)
+
+    assert next_tick(datetime(2026, 5, 6, 12, 7, 31, tzinfo=timezone.utc), interval) == datetime(
+        2026, 5, 6, 12, 15, 0, tzinfo=timezone.utc
+    )
+    assert next_tick(datetime(2026, 5, 6, 12, 15, 0, tzinfo=timezone.utc), interval) == datetime(
+        2026, 5, 6, 12, 30, 0, tzinfo=timezone.utc
+    )
+
+
+@patch("solaredge_influxdb.daemon.get_daylight_window", side_effect=_daylight_window)
+def test_next_collection_time_during_the_day(mock_daylight_window):
+    current_time = datetime(2026, 5, 6, 12, 7, 0, tzinfo=timezone.utc)
+
+    result = next_collection_time(Mock(), current_time, AMSTERDAM, timedelta(minutes=15), 60)
+
+    assert result == datetime(2026, 5, 6, 12, 15, 0, tzinfo=timezone.utc)
+
+
+@patch("solaredge_influxdb.daemon.get_daylight_window", side_effect=_daylight_window)
+def test_next_collection_time_sleeps_through_the_night(mock_daylight_window):
+    current_time = datetime(2026, 5, 6, 21, 7, 0, tzinfo=timezone.utc)
+
+    result = next_collection_time(Mock(), current_time, AMSTERDAM, timedelta(minutes=15), 60)
+
+    # The window opens an hour before the next sunrise at 04:00 UTC
+    assert result == datetime(2026, 5, 7, 3, 15, 0, tzinfo=timezone.utc)
+
+
+@patch("solaredge_influxdb.daemon.get_daylight_window", side_effect=_daylight_window)
+def test_next_collection_time_ignores_the_night_when_forced(mock_daylight_window):
+    current_time = datetime(2026, 5, 6, 21, 7, 0, tzinfo=timezone.utc)
+
+    result = next_collection_time(Mock(), current_time, AMSTERDAM, timedelta(minutes=15), 60, force=True)
+
+    assert result == datetime(2026, 5, 6, 21, 15, 0, tzinfo=timezone.utc)
+    mock_daylight_window.assert_not_called()
+
+
+@patch("solaredge_influxdb.daemon.next_collection_time")
+@patch("solaredge_influxdb.daemon.collect")
+@patch("solaredge_influxdb.daemon.InfluxDBClient")
+@patch("solaredge_influxdb.daemon.Equipment")
+@patch("solaredge_influxdb.app.Meter")
+def test_daemon_reuses_clients_and_flushes_on_stop(
+    mock_meter, mock_equipment, mock_influxdb_client, mock_collect, mock_next_collection_time, tmp_path
+):
+    stop_event = threading.Event()
+    mock_next_collection_time.side_effect = lambda *args, **kwargs: datetime.now(timezone.utc)
+
+    def collect(*args):
+        if mock_collect.call_count == 2:
+            raise ConnectionError("SolarEdge is unreachable")
+        if mock_collect.call_count == 3:
+            stop_event.set()
+
+    mock_collect.side_effect = collect
+
+    daemon(
+        api_key="api-key",
+        state_path=str(tmp_path / "state.json"),
+        quota_path=str(tmp_path / "quota.json"),
+        cache_dir=str(tmp_path / "cache"),
+        stop_event=stop_event,
+    )
+
+    assert mock_collect.call_count == 3
+    mock_equipment.assert_called_once_with("api-key")
+    mock_meter.assert_called_once_with("api-key", cache=None, site_id=None)
+    mock_influxdb_client.assert_called_once()
+    mock_influxdb_client.return_value.close.assert_called_once()
+
+
+@patch("solaredge_influxdb.daemon.next_collection_time")
+@patch("solaredge_influxdb.daemon.collect")
+@patch("solaredge_influxdb.daemon.InfluxDBClient")
+@patch("solaredge_influxdb.daemon.Equipment")
+@patch("solaredge_influxdb.app.Meter", side_effect=RuntimeError("Site lookup failed"))
+def test_daemon_collects_inverters_when_meter_setup_fails(
+    mock_meter, mock_equipment, mock_influxdb_client, mock_collect, mock_next_collection_time, tmp_path
+):
+    stop_event = threading.Event()
+    mock_next_collection_time.side_effect = lambda *args, **kwargs: datetime.now(timezone.utc)
+
+    def collect(*args):
+        if mock_collect.call_count == 2:
+            stop_event.set()
+
+    mock_collect.side_effect = collect
+
+    daemon(
+        api_key="api-key",
+        state_path=str(tmp_path / "state.json"),
+        quota_path=str(tmp_path / "quota.json"),
+        cache_dir=str(tmp_path / "cache"),
+        stop_event=stop_event,
+    )
+
+    # Inverter data is collected without meters and the meter client is retried every interval
+    assert mock_collect.call_count == 2
+    assert all(c.args[10] is None for c in mock_collect.call_args_list)
+    assert mock_meter.call_count == 2
+
+
+@patch("solaredge_influxdb.daemon.get_daylight_window", side_effect=_daylight_window)
+def test_next_adaptive_time_follows_the_cadence(mock_daylight_window):
+    cadence = Mock(min_interval=timedelta(minutes=5))
+    cadence.next_interval.return_value = timedelta(minutes=20)
+    current_time = datetime(2026, 5, 6, 12, 7, 0, tzinfo=timezone.utc)
+
+    result = next_adaptive_time(cadence, Mock(), current_time, AMSTERDAM, 60, remaining=100)
+
+    assert result == datetime(2026, 5, 6, 12, 25, 0, tzinfo=timezone.utc)
+    cadence.next_interval.assert_called_once_with(current_time, datetime(2026, 5, 6, 20, 0, 0, tzinfo=timezone.utc), 100)
+
+
+@patch("solaredge_influxdb.daemon.get_daylight_window", side_effect=_daylight_window)
+def test_next_adaptive_time_waits_for_the_daylight_window(mock_daylight_window):
+    cadence = Mock(min_interval=timedelta(minutes=5))
+    cadence.next_interval.return_value = timedelta(minutes=60)
+
+    # Close to sunset the interval would end in the night, collection resumes when the window opens
+    assert next_adaptive_time(
+        cadence, Mock(), datetime(2026, 5, 6, 19, 50, 0, tzinfo=timezone.utc), AMSTERDAM, 60
+    ) == datetime(2026, 5, 7, 3, 5, 0, tzinfo=timezone.utc)
+    assert next_adaptive_time(
+        cadence, Mock(), datetime(2026, 5, 6, 23, 0, 0, tzinfo=timezone.utc), AMSTERDAM, 60
+    ) == datetime(2026, 5, 7, 3, 5, 0, tzinfo=timezone.utc)
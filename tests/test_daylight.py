@@ -0,0 +1,70 @@
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytz
+
+from solaredge_influxdb.daylight import DaylightCalendar, calendar_path, is_night, load_calendar
+
+AMSTERDAM = (52.3676, 4.9041, "Europe/Amsterdam")
+
+
+def test_calendar_matches_daylight_and_survives_a_round_trip(tmp_path):
+    calendar = DaylightCalendar.build(*AMSTERDAM, date(2026, 5, 5), days=3)
+    path = str(tmp_path / "daylight.json")
+    calendar.save(path)
+    loaded = DaylightCalendar.load(path)
+
+    assert loaded.windows == calendar.windows
+    noon = datetime(2026, 5, 6, 11, 0, tzinfo=timezone.utc)
+    midnight = datetime(2026, 5, 6, 22, 0, tzinfo=timezone.utc)
+    assert loaded.is_daylight(noon) is True
+    assert loaded.is_daylight(midnight) is False
+    # Sunset is around 19:00 UTC, still collected within the margin
+    assert loaded.is_daylight(datetime(2026, 5, 6, 19, 30, tzinfo=timezone.utc)) is True
+    assert loaded.is_daylight(datetime(2026, 5, 6, 19, 30, tzinfo=timezone.utc), timedelta(0)) is False
+    # Only the days around the time are checked, the edges of the calendar can't tell
+    assert loaded.is_daylight(noon + timedelta(days=1)) is None
+
+
+def test_calendar_has_no_window_for_polar_days():
+    calendar = DaylightCalendar.build(78.2, 15.6, "Arctic/Longyearbyen", date(2026, 6, 20), days=3)
+
+    assert calendar.windows == [None, None, None]
+    assert calendar.is_daylight(datetime(2026, 6, 21, 12, 0, tzinfo=timezone.utc)) is None
+
+
+def test_is_night_reuses_the_stored_calendar(tmp_path):
+    midnight = datetime(2026, 5, 6, 22, 0, tzinfo=timezone.utc)
+    assert is_night(*AMSTERDAM[:2], str(tmp_path), current_time=midnight)
+    assert (tmp_path / "daylight-52.3676-4.9041-Europe_Amsterdam.json").exists()
+
+    with patch.object(DaylightCalendar, "build") as mock_build:
+        assert is_night(*AMSTERDAM[:2], str(tmp_path), current_time=midnight)
+        assert not is_night(*AMSTERDAM[:2], str(tmp_path), current_time=midnight - timedelta(hours=10))
+    mock_build.assert_not_called()
+
+
+def test_calendar_is_rebuilt_once_it_runs_out(tmp_path):
+    path = calendar_path(str(tmp_path), *AMSTERDAM)
+    DaylightCalendar.build(*AMSTERDAM, date(2026, 5, 5), days=3).save(path)
+
+    calendar = load_calendar(*AMSTERDAM, str(tmp_path), datetime(2026, 8, 1, 12, 0, tzinfo=timezone.utc))
+
+    assert calendar.start == date(2026, 7, 31)
+    assert DaylightCalendar.load(path).start == date(2026, 7, 31)
+
+
+def test_is_night_leaves_the_decision_to_app_when_the_calendar_fails(tmp_path):
+    with patch.object(DaylightCalendar, "build", side_effect=RuntimeError("astral failed")):
+        assert not is_night(*AMSTERDAM[:2], str(tmp_path), current_time=datetime(2026, 5, 6, 22, 0, tzinfo=timezone.utc))
+
+
+def test_calendar_window_of_a_local_date():
+    calendar = DaylightCalendar.build(*AMSTERDAM, date(2026, 5, 5), days=3)
+    amsterdam = pytz.timezone("Europe/Amsterdam")
+
+    sunrise, sunset = calendar.window(date(2026, 5, 6), amsterdam)
+
+    assert sunrise.date() == sunset.date() == date(2026, 5, 6)
+    assert 5 <= sunrise.hour <= 6 and 20 <= sunset.hour <= 21
+    assert calendar.window(date(2026, 5, 9), amsterdam) is None
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from solaredge_influxdb.dedup import ChangeDetector, parse_deadbands
+
+START = datetime(2026, 5, 6, 22, 0, 0, tzinfo=timezone.utc)
+TAGS = (("operation_mode", "0"), ("inverter_mode", "SLEEPING"))
+
+
+def _at(minutes: int) -> datetime:
+    return START + timedelta(minutes=minutes)
+
+
+def test_change_detector_skips_unchanged_points_until_heartbeat():
+    detector = ChangeDetector(heartbeat=timedelta(minutes=30))
+    fields = [("total_energy", 12653.3), ("ac_power", 0.0)]
+
+    written = [detector.changed("INV-1/energy", _at(minutes), fields, TAGS) for minutes in range(0, 65, 5)]
+
+    # The first point, and one point per heartbeat interval after the last point written
+    assert [minutes for minutes, changed in zip(range(0, 65, 5), written) if changed] == [0, 30, 60]
+
+
+def test_change_detector_applies_deadbands_against_last_point_written():
+    detector = ChangeDetector({"dc_voltage": 1.0})
+
+    assert detector.changed("INV-1/voltage_current", _at(0), [("dc_voltage", 400.0)], TAGS)
+    assert not detector.changed("INV-1/voltage_current", _at(5), [("dc_voltage", 400.6)], TAGS)
+    # Drifting in small steps is written once it moved more than the deadband from the last point written
+    assert detector.changed("INV-1/voltage_current", _at(10), [("dc_voltage", 401.2)], TAGS)
+    assert not detector.changed("INV-1/voltage_current", _at(15), [("dc_voltage", 400.3)], TAGS)
+
+
+def test_change_detector_writes_changed_tags_and_fields():
+    detector = ChangeDetector()
+    fields = [("total_energy", 12653.3)]
+    detector.changed("INV-1/energy", _at(0), fields, TAGS)
+
+    assert detector.changed("INV-1/energy", _at(5), fields, (("operation_mode", "0"), ("inverter_mode", "MPPT")))
+    assert detector.changed("INV-1/energy", _at(10), fields + [("ac_power", 0.0)], TAGS)
+    assert detector.changed("INV-1/energy", _at(15), [("total_energy", 12653.4)], TAGS)
+    # Keys are independent
+    assert detector.changed("INV-2/energy", _at(15), [("total_energy", 12653.4)], TAGS)
+
+
+def test_change_detector_rollback_and_commit(tmp_path):
+    path = str(tmp_path / "dedup.json")
+    fields = [("total_energy", 12653.3)]
+    detector = ChangeDetector(path=path)
+
+    assert detector.changed("INV-1/energy", _at(0), fields, TAGS)
+    detector.rollback()
+    # Not acknowledged by InfluxDB, so written again
+    assert detector.changed("INV-1/energy", _at(0), fields, TAGS)
+    detector.commit()
+
+    reloaded = ChangeDetector(path=path)
+    assert not reloaded.changed("INV-1/energy", _at(5), fields, TAGS)
+    assert reloaded.changed("INV-1/energy", _at(5), [("total_energy", 12653.4)], TAGS)
+
+
+def test_change_detector_ignores_unreadable_file(tmp_path):
+    path = tmp_path / "dedup.json"
+    path.write_text('{"INV-1/energy": ["not a date", {}, []]}')
+
+    assert ChangeDetector(path=str(path)).changed("INV-1/energy", _at(0), [("total_energy", 1.0)], TAGS)
+
+
+def test_change_detector_rejects_unknown_fields():
+    with pytest.raises(ValueError, match="voltage"):
+        ChangeDetector({"voltage": 1.0})
+
+
+def test_parse_deadbands():
+    assert parse_deadbands(["dc_voltage=2", " ac_power = 0.01"]) == {"dc_voltage": 2.0, "ac_power": 0.01}
+    with pytest.raises(ValueError):
+        parse_deadbands(["dc_voltage"])
@@ -0,0 +1,105 @@
+from unittest.mock import patch
+from urllib.request import urlopen
+
+import pytest
+from requests import PreparedRequest, Response
+from requests.adapters import HTTPAdapter
+
+from solaredge_influxdb.metrics import MetricsRegistry, get_registry, serve_metrics, set_registry
+from solaredge_influxdb.solaredge.client import InstrumentedAdapter, endpoint_label
+
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry()
+    previous = set_registry(registry)
+    yield registry
+    set_registry(previous)
+
+
+def test_render_uses_the_text_exposition_format(registry):
+    registry.inc("solaredge_requests_total", endpoint="/site/{id}/overview", status=200)
+    registry.inc("solaredge_requests_total", endpoint="/site/{id}/overview", status=200)
+    registry.set("solaredge_quota_remaining", 297)
+    registry.observe("influxdb_write_seconds", 0.02, bucket="solar")
+    registry.observe("influxdb_write_seconds", 3.0, bucket="solar")
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE solaredge_requests_total counter" in lines
+    assert 'solaredge_requests_total{endpoint="/site/{id}/overview",status="200"} 2' in lines
+    assert "solaredge_quota_remaining 297" in lines
+    assert "# TYPE influxdb_write_seconds histogram" in lines
+    assert 'influxdb_write_seconds_bucket{bucket="solar",le="0.025"} 1' in lines
+    assert 'influxdb_write_seconds_bucket{bucket="solar",le="+Inf"} 2' in lines
+    assert 'influxdb_write_seconds_count{bucket="solar"} 2' in lines
+
+
+def test_summary_reports_histogram_statistics(registry):
+    registry.observe("solaredge_decode_seconds", 0.1, model="TelemetryRecord")
+    registry.observe("solaredge_decode_seconds", 0.3, model="TelemetryRecord")
+    registry.inc("solaredge_decoded_rows_total", 96, model="TelemetryRecord")
+
+    summary = registry.summary()
+
+    assert summary["solaredge_decode_seconds"] == [
+        {"labels": {"model": "TelemetryRecord"}, "count": 2, "sum": 0.4, "avg": 0.2, "max": 0.3}
+    ]
+    assert summary["solaredge_decoded_rows_total"] == [{"labels": {"model": "TelemetryRecord"}, "value": 96}]
+
+
+def test_label_values_are_escaped(registry):
+    registry.inc("custom_total", name='a "quoted"\nvalue')
+
+    assert 'custom_total{name="a \\"quoted\\"\\nvalue"} 1' in registry.render().splitlines()
+
+
+def test_serve_metrics_exposes_the_registry(registry):
+    registry.inc("solaredge_retries_total", endpoint="/sites/list")
+    server = serve_metrics(0, "127.0.0.1")
+    try:
+        with urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics", timeout=5) as response:
+            body = response.read().decode()
+            content_type = response.headers["Content-Type"]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert content_type.startswith("text/plain")
+    assert 'solaredge_retries_total{endpoint="/sites/list"} 1' in body.splitlines()
+
+
+def test_endpoint_label_drops_ids():
+    assert endpoint_label("https://monitoringapi.solaredge.com/equipment/123/7E1234AB-01/data.json") == (
+        "/equipment/{id}/{id}/data.json"
+    )
+    assert endpoint_label("https://monitoringapi.solaredge.com/sites/1,2,3/energy?api_key=x") == "/sites/{id}/energy"
+    assert endpoint_label("https://monitoringapi.solaredge.com/sites/list") == "/sites/list"
+
+
+def test_instrumented_adapter_records_responses(registry):
+    response = Response()
+    response.status_code = 200
+    response._content = b'{"sites": {}}'
+    request = PreparedRequest()
+    request.prepare(method="GET", url="https://monitoringapi.solaredge.com/site/123/overview")
+
+    with patch.object(HTTPAdapter, "send", return_value=response):
+        assert InstrumentedAdapter().send(request) is response
+
+    summary = get_registry().summary()
+    labels = {"endpoint": "/site/{id}/overview", "status": "200"}
+    assert summary["solaredge_requests_total"] == [{"labels": labels, "value": 1}]
+    assert summary["solaredge_response_bytes_total"][0]["value"] == 13
+    assert summary["solaredge_request_seconds"][0]["count"] == 1
+
+
+def test_instrumented_adapter_counts_failed_requests(registry):
+    request = PreparedRequest()
+    request.prepare(method="GET", url="https://monitoringapi.solaredge.com/sites/list")
+
+    with patch.object(HTTPAdapter, "send", side_effect=ConnectionError("unreachable")):
+        with pytest.raises(ConnectionError):
+            InstrumentedAdapter().send(request)
+
+    assert registry.summary()["solaredge_request_errors_total"] == [{"labels": {"endpoint": "/sites/list"}, "value": 1}]
@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+import pytest
+
+from solaredge_influxdb.schema import Schema, get_schema
+from solaredge_influxdb.solaredge import PhaseRecord
+
+TELEMETRY = SimpleNamespace(
+    totalEnergy=2500.0,
+    totalActivePower=None,
+    dcVoltage=750.0,
+    vL1To2=400.1,
+    vL2To3=400.2,
+    vL3To1=400.3,
+    L1Data=None,
+    L2Data=None,
+    L3Data=None,
+)
+
+
+def test_split_schema_keeps_fields_per_bucket_and_drops_missing_values():
+    points = get_schema("split").telemetry_points(TELEMETRY)
+
+    assert points == [
+        ("energy", [("total_energy", 2.5)]),
+        ("energy_flow", []),
+        (
+            "voltage_current",
+            [("dc_voltage", 750.0), ("voltage_l1_to_2", 400.1), ("voltage_l2_to_3", 400.2), ("voltage_l3_to_1", 400.3)],
+        ),
+    ]
+
+
+def test_single_schema_writes_one_point_per_row():
+    schema = get_schema("single", "pv")
+
+    (bucket, fields), = schema.telemetry_points(TELEMETRY)
+
+    assert bucket == "pv"
+    assert schema.meter_bucket == "pv"
+    assert [key for key, _ in fields] == [
+        "total_energy",
+        "dc_voltage",
+        "voltage_l1_to_2",
+        "voltage_l2_to_3",
+        "voltage_l3_to_1",
+    ]
+
+
+def test_schema_rejects_unknown_fields_and_layouts():
+    with pytest.raises(ValueError):
+        Schema({"energy": ["total_energy", "temperature"]})
+    with pytest.raises(ValueError):
+        get_schema("wide")
+
+
+def test_phase_points_skip_phases_the_inverter_does_not_have():
+    telemetry = SimpleNamespace(
+        L1Data=PhaseRecord(10.5, 231.2, 50.01, 2430.0, 2400.0, None, 0.99), L2Data=None, L3Data=None
+    )
+
+    assert get_schema("split").phase_points(telemetry) == [
+        (
+            "L1",
+            [
+                ("ac_current", 10.5),
+                ("ac_voltage", 231.2),
+                ("ac_frequency", 50.01),
+                ("active_power", 2.4),
+                ("apparent_power", 2.43),
+                ("cos_phi", 0.99),
+            ],
+        )
+    ]
+    assert Schema({"energy": ["total_energy"]}).phase_points(telemetry) == []
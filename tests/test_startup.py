@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+from typing import Dict
+
+import pytest
+
+# Cumulative import time allowed for the paths that must start fast, raise it on slow machines
+STARTUP_BUDGET = float(os.getenv("STARTUP_IMPORT_BUDGET", "0.5"))
+# Modules of the SolarEdge and InfluxDB stack that only a collection needs
+HEAVY_MODULES = ["influxdb_client", "pydantic", "requests", "urllib3", "astral", "pytz"]
+
+
+def _import_times(*args: str) -> Dict[str, int]:
+    """Run Python with -X importtime and return the cumulative import time per top-level import in µs"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        capture_output=True,
+        text=True,
+        timeout=60,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.rstrip()] = int(cumulative)
+    return times
+
+
+def _assert_fast(times: Dict[str, int]) -> None:
+    imported = {name.strip() for name in times}
+    assert not [module for module in HEAVY_MODULES if module in imported]
+    top_level = sum(cumulative for name, cumulative in times.items() if not name.startswith("  "))
+    assert top_level / 1e6 < STARTUP_BUDGET
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["-m", "solaredge_influxdb", "--help"],
+        ["-c", "import solaredge_influxdb.daylight"],
+        ["-c", "from solaredge_influxdb.solaredge import ResponseCache, RateLimiter"],
+        ["-c", "from solaredge_influxdb.influxdb import LineProtocolSerializer, Spool"],
+    ],
+)
+def test_startup_paths_skip_the_collection_stack(args):
+    _assert_fast(_import_times(*args))
+
+
+def test_collection_stack_is_loaded_on_use():
+    times = _import_times("-c", "from solaredge_influxdb import app")
+
+    assert "solaredge_influxdb.app" in {name.strip() for name in times}
+    assert "influxdb_client" in {name.strip() for name in times}
+
+
+def test_app_function_survives_importing_the_app_module():
+    result = subprocess.run(
+        [sys.executable, "-c", "import solaredge_influxdb.daemon; from solaredge_influxdb import app; print(callable(app))"],
+        capture_output=True,
+        text=True,
+        timeout=60,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+
+    assert result.stdout.strip() == "True"
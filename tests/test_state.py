@@ -0,0 +1,23 @@
+from datetime import datetime, timedelta, timezone
+
+from solaredge_influxdb.state import StateStore
+
+
+def test_state_store_round_trip(tmp_path):
+    path = str(tmp_path / "state.json")
+    state = StateStore(path)
+    first = datetime(2026, 5, 6, 12, 0, 0, tzinfo=timezone(timedelta(hours=2)))
+
+    state.update("INV-1", first)
+    state.update("INV-1", first - timedelta(minutes=5))
+    state.save()
+
+    assert StateStore(path).get("INV-1") == first
+    assert StateStore(path).get("INV-2") is None
+
+
+def test_state_store_ignores_unreadable_file(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text('{"INV-1": "not a date"}')
+
+    assert StateStore(str(path)).watermarks == {}